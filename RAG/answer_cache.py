@@ -0,0 +1,203 @@
+"""
+Semantic cache for generated answers.
+
+An answer is stored under a retrieval key (a hash of the exact set of
+retrieved documents, including their content, plus any extra prompt context
+such as chat history) and the embedding of the question. A lookup only
+considers answers generated from the same retrieval key and returns one
+whose question embedding has cosine similarity >= ``threshold`` with the new
+question, so "chest pain at night" and "chest pain at night?" share an
+answer while a different set of codes never does.
+
+Each cache is bound to a codebook version. Entries are appended to
+``ANSWER_CACHE_DIR/<name>.jsonl`` and reloaded on start; entries written for
+another version are dropped (and the file compacted) at load time.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config_advanced import ANSWER_CACHE, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_THRESHOLD
+
+DEFAULT_ANSWER_CACHE_DIR = Path(
+    os.getenv("ANSWER_CACHE_DIR", Path(__file__).resolve().parent / ".answer_cache")
+)
+
+_caches: Dict[str, "AnswerCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def answer_cache_enabled() -> bool:
+    return ANSWER_CACHE == "on"
+
+
+def retrieval_key(documents: Iterable[Tuple[str, Dict]], context: str = "") -> str:
+    """Order-independent key for a set of (id, content) documents plus extra prompt context."""
+    items = sorted(
+        (str(doc_id), json.dumps(content, sort_keys=True, default=str)) for doc_id, content in documents
+    )
+    payload = json.dumps([items, context], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm else embedding
+
+
+class _Entry:
+    __slots__ = ("embedding", "answer", "generation_seconds", "created_at")
+
+    def __init__(self, embedding: np.ndarray, answer: str, generation_seconds: float, created_at: float):
+        self.embedding = embedding
+        self.answer = answer
+        self.generation_seconds = generation_seconds
+        self.created_at = created_at
+
+
+class AnswerCache:
+    """Near-duplicate question -> answer cache for one codebook version, persisted as JSONL."""
+
+    def __init__(self, path: Path, version: str, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.version = version
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._groups: "OrderedDict[str, List[_Entry]]" = OrderedDict()  # retrieval key -> entries, LRU order
+        self._count = 0
+        self._file_lines = 0
+        self._lock = threading.Lock()
+
+        # Metrics (guarded by _lock)
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        stale = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted write
+                if record.get("version") != self.version:
+                    stale += 1
+                    continue
+                embedding = np.frombuffer(base64.b64decode(record["embedding"]), dtype=np.float32)
+                self._insert(record["key"], _Entry(embedding, record["answer"],
+                                                   record["generation_seconds"], record["created_at"]))
+                self._file_lines += 1
+        if stale:
+            print(f"🧹 Answer cache: dropped {stale} entries from another codebook version")
+        if stale or self._file_lines > self._count:
+            self._rewrite()
+
+    def _insert(self, key: str, entry: _Entry):
+        # Called with _lock held (or during load)
+        self._groups.setdefault(key, []).append(entry)
+        self._groups.move_to_end(key)
+        self._count += 1
+        while self._count > self.max_entries:
+            _, evicted = self._groups.popitem(last=False)
+            self._count -= len(evicted)
+
+    def _record_line(self, key: str, entry: _Entry) -> str:
+        return json.dumps({
+            "version": self.version,
+            "key": key,
+            "embedding": base64.b64encode(entry.embedding.tobytes()).decode("ascii"),
+            "answer": entry.answer,
+            "generation_seconds": entry.generation_seconds,
+            "created_at": entry.created_at,
+        }, ensure_ascii=False) + "\n"
+
+    def _rewrite(self):
+        """Rewrite the file from memory, dropping evicted and stale entries."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, entries in self._groups.items():
+                for entry in entries:
+                    f.write(self._record_line(key, entry))
+        os.replace(tmp_path, self.path)
+        self._file_lines = self._count
+
+    def get(self, query_embedding: np.ndarray, key: str) -> Optional[str]:
+        """Cached answer for a near-identical question with the same retrieval key, if any."""
+        start = time.perf_counter()
+        query = _normalize(query_embedding)
+        with self._lock:
+            best = None
+            entries = self._groups.get(key)
+            if entries:
+                similarities = np.stack([entry.embedding for entry in entries]) @ query
+                i = int(np.argmax(similarities))
+                if similarities[i] >= self.threshold:
+                    best = entries[i]
+                    self._groups.move_to_end(key)
+            self.lookup_seconds += time.perf_counter() - start
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += best.generation_seconds
+            return best.answer
+
+    def put(self, query_embedding: np.ndarray, key: str, answer: str, generation_seconds: float):
+        """Store a freshly generated answer and append it to the cache file."""
+        entry = _Entry(_normalize(query_embedding), answer, generation_seconds, time.time())
+        with self._lock:
+            self._insert(key, entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(self._record_line(key, entry))
+            self._file_lines += 1
+            if self._file_lines > 2 * self.max_entries:
+                self._rewrite()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': self._count,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'saved_seconds': self.saved_seconds,
+                'avg_lookup_ms': self.lookup_seconds / lookups * 1000.0 if lookups else 0.0,
+            }
+
+
+def get_answer_cache(name: str, version: str = "") -> AnswerCache:
+    """Return the process-wide answer cache ``name``, reloaded if the codebook version changed.
+
+    Callers without a local codebook can leave ``version`` empty: retrieval
+    keys already include the content of every retrieved document.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None or cache.version != version:
+            path = DEFAULT_ANSWER_CACHE_DIR / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.jsonl"
+            cache = AnswerCache(path, version)
+            _caches[name] = cache
+        return cache
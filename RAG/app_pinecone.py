@@ -5,6 +5,7 @@ import re
 import uuid
 from datetime import datetime
 from pinecone_rag_agent import PineconeBillingRagAgent
+from shared_engine import get_shared_system
 
 # Page configuration
 st.set_page_config(
@@ -226,7 +227,8 @@ st.markdown("""
 if "agent" not in st.session_state:
     try:
         with st.spinner("BOOTING NEURAL CORE..."):
-            st.session_state.agent = PineconeBillingRagAgent()
+            # One agent (model + index client) per server process, shared by all sessions
+            st.session_state.agent = get_shared_system(PineconeBillingRagAgent, PineconeBillingRagAgent)
     except Exception as e:
         st.error(f"CORE FAILURE: {e}")
 
@@ -662,14 +664,19 @@ if current_thread["messages"] and current_thread["messages"][-1]["role"] == "use
                 matches = st.session_state.agent.retrieve(last_user_msg)
                 status.update(label="SCAN COMPLETE", state="complete", expanded=False)
             
-            # Generate (Using Full Context)
-            with st.spinner("NEURAL SYNTHESIS..."):
-                full_context = get_full_context_messages(current_thread['id'])
-                
-                if st.session_state.agent.has_llm:
-                    response_text = st.session_state.agent.generate_response(last_user_msg, matches, full_context)
-                else:
-                    response_text = "⚠️ OFFLINE MODE."
+            # Generate (Using Full Context), rendering tokens as they arrive
+            full_context = get_full_context_messages(current_thread['id'])
+            
+            if st.session_state.agent.has_llm:
+                stream = st.session_state.agent.generate_response_stream(last_user_msg, matches, full_context)
+                with st.spinner("NEURAL SYNTHESIS..."):
+                    response_text = next(stream, "")  # spinner only until the first token
+                message_placeholder.markdown(response_text + "▌")
+                for chunk in stream:
+                    response_text += chunk
+                    message_placeholder.markdown(response_text + "▌")
+            else:
+                response_text = "⚠️ OFFLINE MODE."
             
             message_placeholder.markdown(response_text)
             
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark: rank_bm25.BM25Okapi (get_scores + argsort) vs. SparseBM25.top_n.
+
+Uses a synthetic Zipf-distributed corpus so the scaling can be seen well
+beyond the size of the codebook.
+
+Run: python bench_bm25.py [num_docs]
+"""
+
+import sys
+import time
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from sparse_bm25 import SparseBM25
+
+VOCAB_SIZE = 20000
+TOP_K = 20
+REFERENCE_QUERIES = 20
+SPARSE_QUERIES = 500
+
+
+def make_corpus(num_docs: int, rng: np.random.Generator):
+    vocab = [f"t{i}" for i in range(VOCAB_SIZE)]
+    lengths = rng.integers(20, 80, size=num_docs)
+    term_ids = np.minimum(rng.zipf(1.2, size=int(lengths.sum())) - 1, VOCAB_SIZE - 1)
+    splits = np.split(term_ids, np.cumsum(lengths)[:-1])
+    return [[vocab[t] for t in doc] for doc in splits]
+
+
+def make_queries(n: int, rng: np.random.Generator):
+    return [[f"t{t}" for t in rng.integers(0, 2000, size=rng.integers(2, 7))] for _ in range(n)]
+
+
+def per_query_ms(fn, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1000.0
+
+
+if __name__ == "__main__":
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = np.random.default_rng(0)
+    corpus = make_corpus(num_docs, rng)
+    queries = make_queries(SPARSE_QUERIES, rng)
+
+    start = time.perf_counter()
+    reference = BM25Okapi(corpus)
+    reference_build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    sparse_bm25 = SparseBM25(corpus)
+    sparse_build_s = time.perf_counter() - start
+
+    for query in queries[:REFERENCE_QUERIES]:
+        assert np.allclose(sparse_bm25.get_scores(query), reference.get_scores(query))
+
+    reference_ms = per_query_ms(lambda q: np.argsort(reference.get_scores(q))[::-1][:TOP_K],
+                                queries[:REFERENCE_QUERIES])
+    sparse_ms = per_query_ms(lambda q: sparse_bm25.top_n(q, TOP_K), queries)
+
+    print(f"⏱️ BM25 top-{TOP_K} over {num_docs} synthetic documents")
+    print("=" * 72)
+    print(f"build:  rank_bm25 {reference_build_s:7.2f} s   | sparse {sparse_build_s:7.2f} s")
+    print(f"query:  rank_bm25 {reference_ms:7.2f} ms  | sparse {sparse_ms:7.2f} ms | "
+          f"{reference_ms / sparse_ms:6.1f}x")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: per-row encode + sequential upserts vs. PineconeBillingRagAgent._embed_and_upsert.
+
+The old knowledge-base ingestion called the encoder once per row and upserted
+when it was done; ``_embed_and_upsert`` encodes fixed-size batches and hands
+them to an UpsertWriter, so upserts run while the next batch is encoded.
+
+The encoder and index are stand-ins. ``StubEncoder`` sleeps for a fixed cost
+per call plus a cost per row, and ``StubIndex`` for a round trip per upsert.
+The encoder costs were measured on one CPU with a random-weight
+all-MiniLM-L6-v2 (see bench_search_batch.py). The upsert cost is an assumed
+serverless round trip. The stub doesn't model padding. ``--stand-in`` runs
+the model itself, which shows how padding slows large encoder batches.
+
+Run: python bench_embed_upsert.py [--stand-in] [num_rows]
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("EMBEDDING_CACHE_DIR", tempfile.mkdtemp(prefix="bench-embed-cache-"))
+
+import numpy as np
+import pandas as pd
+
+from pinecone_rag_agent import PineconeBillingRagAgent, iter_csv_records
+
+ENCODE_CALL_SECONDS = 0.011
+ENCODE_ROW_SECONDS = 0.017
+UPSERT_SECONDS = 0.120
+UPSERT_BATCH = 100
+DIMENSION = 384
+
+
+class StubEncoder:
+    model_name = "bench-stub-encoder"
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        time.sleep(ENCODE_CALL_SECONDS * -(-len(texts) // batch_size) + ENCODE_ROW_SECONDS * len(texts))
+        vectors = np.random.default_rng(len(texts)).random((len(texts), DIMENSION), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+class StubIndex:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(UPSERT_SECONDS)
+        with self._lock:
+            self.count += len(vectors)
+
+
+def make_records(n: int, run: str):
+    """Codebook rows, repeated up to ``n``; ``run`` keeps the texts new so nothing is served from the embedding cache."""
+    rows = list(iter_csv_records(pd.read_csv("Codes_by_class.csv")))
+    return [
+        (f"{run}_{i}_{vector_id}", f"[{run} {i}] {text}", metadata)
+        for i, (vector_id, text, metadata) in zip(range(n), itertools.cycle(rows))
+    ]
+
+
+def per_row_loop(encoder, index, records) -> None:
+    vectors = [(vector_id, encoder.encode(text).tolist(), metadata) for vector_id, text, metadata in records]
+    for start in range(0, len(vectors), UPSERT_BATCH):
+        index.upsert(vectors=vectors[start:start + UPSERT_BATCH])
+
+
+def batched_overlapped(encoder, index, records, encode_batch_size: int) -> None:
+    agent = PineconeBillingRagAgent.__new__(PineconeBillingRagAgent)
+    agent.embedder, agent.index, agent.doc_store = encoder, index, None
+    agent._embed_and_upsert(records, "bench", batch_size=UPSERT_BATCH, encode_batch_size=encode_batch_size)
+
+
+def rows_per_second(fn, encoder, records, *args) -> float:
+    index = StubIndex()
+    start = time.perf_counter()
+    fn(encoder, index, records, *args)
+    elapsed = time.perf_counter() - start
+    assert index.count == len(records)
+    return len(records) / elapsed
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--stand-in"]
+    num_rows = int(args[0]) if args else 1000
+    if "--stand-in" in sys.argv:
+        import shared_engine
+        from bench_search_batch import install_stand_in_encoder
+
+        install_stand_in_encoder("Codes_by_class.csv")
+        encoder = shared_engine.get_embedding_model("all-MiniLM-L6-v2")
+        encoder.encode(["warm up"])
+    else:
+        encoder = StubEncoder()
+
+    results = [("per-row encode, sequential upserts", rows_per_second(per_row_loop, encoder, make_records(num_rows, "loop")))]
+    for encode_batch_size in (16, 32, UPSERT_BATCH):
+        rate = rows_per_second(batched_overlapped, encoder, make_records(num_rows, f"b{encode_batch_size}"),
+                               encode_batch_size)
+        results.append((f"_embed_and_upsert, encoder batch {encode_batch_size}", rate))
+
+    print(f"⏱️ Embed + upsert {num_rows} rows ({'stand-in model' if '--stand-in' in sys.argv else 'stub encoder'})")
+    print("=" * 72)
+    for label, rate in results:
+        print(f"{label:<40} {rate:8.1f} rows/sec | {rate / results[0][1]:5.2f}x")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: compiled QueryExpander vs. the previous per-call implementation
+of _expand_query_with_nlp (sorted dict + nested substring scans).
+
+Run: python bench_query_expansion.py [iterations]
+"""
+
+import sys
+import time
+
+from query_expansion import (ADVANCED_EXPANSIONS, BILLING_EXPANSIONS,
+                             QueryExpander)
+
+SAMPLE_QUERIES = [
+    "chest pain",
+    "laceration repair",
+    "H152 weekend",
+    "broken bone in wrist",
+    "shortness of breath after hours",
+    "elderly patient fell, hip pain, night",
+    "heart attack emergency",
+    "child with fever and cut on knee",
+    "anesthesia for shoulder dislocation reduction",
+    "copd exacerbation respiratory distress on weekend",
+]
+
+
+def legacy_expand(query: str, medical_expansions: dict) -> str:
+    """The previous algorithm; the table was rebuilt and re-sorted on every call."""
+    medical_expansions = dict(medical_expansions)
+    query_lower = query.lower().strip()
+
+    expanded_terms = []
+    remaining_query = query_lower
+    for phrase, expansion in sorted(medical_expansions.items(), key=lambda x: len(x[0]), reverse=True):
+        if phrase in remaining_query:
+            expanded_terms.append(expansion)
+            remaining_query = remaining_query.replace(phrase, '').strip()
+
+    for term in remaining_query.split():
+        if term in medical_expansions:
+            expanded_terms.append(medical_expansions[term])
+        else:
+            for key, expansion in medical_expansions.items():
+                if term in key or key in term:
+                    expanded_terms.append(expansion)
+                    break
+            else:
+                expanded_terms.append(term)
+
+    expanded_query = ' '.join(expanded_terms)
+    words = expanded_query.split()
+    seen = set()
+    unique_words = []
+    for word in words:
+        if word not in seen:
+            seen.add(word)
+            unique_words.append(word)
+    expanded_query = ' '.join(unique_words)
+
+    if not any(suffix in expanded_query for suffix in ['assessment', 'evaluation', 'examination', 'procedure', 'treatment']):
+        if any(symptom in expanded_query for symptom in ['pain', 'ache', 'discomfort']):
+            expanded_query += ' assessment evaluation examination'
+        elif any(injury in expanded_query for injury in ['fracture', 'break', 'cut', 'wound', 'laceration']):
+            expanded_query += ' repair treatment procedure'
+
+    return expanded_query
+
+
+def time_per_query(fn, iterations: int) -> float:
+    """Mean microseconds per query over the sample set."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for query in SAMPLE_QUERIES:
+            fn(query)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(SAMPLE_QUERIES)) * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("⏱️ Query expansion micro-benchmark")
+    print("=" * 60)
+    for name, table in [("billing", BILLING_EXPANSIONS), ("advanced", ADVANCED_EXPANSIONS)]:
+        expander = QueryExpander(table)
+        legacy_us = time_per_query(lambda q: legacy_expand(q, table), iterations)
+        compiled_us = time_per_query(expander.expand, iterations)
+        print(f"{name:>9}: legacy {legacy_us:8.1f} µs/query | compiled {compiled_us:6.1f} µs/query "
+              f"| {legacy_us / compiled_us:5.1f}x faster")
+
+    print("\nSample expansions (billing table):")
+    expander = QueryExpander(BILLING_EXPANSIONS)
+    for query in SAMPLE_QUERIES[:5]:
+        print(f"  '{query}' → '{expander.expand(query)}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: BillingRAGSystem.search_codes in a loop vs. search_codes_batch.
+
+The shared query-embedding cache is cleared before every timed run so both
+paths pay for encoding (the realistic case for a nightly claims-review job).
+
+Without access to the Hugging Face hub, ``--stand-in`` swaps in a
+randomly-initialized model with all-MiniLM-L6-v2's architecture (6 layers,
+384 dimensions, mean pooling) and a word-piece vocabulary built from the
+codebook. It costs the same per query as the real model, but its rankings
+are meaningless, so use it for throughput only. Its embeddings are cached
+under a temporary directory, not next to the real model's.
+
+Run: python bench_search_batch.py [--stand-in] [csv_path]
+"""
+
+import itertools
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import shared_engine
+from query_cache import get_query_cache
+
+PROCEDURES = [
+    "chest pain", "laceration repair", "fracture reduction", "shoulder dislocation",
+    "cardiac arrest", "intubation", "procedural sedation", "nerve block",
+    "abscess incision and drainage", "foreign body removal", "chest tube",
+    "lumbar puncture", "pediatric assessment", "form 1 mental health",
+]
+MODIFIERS = ["", "night", "weekend", "evening", "holiday", "adult", "child", "elderly", "complex"]
+BATCH_SIZES = [1, 16, 128]
+
+
+def make_queries(n: int):
+    """Distinct, realistic-looking queries so nothing is served from the cache."""
+    combos = (f"{p} {m}".strip() for m, p in itertools.product(MODIFIERS, PROCEDURES))
+    queries = list(itertools.islice(combos, n))
+    while len(queries) < n:
+        queries.append(f"{queries[len(queries) % len(PROCEDURES)]} case {len(queries)}")
+    return queries
+
+
+def install_stand_in_encoder(csv_path: str, model_name: str = "all-MiniLM-L6-v2") -> None:
+    """Register a random-weight model with ``model_name``'s architecture as the shared model for that name."""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    directory = Path(tempfile.mkdtemp(prefix="minilm-stand-in-"))
+    os.environ["EMBEDDING_CACHE_DIR"] = str(directory / "embedding_cache")
+    words = set(re.findall(r"[a-z0-9]+", Path(csv_path).read_text(encoding="utf-8").lower()))
+    chars = "abcdefghijklmnopqrstuvwxyz0123456789"
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(words | set(chars)) + [f"##{c}" for c in chars]
+    (directory / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                        intermediate_size=1536, max_position_embeddings=512)
+    BertModel(config).save_pretrained(directory / "transformer")
+    BertTokenizerFast(vocab_file=str(directory / "vocab.txt")).save_pretrained(directory / "transformer")
+    transformer = models.Transformer(str(directory / "transformer"), max_seq_length=256)
+    SentenceTransformer(modules=[transformer, models.Pooling(384, "mean"), models.Normalize()]).save(
+        str(directory / "model"))
+    shared_engine._models[model_name] = shared_engine.SharedEmbeddingModel(str(directory / "model"))
+
+
+def timed(rag_system, fn) -> float:
+    get_query_cache(rag_system.model.model_name).clear()
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--stand-in"]
+    csv_path = args[0] if args else "Codes_by_class.csv"
+    if "--stand-in" in sys.argv:
+        install_stand_in_encoder(csv_path)
+        # The index snapshot goes next to the codebook, so work on a temporary copy
+        copy = Path(tempfile.mkdtemp(prefix="bench-codebook-")) / Path(csv_path).name
+        copy.write_bytes(Path(csv_path).read_bytes())
+        csv_path = str(copy)
+
+    from billing_rag_system import BillingRAGSystem  # after EMBEDDING_CACHE_DIR is set
+
+    rag_system = BillingRAGSystem(csv_path)
+    rag_system.search_codes("warm up")
+
+    print(f"⏱️ search_codes vs search_codes_batch ({len(rag_system.records)} codebook rows)")
+    print("=" * 72)
+    for batch_size in BATCH_SIZES:
+        queries = make_queries(batch_size)
+        loop_s = timed(rag_system, lambda: [rag_system.search_codes(q) for q in queries])
+        batch_s = timed(rag_system, lambda: rag_system.search_codes_batch(queries))
+        print(f"batch {batch_size:>4}: loop {batch_size / loop_s:8.1f} q/s | "
+              f"batched {batch_size / batch_s:8.1f} q/s | {loop_s / batch_s:5.1f}x")
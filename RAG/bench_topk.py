@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark: full argsort vs. top_k_indices for picking retrieval candidates.
+
+Score vectors mimic the two HybridRetriever rankers: BM25 (mostly zeros, a
+few hundred positive scores) and TF-IDF cosine (dense, small values).
+
+Run: python bench_topk.py
+"""
+
+import time
+
+import numpy as np
+
+from topk import top_k_indices
+
+K = 30  # cohere_RAG.TOP_K_RETRIEVE
+CORPUS_SIZES = [300, 3_000, 30_000, 300_000]
+REPEATS = 200
+
+
+def score_vectors(n: int, rng: np.random.Generator):
+    bm25 = np.zeros(n)
+    hits = rng.choice(n, size=min(n, 400), replace=False)
+    bm25[hits] = rng.gamma(2.0, 2.0, size=len(hits))
+    tfidf = rng.random(n) * 0.2
+    return {"bm25": bm25, "tfidf": tfidf}
+
+
+def per_call_us(fn, scores) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(scores)
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"⏱️ top-{K} selection: argsort vs. top_k_indices")
+    print("=" * 72)
+    for n in CORPUS_SIZES:
+        for name, scores in score_vectors(n, rng).items():
+            full_us = per_call_us(lambda s: np.argsort(s)[::-1][:K], scores)
+            partial_us = per_call_us(lambda s: top_k_indices(s, K), scores)
+            print(f"{n:>7} docs {name:>5}: argsort {full_us:9.1f} µs | "
+                  f"top_k_indices {partial_us:9.1f} µs | {full_us / partial_us:5.1f}x")
@@ -3,7 +3,6 @@ import numpy as np
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from sentence_transformers import SentenceTransformer
 import faiss
 import re
 from typing import List, Dict, Tuple, Optional
@@ -11,6 +10,13 @@ import json
 from datetime import datetime, time
 import os
 
+from config import RANGE_SEARCH_MAX_HITS, SEARCH_MODE
+from embedding_cache import encode_cached
+from index_snapshot import load_or_build_flat_ip_index
+from query_expansion import BILLING_QUERY_EXPANDER
+from query_cache import encode_queries
+from shared_engine import get_embedding_model, get_shared_system
+
 class BillingRAGSystem:
     def __init__(self, csv_path: str):
         """Initialize the RAG system with billing codes data."""
@@ -66,6 +72,42 @@ class BillingRAGSystem:
         # Categorize codes by type
         self.df['Code_Type'] = self.df['Code'].apply(self._categorize_code)
         
+        # Precompute per-code pricing variations so searches never scan the DataFrame
+        self._build_code_variations()
+        
+    def _build_code_variations(self):
+        """Index every code's rows, time-period labels, amounts and max amount."""
+        # Plain dict rows, aligned with FAISS ids (positional, like df.iloc)
+        self.records = self.df.to_dict('records')
+        self.code_variations = {}
+        
+        for position, record in enumerate(self.records):
+            entry = self.code_variations.setdefault(record['Code'], {
+                'rows': [],
+                'time_variations': [],
+                'max_amount': 0
+            })
+            
+            if record['Amount_Numeric'] > entry['max_amount']:
+                entry['max_amount'] = record['Amount_Numeric']
+            
+            # Extract time period from description or amount field
+            description = str(record['Description'])
+            time_period = "Regular hours"
+            if "Weekend" in description or "Holiday" in description:
+                time_period = "Weekend/Holiday"
+            elif "Night" in description:
+                time_period = "Night"
+            elif "evening" in description.lower() or "1700" in description:
+                time_period = "Evening"
+            
+            entry['rows'].append(position)
+            entry['time_variations'].append({
+                'time': time_period,
+                'amount': record['Amount ($CAD)'],
+                'amount_numeric': record['Amount_Numeric']
+            })
+        
     def _categorize_code(self, code: str) -> str:
         """Categorize billing codes by their prefix."""
         if code.startswith('A'):
@@ -97,48 +139,73 @@ class BillingRAGSystem:
     
     def setup_embeddings(self):
         """Set up sentence transformer model and create embeddings."""
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = get_embedding_model('all-MiniLM-L6-v2')
         
-        # Create embeddings for all descriptions
+        # Load the FAISS index from its snapshot, embedding and indexing only when stale
         descriptions = self.df['Enhanced_Description'].tolist()
-        self.code_embeddings = self.model.encode(descriptions)
-        
-        # Create FAISS index for fast similarity search
-        dimension = self.code_embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-        faiss.normalize_L2(self.code_embeddings)
-        self.index.add(self.code_embeddings)
+        self.index = load_or_build_flat_ip_index(
+            self.csv_path, 'billing', descriptions, self.model.model_name,
+            lambda: encode_cached(self.model, descriptions)
+        )
+    
+    def search_codes(self, query: str, search_mode: str = SEARCH_MODE,
+                     max_hits: int = RANGE_SEARCH_MAX_HITS) -> Dict:
+        """Search for relevant billing codes and categorize them.
+        
+        search_mode="range" asks the index only for vectors at or above the
+        relevance threshold (capped at max_hits); "exhaustive" ranks the whole
+        codebook. Both return the same results for the same threshold.
+        """
+        return self.search_codes_batch([query], search_mode, max_hits)[0]
     
-    def search_codes(self, query: str) -> Dict:
-        """Search for relevant billing codes and categorize them."""
-        # Expand the query with NLP understanding
-        expanded_query = self._expand_query_with_nlp(query)
+    def search_codes_batch(self, queries: List[str], search_mode: str = SEARCH_MODE,
+                           max_hits: int = RANGE_SEARCH_MAX_HITS) -> List[Dict]:
+        """Search many queries in one pass: one encoder call and one index search.
+        
+        Returns one result dict per query, identical to calling search_codes on it.
+        """
+        if not queries:
+            return []
+        
+        # Expand the queries with NLP understanding
+        expanded_queries = [self._expand_query_with_nlp(query) for query in queries]
         
         # Use both original and expanded query for better results
-        combined_query = f"{query} {expanded_query}"
+        combined_queries = [f"{query} {expanded}" for query, expanded in zip(queries, expanded_queries)]
         
-        query_embedding = self.model.encode([combined_query])
-        faiss.normalize_L2(query_embedding)
+        query_embeddings = encode_queries(self.model, combined_queries)
+        faiss.normalize_L2(query_embeddings)
         
-        # Search through all codes to find all relevant ones
-        scores, indices = self.index.search(query_embedding, len(self.df))
+        thresholds = [self._relevance_threshold(query) for query in queries]
+        hits = self._search_index(query_embeddings, thresholds, search_mode, max_hits)
         
+        return [
+            self._build_search_results(query, expanded, threshold, scores, indices)
+            for query, expanded, threshold, (scores, indices)
+            in zip(queries, expanded_queries, thresholds, hits)
+        ]
+    
+    @staticmethod
+    def _relevance_threshold(query: str) -> float:
+        """Dynamic relevance threshold based on query length and specificity."""
+        if len(query.split()) <= 2:
+            return 0.2  # Lower threshold for short queries
+        elif len(query.split()) <= 4:
+            return 0.15  # Lower threshold for medium queries
+        else:
+            return 0.1  # Lower threshold for detailed queries
+    
+    def _build_search_results(self, query: str, expanded_query: str, min_relevance_threshold: float,
+                              scores: np.ndarray, indices: np.ndarray) -> Dict:
+        """Turn ranked index hits for one query into categorized code results."""
         # Categorize results
         primary_codes = []  # 100% relevant codes
         add_on_codes = []   # Additional codes that can contribute to revenue
         seen_codes = set()  # Track seen codes to avoid duplicates
         
-        # Dynamic relevance threshold based on query length and specificity
-        if len(query.split()) <= 2:
-            min_relevance_threshold = 0.2  # Lower threshold for short queries
-        elif len(query.split()) <= 4:
-            min_relevance_threshold = 0.15  # Lower threshold for medium queries
-        else:
-            min_relevance_threshold = 0.1  # Lower threshold for detailed queries
-        
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.df):
-                row = self.df.iloc[idx]
+        for score, idx in zip(scores, indices):
+            if 0 <= idx < len(self.records):
+                row = self.records[idx]
                 code = row['Code']
                 
                 # Skip if we've already seen this code
@@ -151,29 +218,10 @@ class BillingRAGSystem:
                     
                 seen_codes.add(code)
                 
-                # Get all variations of this code to show time-based pricing
-                code_variations = self.df[self.df['Code'] == code]
-                time_variations = []
-                max_amount = 0
-                
-                for _, var_row in code_variations.iterrows():
-                    if var_row['Amount_Numeric'] > max_amount:
-                        max_amount = var_row['Amount_Numeric']
-                    
-                    # Extract time period from description or amount field
-                    time_period = "Regular hours"
-                    if "Weekend" in str(var_row['Description']) or "Holiday" in str(var_row['Description']):
-                        time_period = "Weekend/Holiday"
-                    elif "Night" in str(var_row['Description']):
-                        time_period = "Night"
-                    elif "evening" in str(var_row['Description']).lower() or "1700" in str(var_row['Description']):
-                        time_period = "Evening"
-                    
-                    time_variations.append({
-                        'time': time_period,
-                        'amount': var_row['Amount ($CAD)'],
-                        'amount_numeric': var_row['Amount_Numeric']
-                    })
+                # All variations of this code (time-based pricing), precomputed in load_data
+                variations = self.code_variations[code]
+                time_variations = [dict(var) for var in variations['time_variations']]
+                max_amount = variations['max_amount']
                 
                 # Generate relevance explanation
                 relevance_explanation = self._generate_relevance_explanation(query, code, row, float(score))
@@ -209,7 +257,35 @@ class BillingRAGSystem:
             'expanded_query': expanded_query
         }
     
-    def _generate_relevance_explanation(self, query: str, code: str, row: pd.Series, similarity_score: float) -> str:
+    def _search_index(self, query_embeddings: np.ndarray, thresholds: List[float],
+                      search_mode: str, max_hits: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (scores, row ids) per normalized query, best first."""
+        if search_mode == "exhaustive":
+            scores, indices = self.index.search(query_embeddings, len(self.records))
+            return list(zip(scores, indices))
+        if search_mode != "range":
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        
+        # FAISS keeps inner products strictly above the radius; step one float
+        # below each threshold so scores equal to it are kept, as in exhaustive mode
+        radii = [np.nextafter(np.float32(t), np.float32(-np.inf)) for t in thresholds]
+        lims, all_scores, all_indices = self.index.range_search(query_embeddings, float(min(radii)))
+        
+        hits = []
+        for i, radius in enumerate(radii):
+            scores, indices = all_scores[lims[i]:lims[i + 1]], all_indices[lims[i]:lims[i + 1]]
+            keep = scores > radius
+            scores, indices = scores[keep], indices[keep]
+            
+            # Best first, ties by row id; only the hits are sorted, not the codebook
+            if len(scores) > max_hits:
+                top = np.argpartition(-scores, max_hits - 1)[:max_hits]
+                scores, indices = scores[top], indices[top]
+            order = np.lexsort((indices, -scores))
+            hits.append((scores[order], indices[order]))
+        return hits
+    
+    def _generate_relevance_explanation(self, query: str, code: str, row: Dict, similarity_score: float) -> str:
         """Generate an explanation for why this code is relevant to the search query."""
         
         # Extract key terms from query
@@ -419,134 +495,7 @@ class BillingRAGSystem:
     
     def _expand_query_with_nlp(self, query: str) -> str:
         """Expand natural language queries with medical terminology and synonyms."""
-        query_lower = query.lower().strip()
-        
-        # Medical term expansions and synonyms
-        medical_expansions = {
-            # Symptoms to assessments
-            'chest pain': 'chest pain assessment evaluation examination',
-            'abdominal pain': 'abdominal pain assessment evaluation examination',
-            'headache': 'headache assessment evaluation examination',
-            'back pain': 'back pain assessment evaluation examination',
-            'shortness of breath': 'shortness of breath assessment evaluation examination',
-            'dizziness': 'dizziness assessment evaluation examination',
-            'nausea': 'nausea assessment evaluation examination',
-            'fever': 'fever assessment evaluation examination',
-            
-            # Injuries to procedures
-            'broken bone': 'fracture reduction repair',
-            'cut': 'laceration repair suture',
-            'wound': 'laceration repair wound care',
-            'burn': 'burn treatment debridement',
-            'sprain': 'sprain treatment dislocation',
-            'dislocation': 'dislocation reduction',
-            
-            # General terms to specific procedures
-            'surgery': 'surgical procedure operation',
-            'operation': 'surgical procedure operation',
-            'procedure': 'medical procedure intervention',
-            'treatment': 'medical treatment intervention',
-            'examination': 'assessment evaluation examination',
-            'checkup': 'assessment evaluation examination',
-            'consultation': 'consultation assessment evaluation',
-            
-            # Emergency terms
-            'emergency': 'emergency department urgent critical',
-            'urgent': 'emergency department urgent critical',
-            'critical': 'critical care emergency urgent',
-            'trauma': 'trauma critical care emergency',
-            'accident': 'trauma emergency critical care',
-            
-            # Anesthesia terms
-            'anesthesia': 'anesthesia sedation pain management',
-            'sedation': 'anesthesia sedation pain management',
-            'numbing': 'anesthesia local anesthesia',
-            
-            # Time-based terms
-            'night': 'night shift after hours',
-            'weekend': 'weekend holiday after hours',
-            'after hours': 'after hours evening night weekend',
-            'evening': 'evening after hours',
-            
-            # Patient types
-            'child': 'pediatric child infant',
-            'baby': 'pediatric infant newborn',
-            'elderly': 'geriatric elderly senior',
-            'adult': 'adult patient',
-            
-            # Body parts
-            'heart': 'cardiac heart cardiovascular',
-            'lung': 'pulmonary lung respiratory',
-            'brain': 'neurological brain head',
-            'spine': 'spinal vertebral back',
-            'knee': 'knee joint orthopedic',
-            'shoulder': 'shoulder joint orthopedic',
-            'wrist': 'wrist joint orthopedic',
-            'ankle': 'ankle joint orthopedic',
-            
-            # Medical abbreviations
-            'mi': 'myocardial infarction heart attack cardiac',
-            'cva': 'cerebrovascular accident stroke neurological',
-            'copd': 'chronic obstructive pulmonary disease lung respiratory',
-            'chf': 'congestive heart failure cardiac heart',
-            'dm': 'diabetes mellitus diabetic',
-            'htn': 'hypertension blood pressure cardiac',
-            
-            # Common medical terms
-            'heart attack': 'myocardial infarction cardiac emergency',
-            'stroke': 'cerebrovascular accident neurological emergency',
-            'seizure': 'seizure neurological emergency',
-            'allergic reaction': 'allergic reaction anaphylaxis emergency',
-            'shock': 'shock critical care emergency',
-            'bleeding': 'hemorrhage bleeding emergency',
-            'unconscious': 'unconscious emergency critical care',
-            'respiratory distress': 'respiratory distress breathing emergency'
-        }
-        
-        # Expand the query - check for multi-word phrases first
-        expanded_terms = []
-        remaining_query = query_lower
-        
-        # Check for multi-word phrases first (longer phrases take priority)
-        for phrase, expansion in sorted(medical_expansions.items(), key=lambda x: len(x[0]), reverse=True):
-            if phrase in remaining_query:
-                expanded_terms.append(expansion)
-                remaining_query = remaining_query.replace(phrase, '').strip()
-        
-        # Then check individual terms
-        for term in remaining_query.split():
-            if term in medical_expansions:
-                expanded_terms.append(medical_expansions[term])
-            else:
-                # Check for partial matches
-                for key, expansion in medical_expansions.items():
-                    if term in key or key in term:
-                        expanded_terms.append(expansion)
-                        break
-                else:
-                    # Keep original term if no expansion found
-                    expanded_terms.append(term)
-        
-        # Combine all terms and remove duplicates
-        expanded_query = ' '.join(expanded_terms)
-        # Remove duplicate words while preserving order
-        words = expanded_query.split()
-        seen = set()
-        unique_words = []
-        for word in words:
-            if word not in seen:
-                seen.add(word)
-                unique_words.append(word)
-        expanded_query = ' '.join(unique_words)
-        
-        # Add common medical procedure suffixes if not present
-        if not any(suffix in expanded_query for suffix in ['assessment', 'evaluation', 'examination', 'procedure', 'treatment']):
-            if any(symptom in expanded_query for symptom in ['pain', 'ache', 'discomfort']):
-                expanded_query += ' assessment evaluation examination'
-            elif any(injury in expanded_query for injury in ['fracture', 'break', 'cut', 'wound', 'laceration']):
-                expanded_query += ' repair treatment procedure'
-        
-        return expanded_query
+        return BILLING_QUERY_EXPANDER.expand(query)
 
 def main():
     st.set_page_config(
@@ -558,12 +507,12 @@ def main():
     st.title("💰 Medical Billing Revenue Optimization Assistant")
     st.markdown("**AI-powered billing code search and revenue optimization for medical professionals**")
     
-    # Initialize the RAG system
-    if 'rag_system' not in st.session_state:
-        with st.spinner("Loading billing codes database..."):
-            st.session_state.rag_system = BillingRAGSystem("Codes_by_class.csv")
-    
-    rag_system = st.session_state.rag_system
+    # Shared, read-only RAG system (one per server process, not per session)
+    with st.spinner("Loading billing codes database..."):
+        rag_system = get_shared_system(
+            (BillingRAGSystem, "Codes_by_class.csv"),
+            lambda: BillingRAGSystem("Codes_by_class.csv")
+        )
     
     # Sidebar for navigation
     st.sidebar.title("Navigation")
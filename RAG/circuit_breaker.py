@@ -0,0 +1,159 @@
+"""
+Process-wide circuit breakers for remote dependencies (Pinecone, LLM providers).
+
+Each breaker tracks the outcome of the last ``window`` calls to one
+dependency. Once at least ``min_calls`` have been seen and the failure rate
+reaches ``failure_rate``, the circuit opens: calls are rejected immediately
+with ``CircuitOpenError`` so callers can serve their fallback (local FAISS, a
+retrieval-only answer) in milliseconds instead of waiting for a client
+timeout. After ``reset_seconds`` the circuit goes half-open and lets a single
+trial call through; its success closes the circuit, its failure re-opens it.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+from config_advanced import (BREAKER_FAILURE_RATE, BREAKER_MIN_CALLS, BREAKER_RESET_SECONDS,
+                             BREAKER_WINDOW)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_breakers: Dict[str, "CircuitBreaker"] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with closed, open and half-open states."""
+
+    def __init__(self, name: str, failure_rate: float = BREAKER_FAILURE_RATE,
+                 window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_seconds = reset_seconds
+
+        self._outcomes: deque = deque(maxlen=window)  # True = success
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+        # Counters (guarded by _lock)
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def rejecting(self) -> bool:
+        """True (and counted as a rejection) while calls would not reach the dependency.
+
+        Unlike ``allow`` this never claims the half-open trial call, so callers
+        can check it before deciding whether to go through ``call`` at all.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                rejecting = time.monotonic() - self._opened_at < self.reset_seconds
+            else:
+                rejecting = self._state == HALF_OPEN and self._trial_running
+            if rejecting:
+                self.rejected += 1
+            return rejecting
+
+    def allow(self) -> bool:
+        """Claim permission for one call; False means serve the fallback instead."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    self.rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._trial_running = False
+            if self._state == HALF_OPEN:
+                if self._trial_running:
+                    self.rejected += 1
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                print(f"✅ Circuit '{self.name}' closed")
+                self._state = CLOSED
+                self._trial_running = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def _open(self):
+        print(f"⚠️ Circuit '{self.name}' opened; failing fast for {self.reset_seconds:.0f}s")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._trial_running = False
+        self.opened += 1
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call ``fn`` through the breaker, raising CircuitOpenError when it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict:
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            return {
+                'state': state,
+                'window_calls': calls,
+                'window_failure_rate': failures / calls if calls else 0.0,
+                'rejected': self.rejected,
+                'opened': self.opened,
+            }
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide breaker for the dependency ``name``."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name)
+            _breakers[name] = breaker
+        return breaker
+
+
+def breaker_stats() -> Dict[str, Dict]:
+    """State and counters of every breaker created in this process."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
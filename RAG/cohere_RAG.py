@@ -12,48 +12,70 @@ Run modes:
   python cohere_RAG.py                 # interactive REPL
   python cohere_RAG.py "your question" # one-shot
   python cohere_RAG.py --json "..."    # JSON output (good for the web app)
+  python cohere_RAG.py --serve         # warm index over local HTTP/JSON (POST /retrieve, /answer; GET /health)
+  python cohere_RAG.py --batch FILE    # answer a file of questions into FILE.answers.jsonl (resumable)
 
 API key: set COHERE_API_KEY in the environment or RAG/.env (never commit .env).
 """
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
+import pickle
 import re
 import sys
-from dataclasses import dataclass, field
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from typing import Iterator
 
-import cohere
 import numpy as np
 from dotenv import load_dotenv
-from rank_bm25 import BM25Okapi
 from rich.console import Console
 
+from json_server import BadRequest, serve_json
+from sparse_bm25 import SparseBM25
+from sparse_tfidf import SparseTfidf
+from streaming import TimedStream
+from topk import top_k_indices
+
 # Make sure Unicode (rich box drawing) prints on Windows terminals
 if hasattr(sys.stdout, "reconfigure"):
     try:
         sys.stdout.reconfigure(encoding="utf-8")
     except Exception:  # noqa: BLE001
         pass
+from rich.live import Live
 from rich.markdown import Markdown
 from rich.panel import Panel
+from rich.progress import Progress
 from rich.table import Table
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Config
 # ─────────────────────────────────────────────────────────────────────────────
 HERE = Path(__file__).resolve().parent
 CODES_PATH = HERE / "Codes_by_class.json"
+SNAPSHOT_DIR_NAME = ".index_snapshots"  # shared with index_snapshot.py, next to the codebook
+SNAPSHOT_FORMAT_VERSION = 1
 ENV_PATH = HERE / ".env"
 
 TOP_K_RETRIEVE = 30   # candidates from each retriever before fusion
 TOP_K_FINAL = 8       # merged docs passed to the LLM
 MODEL = "command-a-03-2025"
 
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+SERVE_WORKERS = 4         # requests handled concurrently in --serve mode
+SERVE_MAX_PENDING = 16    # running + queued requests before answering 503
+
+BATCH_CONCURRENCY = 4     # Cohere calls in flight in --batch mode
+BATCH_RATE = 2.0          # Cohere calls started per second in --batch mode (0 = unlimited)
+
 console = Console()
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -74,7 +96,19 @@ if not _API_KEY:
     )
     sys.exit(1)
 
-co = cohere.ClientV2(_API_KEY)
+_client_instance = None
+_client_lock = threading.Lock()
+
+
+def _client():
+    """The Cohere client, created on first use; importing the SDK takes longer than loading the index."""
+    global _client_instance
+    with _client_lock:
+        if _client_instance is None:
+            import cohere
+
+            _client_instance = cohere.ClientV2(_API_KEY)
+        return _client_instance
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -215,25 +249,44 @@ class HybridRetriever:
         self.code_index: dict[str, int] = {d.code.upper(): i for i, d in enumerate(docs)}
 
         tokens = [tokenize(d.search_text) for d in docs]
-        self.bm25 = BM25Okapi(tokens)
+        self.bm25 = SparseBM25(tokens)
 
-        self.tfidf = TfidfVectorizer(
+        # scikit-learn is slow to import and only needed to fit; snapshots load without it
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(
             lowercase=True,
             stop_words="english",
             ngram_range=(1, 2),
             min_df=1,
             max_df=0.9,
         )
-        self.tfidf_matrix = self.tfidf.fit_transform([d.search_text for d in docs])
+        self.tfidf = SparseTfidf(vectorizer, vectorizer.fit_transform([d.search_text for d in docs]))
+
+    def to_state(self) -> dict:
+        """The fitted index as plain data, picklable whether this file runs as a script or a module."""
+        return {
+            "docs": [asdict(d) for d in self.docs],
+            "bm25": self.bm25,
+            "tfidf": self.tfidf,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> HybridRetriever:
+        self = cls.__new__(cls)
+        self.docs = [
+            MergedDoc(**{**d, "rates": [Rate(**r) for r in d["rates"]]}) for d in state["docs"]
+        ]
+        self.code_index = {d.code.upper(): i for i, d in enumerate(self.docs)}
+        self.bm25 = state["bm25"]
+        self.tfidf = state["tfidf"]
+        return self
 
     def _bm25_top(self, query: str, k: int) -> list[int]:
-        scores = self.bm25.get_scores(tokenize(query))
-        return list(np.argsort(scores)[::-1][:k])
+        return self.bm25.top_n(tokenize(query), k)
 
     def _tfidf_top(self, query: str, k: int) -> list[int]:
-        qv = self.tfidf.transform([query])
-        sims = cosine_similarity(qv, self.tfidf_matrix).ravel()
-        return list(np.argsort(sims)[::-1][:k])
+        return top_k_indices(self.tfidf.get_scores(query), k).tolist()
 
     @staticmethod
     def _rrf(rankings: list[list[int]], k: int = 60) -> dict[int, float]:
@@ -255,6 +308,38 @@ class HybridRetriever:
         # 1) Both retrievers
         bm = self._bm25_top(query, candidates)
         tf = self._tfidf_top(query, candidates)
+        return self._fuse(query, bm, tf, top_k, time_slot)
+
+    def retrieve_batch(
+        self,
+        queries: list[str],
+        top_k: int = TOP_K_FINAL,
+        candidates: int = TOP_K_RETRIEVE,
+        time_slots: list[str | None] | None = None,
+        chunk_size: int = 512,
+    ) -> list[list[tuple[MergedDoc, float, list[str]]]]:
+        """``retrieve`` for many queries; each ranker scores a chunk of queries in one sparse product."""
+        time_slots = time_slots or [None] * len(queries)
+        results = []
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            bm25_scores = self.bm25.get_scores_batch([tokenize(q) for q in chunk])
+            tfidf_scores = self.tfidf.get_scores_batch(chunk)
+            for i, query in enumerate(chunk):
+                bm = top_k_indices(bm25_scores[i], candidates).tolist()
+                tf = top_k_indices(tfidf_scores[i], candidates).tolist()
+                results.append(self._fuse(query, bm, tf, top_k, time_slots[start + i]))
+        return results
+
+    def _fuse(
+        self,
+        query: str,
+        bm: list[int],
+        tf: list[int],
+        top_k: int,
+        time_slot: str | None,
+    ) -> list[tuple[MergedDoc, float, list[str]]]:
+        """Fuse the BM25 and TF-IDF candidates, then apply the code-match and time-slot boosts."""
         fused = self._rrf([bm, tf])
 
         why: dict[int, list[str]] = {i: [] for i in fused}
@@ -278,8 +363,53 @@ class HybridRetriever:
                     fused[idx] += 0.15
                     why.setdefault(idx, []).append(f"slot:{time_slot}")
 
-        ranked = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
-        return [(self.docs[i], s, why.get(i, [])) for i, s in ranked]
+        # Ties keep fusion order (BM25 ranks first), as a stable sort would
+        ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+        scores = np.fromiter(fused.values(), dtype=np.float64, count=len(fused))
+        return [
+            (self.docs[ids[j]], float(scores[j]), why.get(int(ids[j]), []))
+            for j in top_k_indices(scores, top_k)
+        ]
+
+
+def _snapshot_key(path: Path) -> dict:
+    return {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "source_sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+    }
+
+
+def load_retriever(path: Path = CODES_PATH) -> tuple[HybridRetriever, bool]:
+    """Return (retriever, from_snapshot) for the codebook at ``path``.
+
+    The fitted index is pickled to ``.index_snapshots/`` next to ``path``,
+    behind a small header holding the codebook's SHA-256; the snapshot is only
+    used while that hash (and the snapshot format) still matches, otherwise the
+    index is rebuilt and the snapshot rewritten. Bump SNAPSHOT_FORMAT_VERSION
+    when indexing changes.
+    """
+    key = _snapshot_key(path)
+    snapshot = path.parent / SNAPSHOT_DIR_NAME / f"{path.stem}.cohere_index.pkl"
+    try:
+        with open(snapshot, "rb") as f:
+            if pickle.load(f) == key:
+                return HybridRetriever.from_state(pickle.load(f)), True
+    except FileNotFoundError:
+        pass
+    except Exception as e:  # noqa: BLE001 - a broken snapshot only costs a rebuild
+        print(f"Ignoring unreadable index snapshot {snapshot.name}: {e}", file=sys.stderr)
+
+    retriever = HybridRetriever(load_and_merge(path))
+    try:
+        snapshot.parent.mkdir(parents=True, exist_ok=True)
+        tmp = snapshot.with_suffix(".pkl.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(retriever.to_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot)
+    except OSError as e:
+        print(f"Could not write index snapshot: {e}", file=sys.stderr)
+    return retriever, False
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -379,7 +509,7 @@ def generate(query: str, retrieved: list[tuple[MergedDoc, float, list[str]]]) ->
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": query},
     ]
-    response = co.chat(
+    response = _client().chat(
         model=MODEL,
         messages=messages,
         documents=documents,
@@ -390,6 +520,33 @@ def generate(query: str, retrieved: list[tuple[MergedDoc, float, list[str]]]) ->
     return text, citations
 
 
+def generate_stream(
+    query: str,
+    retrieved: list[tuple[MergedDoc, float, list[str]]],
+    citations: list | None = None,
+) -> TimedStream:
+    """Streaming ``generate``: iterate for answer text; citations are appended to ``citations``.
+
+    The returned stream records time to first token (``.ttft``) and total time.
+    """
+    start = time.perf_counter()
+    documents = [render_doc_for_llm(d) for d, _, _ in retrieved]
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": query},
+    ]
+
+    def chunks() -> Iterator[str]:
+        for event in _client().chat_stream(model=MODEL, messages=messages, documents=documents, temperature=0.2):
+            if event.type == "content-delta":
+                yield event.delta.message.content.text
+            elif event.type == "citation-start" and citations is not None:
+                cited = event.delta.message.citations
+                citations.extend(cited if isinstance(cited, list) else [cited])
+
+    return TimedStream(chunks(), f"cohere:{MODEL}", start)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 4) Presentation
 # ─────────────────────────────────────────────────────────────────────────────
@@ -400,13 +557,23 @@ def show_results(
     answer: str,
     citations: list,
 ) -> None:
+    show_question(query, time_slot)
+    console.print(answer_panel(answer))
+    show_context(retrieved, citations)
+
+
+def show_question(query: str, time_slot: str | None) -> None:
     header = f"[bold]{query}[/bold]"
     if time_slot:
         header += f"\n[dim]Detected time-of-day:[/dim] [cyan]{time_slot}[/cyan]"
     console.print(Panel(header, title="Question", border_style="cyan"))
 
-    console.print(Panel(Markdown(answer or "(no answer returned)"), title="Answer", border_style="green"))
 
+def answer_panel(answer: str) -> Panel:
+    return Panel(Markdown(answer or "(no answer returned)"), title="Answer", border_style="green")
+
+
+def show_context(retrieved: list[tuple[MergedDoc, float, list[str]]], citations: list) -> None:
     # Retrieval table
     rtable = Table(title=f"Retrieved context (top {len(retrieved)})", show_lines=False)
     rtable.add_column("Code", style="bold magenta")
@@ -445,31 +612,35 @@ def show_results(
             console.print(ctable)
 
 
-def show_json(
+def retrieved_json(retrieved: list[tuple[MergedDoc, float, list[str]]]) -> list[dict]:
+    return [
+        {
+            "code": d.code,
+            "description": d.description,
+            "category": d.category,
+            "score": round(s, 4),
+            "why": why,
+            "rates": [
+                {"slot": r.slot, "amount": r.amount, "amount_raw": r.amount_raw, "note": r.note}
+                for r in d.rates
+            ],
+        }
+        for d, s, why in retrieved
+    ]
+
+
+def json_payload(
     query: str,
     time_slot: str | None,
     retrieved: list[tuple[MergedDoc, float, list[str]]],
     answer: str,
     citations: list,
-) -> None:
-    payload = {
+) -> dict:
+    return {
         "query": query,
         "time_slot": time_slot,
         "answer_markdown": answer,
-        "retrieved": [
-            {
-                "code": d.code,
-                "description": d.description,
-                "category": d.category,
-                "score": round(s, 4),
-                "why": why,
-                "rates": [
-                    {"slot": r.slot, "amount": r.amount, "amount_raw": r.amount_raw, "note": r.note}
-                    for r in d.rates
-                ],
-            }
-            for d, s, why in retrieved
-        ],
+        "retrieved": retrieved_json(retrieved),
         "citations": [
             {
                 "text": c.text,
@@ -481,7 +652,179 @@ def show_json(
             for c in citations
         ],
     }
-    print(json.dumps(payload, indent=2, ensure_ascii=False))
+
+
+def show_json(
+    query: str,
+    time_slot: str | None,
+    retrieved: list[tuple[MergedDoc, float, list[str]]],
+    answer: str,
+    citations: list,
+) -> None:
+    print(json.dumps(json_payload(query, time_slot, retrieved, answer, citations), indent=2, ensure_ascii=False))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch — a file of questions in, one JSON answer per line out
+# ─────────────────────────────────────────────────────────────────────────────
+class RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def batch_id(query: str) -> str:
+    """Stable id for a question without one: a hash of its normalized text, so edits elsewhere in the file don't shift it."""
+    return "q-" + hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:16]
+
+
+def read_batch(path: Path) -> list[dict]:
+    """Questions from ``path``: JSONL objects with "query" (optional "id", "slot"), or one per line.
+
+    Questions without an "id" are identified by ``batch_id`` of their text; a
+    repeat of such a question is answered once.
+    """
+    items: list[dict] = []
+    seen: set[str] = set()
+    for line_no, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path.name}:{line_no}: invalid JSON ({e})") from None
+            query = record.get("query")
+            if not isinstance(query, str) or not query.strip():
+                raise ValueError(f"{path.name}:{line_no}: missing \"query\"")
+            query, explicit_id, slot = query.strip(), record.get("id"), record.get("slot")
+        else:
+            query, explicit_id, slot = line, None, None
+        item_id = batch_id(query) if explicit_id is None else str(explicit_id)
+        if item_id in seen:
+            if explicit_id is None:
+                continue  # same question again
+            raise ValueError(f"{path.name}:{line_no}: duplicate id {item_id!r}")
+        seen.add(item_id)
+        items.append({"id": item_id, "query": query, "slot": slot})
+    return items
+
+
+def answered_ids(out_path: Path, items: list[dict]) -> set[str]:
+    """Ids of ``items`` already answered in ``out_path`` for the same question.
+
+    Records with an "error", or whose stored query no longer matches the
+    item's (the input file was edited), don't count and are answered again.
+    """
+    done: set[str] = set()
+    if not out_path.exists():
+        return done
+    queries = {item["id"]: normalize_query(item["query"]) for item in items}
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line of an interrupted run
+            record_id = str(record.get("id"))
+            if "error" not in record and queries.get(record_id) == normalize_query(str(record.get("query", ""))):
+                done.add(record_id)
+    return done
+
+
+def run_batch(
+    retriever: HybridRetriever,
+    in_path: Path,
+    out_path: Path,
+    concurrency: int,
+    rate: float,
+    slot_override: str | None = None,
+    restart: bool = False,
+) -> None:
+    """Answer every question in ``in_path``, appending ``show_json`` records (plus "id") to ``out_path``.
+
+    Rerunning resumes: ids already answered in ``out_path`` are skipped, failed
+    ones are retried and appended again (the last record for an id wins).
+    """
+    items = read_batch(in_path)
+    if restart and out_path.exists():
+        out_path.unlink()
+    done = answered_ids(out_path, items)
+    todo = [item for item in items if item["id"] not in done]
+    console.print(f"[green]{len(items)}[/green] questions, {len(items) - len(todo)} already answered in [dim]{out_path.name}[/dim]")
+    if not todo:
+        return
+
+    started = time.perf_counter()
+    slots = [slot_override or item["slot"] or detect_time_slot(item["query"]) for item in todo]
+    retrieved_all = retriever.retrieve_batch([item["query"] for item in todo], top_k=TOP_K_FINAL, time_slots=slots)
+    console.print(f"Retrieved for {len(todo)} questions in {time.perf_counter() - started:.2f} s")
+
+    limiter = RateLimiter(rate)
+
+    def answer_one(item: dict, slot: str | None, retrieved: list) -> dict:
+        limiter.wait()
+        text, citations = generate(item["query"], retrieved)
+        return {"id": item["id"], **json_payload(item["query"], slot, retrieved, text, citations)}
+
+    # Torn last line from an interrupted run: start the next record on its own line
+    if out_path.exists() and out_path.stat().st_size:
+        with open(out_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    else:
+        needs_newline = False
+
+    failed = 0
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        with open(out_path, "a", encoding="utf-8") as out, Progress(console=console) as progress:
+            if needs_newline:
+                out.write("\n")
+            task = progress.add_task("Generating", total=len(todo))
+            futures = {
+                pool.submit(answer_one, item, slot, retrieved): (item, slot, retrieved)
+                for item, slot, retrieved in zip(todo, slots, retrieved_all)
+            }
+            for future in as_completed(futures):
+                item, slot, retrieved = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:  # noqa: BLE001 - recorded, retried on the next run
+                    failed += 1
+                    record = {
+                        "id": item["id"],
+                        "query": item["query"],
+                        "time_slot": slot,
+                        "retrieved": retrieved_json(retrieved),
+                        "error": f"{type(e).__name__}: {e}",
+                    }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                progress.advance(task)
+    except KeyboardInterrupt:
+        console.print("[yellow]Interrupted[/yellow] — rerun the same command to resume")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    retry = " (retried on the next run)" if failed else ""
+    console.print(f"Done in {time.perf_counter() - started:.1f} s; {failed} failed{retry}")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -499,28 +842,108 @@ def answer_query(retriever: HybridRetriever, query: str, slot_override: str | No
     return slot, retrieved, text, citations
 
 
+def _query_from(body: dict) -> tuple[str, str | None]:
+    query = body.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise BadRequest("'query' must be a non-empty string")
+    slot = body.get("slot")
+    if slot is not None and not isinstance(slot, str):
+        raise BadRequest("'slot' must be a string")
+    return query.strip(), slot
+
+
+def serve(retriever: HybridRetriever, health: dict, host: str, port: int, workers: int, max_pending: int) -> None:
+    """Keep ``retriever`` warm and answer POST /retrieve and POST /answer over local HTTP/JSON."""
+
+    def retrieve(body: dict) -> dict:
+        query, slot_override = _query_from(body)
+        top_k = body.get("top_k", TOP_K_FINAL)
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= len(retriever.docs):
+            raise BadRequest(f"'top_k' must be an integer from 1 to {len(retriever.docs)}")
+        slot = slot_override or detect_time_slot(query)
+        retrieved = retriever.retrieve(query, top_k=top_k, time_slot=slot)
+        return {"query": query, "time_slot": slot, "retrieved": retrieved_json(retrieved)}
+
+    def answer(body: dict) -> dict:
+        query, slot_override = _query_from(body)
+        return json_payload(query, *answer_query(retriever, query, slot_override))
+
+    routes = {("POST", "/retrieve"): retrieve, ("POST", "/answer"): answer}
+    console.print(
+        f"[green]Serving[/green] on [bold]http://{host}:{port}[/bold] "
+        f"({workers} workers, {max_pending} pending max) — "
+        "POST /retrieve, POST /answer, GET /health; Ctrl+C to stop"
+    )
+    serve_json(routes, lambda: health, host, port, workers, max_pending)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="OHIP billing RAG (Cohere)")
     parser.add_argument("query", nargs="?", help="Question. Omit to enter interactive mode.")
     parser.add_argument("--slot", help="Force time slot: Day | Evening | Night | Weekend | Holiday")
     parser.add_argument("--json", action="store_true", help="Emit JSON instead of pretty terminal output")
     parser.add_argument("--top-k", type=int, default=TOP_K_FINAL, help=f"Docs passed to LLM (default {TOP_K_FINAL})")
+    parser.add_argument("--serve", action="store_true", help="Keep the index loaded and serve it over local HTTP/JSON")
+    parser.add_argument("--host", default=SERVE_HOST, help=f"--serve bind address (default {SERVE_HOST})")
+    parser.add_argument("--port", type=int, default=SERVE_PORT, help=f"--serve port (default {SERVE_PORT})")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help=f"--serve worker threads (default {SERVE_WORKERS})")
+    parser.add_argument("--max-pending", type=int, default=SERVE_MAX_PENDING,
+                        help=f"--serve requests running or queued before 503 (default {SERVE_MAX_PENDING})")
+    parser.add_argument("--batch", type=Path, metavar="FILE",
+                        help="Answer every question in FILE (one per line, or JSONL with \"query\"/\"id\"/\"slot\")")
+    parser.add_argument("--out", type=Path, help="--batch output JSONL (default FILE.answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"--batch Cohere calls in flight (default {BATCH_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE,
+                        help=f"--batch Cohere calls started per second, 0 = unlimited (default {BATCH_RATE})")
+    parser.add_argument("--restart", action="store_true", help="--batch: discard existing output instead of resuming")
     args = parser.parse_args()
 
     with console.status("[cyan]Loading and indexing OHIP codebook…", spinner="dots"):
-        docs = load_and_merge(CODES_PATH)
-        retriever = HybridRetriever(docs)
+        started = time.perf_counter()
+        retriever, from_snapshot = load_retriever(CODES_PATH)
+        index_seconds = time.perf_counter() - started
     if not args.json:
-        console.print(f"[green]Indexed[/green] [bold]{len(docs)}[/bold] unique OHIP codes from [dim]{CODES_PATH.name}[/dim]\n")
+        source = "snapshot of " if from_snapshot else ""
+        console.print(f"[green]Indexed[/green] [bold]{len(retriever.docs)}[/bold] unique OHIP codes from [dim]{source}{CODES_PATH.name}[/dim]\n")
+
+    if args.serve:
+        health = {
+            "codebook": CODES_PATH.name,
+            "docs": len(retriever.docs),
+            "index_seconds": round(index_seconds, 3),
+            "from_snapshot": from_snapshot,
+            "model": MODEL,
+        }
+        serve(retriever, health, args.host, args.port, args.workers, args.max_pending)
+        return
+
+    if args.batch:
+        out_path = args.out or args.batch.with_suffix(".answers.jsonl")
+        run_batch(retriever, args.batch, out_path, args.concurrency, args.rate, args.slot, args.restart)
+        return
 
     def run_one(q: str) -> None:
         if args.json:
             slot, retrieved, text, citations = answer_query(retriever, q, args.slot)
             show_json(q, slot, retrieved, text, citations)
         else:
-            with console.status("[blue]Retrieving and asking the model…", spinner="dots"):
-                slot, retrieved, text, citations = answer_query(retriever, q, args.slot)
-            show_results(q, slot, retrieved, text, citations)
+            slot = args.slot or detect_time_slot(q)
+            retrieved = retriever.retrieve(q, top_k=TOP_K_FINAL, time_slot=slot)
+            show_question(q, slot)
+
+            # Render the answer as it streams in
+            citations: list = []
+            stream = generate_stream(q, retrieved, citations)
+            text = ""
+            with Live(answer_panel("…"), console=console, refresh_per_second=12) as live:
+                for chunk in stream:
+                    text += chunk
+                    live.update(answer_panel(text))
+                live.update(answer_panel(text))
+            if stream.ttft is not None:
+                console.print(f"[dim]First token after {stream.ttft * 1000:.0f} ms, complete after {stream.total:.1f} s[/dim]")
+            show_context(retrieved, citations)
 
     if args.query:
         run_one(args.query)
@@ -4,6 +4,7 @@ Configuration file for Medical Billing RAG Assistant
 
 # Model Configuration
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+ENCODE_BATCH_SIZE = 16  # texts per encoder call when ingesting (padding makes bigger batches slower on CPU)
 DEFAULT_TOP_K = 10
 MAX_SEARCH_RESULTS = 20
 
@@ -98,3 +99,7 @@ PAGE_LAYOUT = "wide"
 # Search Configuration
 MIN_SIMILARITY_THRESHOLD = 0.3
 SEARCH_TIMEOUT = 30  # seconds
+SEARCH_MODE = "range"  # "range" (threshold-driven) or "exhaustive" (rank whole codebook)
+RANGE_SEARCH_MAX_HITS = 1000  # hard cap on hits returned by a range search
+QUERY_CACHE_MAX_ENTRIES = 2048  # query embeddings kept by the shared LRU cache
+QUERY_CACHE_TTL_SECONDS = 12 * 60 * 60  # None disables expiry
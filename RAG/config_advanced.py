@@ -12,10 +12,49 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "sk-or-v1-5b461543f3a734541
 PINECONE_ENVIRONMENT = "us-east-1"
 PINECONE_INDEX_NAME = "medical-billing-codes"
 
+# Vector store: "pinecone" (hosted) or "local" (in-process stand-in, see vector_store.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+LOCAL_VECTOR_BACKEND = os.getenv("LOCAL_VECTOR_BACKEND", "numpy")  # "numpy" or "faiss"
+LOCAL_VECTOR_LATENCY_MS = float(os.getenv("LOCAL_VECTOR_LATENCY_MS", "0"))  # injected per call
+LOCAL_VECTOR_JITTER_MS = float(os.getenv("LOCAL_VECTOR_JITTER_MS", "0"))  # uniform extra delay
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR")  # persist local indexes here when set
+
+# "full": index metadata carries all fields and text; "light": ids + filter fields only,
+# query results hydrated from the local doc store (see doc_store.py)
+PINECONE_METADATA_MODE = os.getenv("PINECONE_METADATA_MODE", "full")
+
+# Retrieval: "pinecone" (local FAISS only after a Pinecone error) or "hedged"
+# (query both concurrently; serve Pinecone if it answers within the deadline, else FAISS)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "pinecone")
+HEDGE_DEADLINE_MS = float(os.getenv("HEDGE_DEADLINE_MS", "300"))
+
+# Circuit breakers around Pinecone and the LLM providers: open after BREAKER_FAILURE_RATE
+# of the last BREAKER_WINDOW calls failed (at least BREAKER_MIN_CALLS seen), then fail fast
+# for BREAKER_RESET_SECONDS before letting one trial call through
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
 # OpenRouter Configuration
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_MODEL = "meta-llama/llama-3.2-3b-instruct:free"  # Free model
 
+# Claude models for the Pinecone/hybrid agents, in order of preference. Requests go to the
+# last model that answered; failed models are re-probed in the background on this schedule
+CLAUDE_MODELS = [
+    "claude-3-5-sonnet-20241022",
+    "claude-3-sonnet-20240229",
+    "claude-3-haiku-20240307"  # Most widely available fallback
+]
+MODEL_REPROBE_SECONDS = float(os.getenv("MODEL_REPROBE_SECONDS", "60"))
+
+# Semantic answer cache: reuse a generated answer when the same documents were retrieved
+# for a question whose embedding has at least this cosine similarity ("on" or "off")
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "on")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
 # Model Configuration
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 EMBEDDING_DIMENSION = 384
@@ -0,0 +1,172 @@
+"""
+Local, memory-resident document store for metadata-light Pinecone queries.
+
+With ``PINECONE_METADATA_MODE=light`` the vector index only keeps ids plus a
+few small filter fields, and queries skip ``include_metadata``. The full
+metadata (codebook row fields, chunk text) is written here at ingestion time
+and used to hydrate query matches by id. Each ingestion source writes its own
+append-only JSONL shard under ``DOC_STORE_DIR/<index name>/``; the store can be
+reloaded from those shards at any time without touching the index.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config_advanced import PINECONE_METADATA_MODE
+
+DEFAULT_DOC_STORE_DIR = Path(
+    os.getenv("DOC_STORE_DIR", Path(__file__).resolve().parent / ".doc_store")
+)
+
+# Small scalar fields kept in the index so metadata filters keep working
+LIGHT_METADATA_FIELDS = ("source", "code", "code_type", "amount_numeric", "filename", "page", "chunk_index")
+
+_stores: Dict[str, "DocStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def light_metadata_enabled() -> bool:
+    return PINECONE_METADATA_MODE == "light"
+
+
+def light_metadata(metadata: Dict) -> Dict:
+    """The subset of ``metadata`` that is stored in the index in light mode."""
+    return {key: metadata[key] for key in LIGHT_METADATA_FIELDS if key in metadata}
+
+
+class ShardWriter:
+    """Appends (id, metadata) entries to one shard file and to the in-memory store."""
+
+    def __init__(self, store: "DocStore", path: Path, resume: bool):
+        self.store = store
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not resume:
+            path.write_text("", encoding="utf-8")
+
+    def write(self, items: Iterable[Tuple[str, Dict]]):
+        items = list(items)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for doc_id, metadata in items:
+                f.write(json.dumps({"id": doc_id, "metadata": metadata}, ensure_ascii=False) + "\n")
+        self.store.update(items)
+
+
+class DocStore:
+    """Id -> full metadata map, loaded from the JSONL shards of one index."""
+
+    def __init__(self, directory: Path, reload_interval: float = 5.0, load: bool = True):
+        self.directory = Path(directory)
+        self.reload_interval = reload_interval
+        self._docs: Dict[str, Dict] = {}
+        self._signature: Tuple = ()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if load:
+            self.reload()
+
+    def _shards(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        # Oldest first, so a re-ingested source overrides older copies of the same ids
+        return sorted(self.directory.glob("*.jsonl"), key=lambda p: (p.stat().st_mtime, p.name))
+
+    def _current_signature(self) -> Tuple:
+        return tuple((p.name, p.stat().st_size, p.stat().st_mtime) for p in self._shards())
+
+    def reload(self):
+        """Rebuild the in-memory map from the shard files and swap it in."""
+        docs: Dict[str, Dict] = {}
+        for shard in self._shards():
+            with open(shard, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted write
+                    docs[entry["id"]] = entry["metadata"]
+        with self._lock:
+            self._docs = docs
+            self._signature = self._current_signature()
+            self._checked_at = time.monotonic()
+
+    def reload_if_changed(self):
+        """Reload when another process has written shards since the last load."""
+        if time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = time.monotonic()
+        if self._current_signature() != self._signature:
+            self.reload()
+
+    def _shard_path(self, name: str) -> Path:
+        return self.directory / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.jsonl"
+
+    def has_shard(self, name: str) -> bool:
+        return self._shard_path(name).exists()
+
+    def open_shard(self, name: str, resume: bool = False) -> ShardWriter:
+        """Writer for the shard of one ingestion source; truncated unless ``resume``."""
+        return ShardWriter(self, self._shard_path(name), resume)
+
+    def replace_shard(self, name: str, items: Iterable[Tuple[str, Dict]]) -> bool:
+        """Atomically replace a whole shard with ``items``; False if it already held exactly that.
+
+        Readers in other processes see either the old or the new shard, never
+        a truncated one.
+        """
+        items = list(items)
+        path = self._shard_path(name)
+        content = "".join(
+            json.dumps({"id": doc_id, "metadata": metadata}, ensure_ascii=False) + "\n" for doc_id, metadata in items
+        )
+        self.update(items)
+        try:
+            if path.read_text(encoding="utf-8") == content:
+                return False
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, path)
+        return True
+
+    def update(self, items: Iterable[Tuple[str, Dict]]):
+        with self._lock:
+            self._docs.update(items)
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        return self._docs.get(doc_id)
+
+    def hydrate(self, matches: Iterable) -> List[Dict]:
+        """Turn id/score matches into {'id', 'score', 'metadata'} dicts with full metadata."""
+        self.reload_if_changed()
+        hydrated, missing = [], 0
+        for match in matches:
+            metadata = self._docs.get(match['id'])
+            if metadata is None:
+                missing += 1
+                metadata = dict(match.get('metadata') or {})
+            hydrated.append({'id': match['id'], 'score': match['score'], 'metadata': metadata})
+        if missing:
+            print(f"⚠️ {missing} matches are not in the local doc store; reload or re-ingest it")
+        return hydrated
+
+
+def doc_store_directory(index_name: str) -> Path:
+    return DEFAULT_DOC_STORE_DIR / re.sub(r"[^A-Za-z0-9_.-]", "_", index_name)
+
+
+def get_doc_store(index_name: str) -> DocStore:
+    """Return the process-wide doc store for ``index_name``."""
+    with _stores_lock:
+        store = _stores.get(index_name)
+        if store is None:
+            store = DocStore(doc_store_directory(index_name))
+            _stores[index_name] = store
+        return store
@@ -0,0 +1,199 @@
+"""
+Persistent, content-addressed embedding cache for codebook text.
+
+Vectors are keyed by (model name, sha256 of the text) and stored per model as
+a float32 matrix (``vectors.f32``, memory-mapped on read) plus a JSON manifest
+mapping each text hash to its row. Restarting with an unchanged codebook only
+reads the matrix; new or edited rows are the only ones sent to the encoder.
+
+Several processes (the Streamlit apps, ingestion) may share one cache
+directory. Rows are only ever appended, under an exclusive lock on the
+directory's ``lock`` file, and each writer re-reads the manifest under that
+lock first, so it appends after every row another process has committed.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_DIR = Path(
+    os.getenv("EMBEDDING_CACHE_DIR", Path(__file__).resolve().parent / ".embedding_cache")
+)
+
+_caches: Dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _exclusive_lock(path: Path):
+    """Hold an exclusive lock on ``path`` (created if missing) across processes."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def text_hash(text: str) -> str:
+    """Content hash used as the cache key for a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding store for a single model."""
+
+    MANIFEST_NAME = "manifest.json"
+    VECTORS_NAME = "vectors.f32"
+    LOCK_NAME = "lock"
+
+    def __init__(self, model_name: str, cache_dir: Optional[Path] = None):
+        self.model_name = model_name
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.directory = Path(cache_dir or DEFAULT_CACHE_DIR) / safe_name
+        self.manifest_path = self.directory / self.MANIFEST_NAME
+        self.vectors_path = self.directory / self.VECTORS_NAME
+        self.lock_path = self.directory / self.LOCK_NAME
+        self.dimension: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Read the manifest and map the vector file, discarding it if inconsistent.
+
+        Also picks up rows other processes have committed since the last load.
+        """
+        if not self.manifest_path.exists() or not self.vectors_path.exists():
+            return
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable embedding cache manifest: {e}")
+            return
+
+        if manifest.get("model_name") != self.model_name or manifest.get("dtype") != "float32":
+            return
+
+        dimension = int(manifest["dimension"])
+        count = int(manifest["count"])
+        if self.vectors_path.stat().st_size < count * dimension * 4:
+            print("⚠️ Embedding cache vectors file is truncated, rebuilding")
+            return
+
+        self.dimension = dimension
+        self.rows = manifest["rows"]
+        self._vectors = self._map(count)
+
+    def _map(self, count: int) -> Optional[np.memmap]:
+        if count == 0:
+            return None
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dimension))
+
+    def _write_manifest(self):
+        manifest = {
+            "model_name": self.model_name,
+            "dtype": "float32",
+            "dimension": self.dimension,
+            "count": len(self.rows),
+            "rows": self.rows,
+        }
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+    def _append(self, hashes: List[str], vectors: np.ndarray):
+        """Append new vectors after the last committed row and publish them.
+
+        Runs under the directory lock, after re-reading the manifest, so rows
+        committed by other processes are kept and hashes they already added
+        are not written twice.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with _exclusive_lock(self.lock_path):
+            self._vectors = None  # release the mapping before resizing the file
+            self.dimension, self.rows = None, {}
+            self._load()
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                self.rows = {}
+            keep = [i for i, h in enumerate(hashes) if h not in self.rows]
+            if keep:
+                count = len(self.rows)
+                mode = "r+b" if self.vectors_path.exists() else "wb"
+                with open(self.vectors_path, mode) as f:
+                    # Drop any torn tail left by an interrupted write; committed rows are never cut
+                    f.truncate(count * self.dimension * 4)
+                    f.seek(0, os.SEEK_END)
+                    f.write(vectors[keep].tobytes())
+
+                for offset, i in enumerate(keep):
+                    self.rows[hashes[i]] = count + offset
+                self._write_manifest()
+            self._vectors = self._map(len(self.rows))
+
+    def encode(self, model, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Return float32 embeddings for ``texts``, encoding only cache misses.
+
+        The result is a fresh in-memory array (callers may normalize it in place).
+        """
+        hashes = [text_hash(t) for t in texts]
+
+        with self._lock:
+            missing: Dict[str, str] = {}
+            for h, t in zip(hashes, texts):
+                if h not in self.rows and h not in missing:
+                    missing[h] = t
+
+            if missing:
+                # Another process may have added them since this cache was loaded
+                self._load()
+                missing = {h: t for h, t in missing.items() if h not in self.rows}
+
+            if missing:
+                print(f"🔧 Encoding {len(missing)} new/changed of {len(texts)} texts (rest from cache)")
+                new_vectors = model.encode(list(missing.values()), batch_size=batch_size)
+                self._append(list(missing.keys()), np.asarray(new_vectors))
+
+            if not texts:
+                return np.zeros((0, self.dimension or 0), dtype=np.float32)
+            rows = np.fromiter((self.rows[h] for h in hashes), dtype=np.int64, count=len(hashes))
+            return np.array(self._vectors[rows], dtype=np.float32)
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    """Return the process-wide cache for ``model_name``."""
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            cache = EmbeddingCache(model_name)
+            _caches[model_name] = cache
+        return cache
+
+
+def encode_cached(model, texts: List[str], batch_size: int = 64) -> np.ndarray:
+    """Encode ``texts`` with ``model`` through the on-disk cache for that model."""
+    return get_embedding_cache(model.model_name).encode(model, texts, batch_size=batch_size)
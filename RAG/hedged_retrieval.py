@@ -0,0 +1,81 @@
+"""
+Hedged retrieval: race a remote vector query against a local one under a deadline.
+
+The remote call runs on a shared thread pool while the local search runs in
+the caller's thread. The remote result wins if it arrives within the deadline
+(measured from when both were issued); otherwise the local result is served
+and the remote call is cancelled if it has not started, or left to finish in
+the background. At most ``REMOTE_MAX_INFLIGHT`` remote calls are outstanding;
+while that many are still running (a slow but not failing backend), requests
+skip the remote call and are served locally instead of queueing behind them.
+Every request is recorded with the path that served it.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+REMOTE_MAX_INFLIGHT = 8
+
+# Threads and outstanding calls are both bounded, so a slow remote backend
+# cannot pile up threads or an unbounded queue of abandoned calls
+_REMOTE_POOL = ThreadPoolExecutor(max_workers=REMOTE_MAX_INFLIGHT, thread_name_prefix="remote-query")
+_REMOTE_SLOTS = threading.BoundedSemaphore(REMOTE_MAX_INFLIGHT)
+
+SERVED_REMOTE = "pinecone"
+SERVED_LOCAL = "faiss"
+SERVED_LOCAL_DEADLINE = "faiss_deadline"
+SERVED_LOCAL_ERROR = "faiss_error"
+SERVED_LOCAL_BREAKER = "faiss_breaker"
+
+
+def hedged_call(remote: Callable[[], Any], local: Callable[[], Any],
+                deadline_seconds: float) -> Tuple[Any, str]:
+    """Return (result, served_by), preferring ``remote`` if it answers within the deadline."""
+    if not _REMOTE_SLOTS.acquire(blocking=False):
+        # Earlier remote calls are still outstanding: do not queue another
+        return local(), SERVED_LOCAL_DEADLINE
+    start = time.perf_counter()
+    future = _REMOTE_POOL.submit(remote)
+    future.add_done_callback(lambda _: _REMOTE_SLOTS.release())
+    local_result = local()
+    remaining = deadline_seconds - (time.perf_counter() - start)
+    try:
+        return future.result(timeout=max(0.0, remaining)), SERVED_REMOTE
+    except FutureTimeout:
+        future.cancel()
+        return local_result, SERVED_LOCAL_DEADLINE
+    except Exception as e:
+        print(f"❌ Remote search failed: {e}, serving local results")
+        return local_result, SERVED_LOCAL_ERROR
+
+
+class RetrievalLog:
+    """Rolling record of which path served each request and how long it took."""
+
+    def __init__(self, max_entries: int = 1000):
+        self._entries: deque = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, served_by: str, latency_seconds: float):
+        with self._lock:
+            self._entries.append((time.time(), served_by, latency_seconds * 1000.0))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = list(self._entries)
+        if not entries:
+            return {'requests': 0, 'served_by': {}}
+        latencies = np.array([latency for _, _, latency in entries])
+        return {
+            'requests': len(entries),
+            'served_by': dict(Counter(served_by for _, served_by, _ in entries)),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+        }
@@ -4,13 +4,24 @@ Hybrid RAG Agent
 - Excel/CSV: Direct query using pandas (no vectorization - data is already structured)
 """
 
+import itertools
 import os
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional, Union
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+from vector_store import VECTOR_STORE, Pinecone, ServerlessSpec
+from circuit_breaker import get_breaker
+from config_advanced import CLAUDE_MODELS
+from model_router import get_model_router
+from streaming import TimedStream, primed
+from doc_store import get_doc_store, light_metadata, light_metadata_enabled
+from embedding_cache import encode_cached
+from query_cache import encode_query
+from shared_engine import get_embedding_model
+from upsert_writer import UpsertWriter
 import anthropic
 from dotenv import load_dotenv
 import fitz  # PyMuPDF for PDF reading
@@ -21,6 +32,85 @@ load_dotenv()
 load_dotenv("rag_secrets.env")
 
 
+def _extract_pdf_pages(pdf_path: str, first: int, last: int) -> List[Tuple[int, str]]:
+    """Extract (1-based page number, text) for pages [first, last); runs in a worker process."""
+    with fitz.open(pdf_path) as doc:
+        return [(page_num + 1, doc[page_num].get_text()) for page_num in range(first, last)]
+
+
+def iter_pdf_pages(pdf_path: str, workers: Optional[int] = None, window_pages: int = 64,
+                   pages_per_task: int = 8) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, text) in page order, extracted ahead by a process pool."""
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    ranges = iter([(first, min(first + pages_per_task, page_count))
+                   for first in range(0, page_count, pages_per_task)])
+    max_pending = max(1, window_pages // pages_per_task)
+    workers = workers or min(4, os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for first, last in itertools.islice(ranges, max_pending):
+            pending.append(pool.submit(_extract_pdf_pages, pdf_path, first, last))
+
+        while pending:
+            pages = pending.popleft().result()
+            for first, last in itertools.islice(ranges, 1):
+                pending.append(pool.submit(_extract_pdf_pages, pdf_path, first, last))
+            yield from pages
+
+
+def stream_chunks(pages: Iterable[Tuple[int, str]], chunk_size: int = 500,
+                  overlap: int = 50) -> Iterator[Tuple[int, str, int, int]]:
+    """Yield (chunk index, text, first page, last page) of overlapping word chunks.
+
+    Chunks run across page boundaries exactly as if the pages had been
+    joined into one document, but only about one chunk of words is held.
+    """
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    words: deque = deque()  # (word, page) pairs not yet fully consumed
+    index = 0
+
+    def emit():
+        window = list(itertools.islice(words, chunk_size))
+        chunk = " ".join(word for word, _ in window)
+        for _ in range(min(step, len(words))):
+            words.popleft()
+        return chunk, window[0][1], window[-1][1]
+
+    for page_num, text in pages:
+        words.extend((word, page_num) for word in text.split())
+        while len(words) >= chunk_size:
+            chunk, first, last = emit()
+            yield index, chunk, first, last
+            index += 1
+
+    while words:
+        chunk, first, last = emit()
+        yield index, chunk, first, last
+        index += 1
+
+
+def pdf_chunk_record(pdf_name: str, index: int, chunk: str, page_start: int,
+                     page_end: int) -> Tuple[str, str, Dict]:
+    """Build the (id, text, metadata) record stored in Pinecone for one PDF chunk."""
+    vector_id = f"pdf_{pdf_name}_{index}"
+    # Clean ID
+    vector_id = "".join(x for x in vector_id if x.isalnum() or x in "_-.")
+    metadata = {
+        "source": "pdf",
+        "filename": pdf_name,
+        "chunk_index": index,
+        "page": page_start,
+        "page_end": page_end,
+        "text": chunk[:4000]  # Limit metadata size
+    }
+    return vector_id, chunk, metadata
+
+
 class HybridBillingRagAgent:
     """
     Hybrid RAG Agent that:
@@ -37,7 +127,7 @@ class HybridBillingRagAgent:
         self.pinecone_api_key = pinecone_api_key or os.getenv("PINECONE_API_KEY")
         self.anthropic_api_key = anthropic_api_key or os.getenv("ANTHROPIC_API_KEY")
         
-        if not self.pinecone_api_key:
+        if not self.pinecone_api_key and VECTOR_STORE != "local":
             raise ValueError("Pinecone API key is required. Set PINECONE_API_KEY env var or pass it to constructor.")
             
         # Initialize Pinecone for PDF vectors
@@ -47,11 +137,13 @@ class HybridBillingRagAgent:
         
         # Initialize Embedding Model
         print("Loading embedding model...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model('all-MiniLM-L6-v2')
         
         # Initialize Anthropic
         if self.anthropic_api_key:
             self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+            self.model_router = get_model_router("anthropic", CLAUDE_MODELS, self._probe_model,
+                                                 api_key=self.anthropic_api_key)
             self.has_llm = True
         else:
             print("Warning: No ANTHROPIC_API_KEY found. Generation capabilities will be disabled.")
@@ -60,6 +152,9 @@ class HybridBillingRagAgent:
         self._ensure_index_exists()
         self.index = self.pc.Index(self.index_name)
         
+        # In light metadata mode, chunk text lives in a local doc store keyed by id
+        self.doc_store = get_doc_store(self.index_name) if light_metadata_enabled() else None
+        
         # Store CSV/Excel dataframes in memory for direct querying
         self.structured_data: Dict[str, pd.DataFrame] = {}
         
@@ -88,69 +183,57 @@ class HybridBillingRagAgent:
     # PDF HANDLING - VECTORIZE FOR SEMANTIC SEARCH
     # ============================================
     
-    def ingest_pdf(self, pdf_path: str, chunk_size: int = 500, chunk_overlap: int = 50):
+    def ingest_pdf(self, pdf_path: str, chunk_size: int = 500, chunk_overlap: int = 50,
+                   workers: Optional[int] = None, window_pages: int = 64,
+                   pages_per_task: int = 8, batch_size: int = 100, max_inflight_upserts: int = 4):
         """
-        Ingest PDF by:
-        1. Extracting text
-        2. Chunking into manageable pieces
-        3. Creating embeddings
-        4. Storing in Pinecone vector DB
+        Ingest PDF as a streaming pipeline:
+        1. Extracting page text in a process pool, in page order
+        2. Chunking pages as they arrive (chunks keep their page numbers)
+        3. Creating embeddings in fixed-size batches
+        4. Storing in Pinecone vector DB with concurrent upserts
+        
+        At most ``window_pages`` pages are extracted ahead of the chunker and at
+        most ``max_inflight_upserts`` batches are waiting on Pinecone, so memory
+        stays bounded regardless of the PDF size.
         """
         print(f"Ingesting PDF: {pdf_path}")
         
         try:
-            # Extract text from PDF using PyMuPDF
-            doc = fitz.open(pdf_path)
-            full_text = ""
-            page_texts = []
-            
-            for page_num, page in enumerate(doc):
-                page_text = page.get_text()
-                full_text += page_text + "\n"
-                page_texts.append({
-                    "page": page_num + 1,
-                    "text": page_text
-                })
-            
-            doc.close()
-            
-            # Chunk the text
-            chunks = self._chunk_text(full_text, chunk_size, chunk_overlap)
-            print(f"Created {len(chunks)} chunks from PDF")
-            
-            # Create embeddings and upsert to Pinecone
-            vectors = []
-            batch_size = 100
             pdf_name = os.path.basename(pdf_path)
+            start = time.perf_counter()
+            count = 0
+            batch: List[Tuple[str, str, Dict]] = []
+            shard = self.doc_store.open_shard(pdf_name) if self.doc_store else None
             
-            for i, chunk in enumerate(chunks):
-                if not chunk.strip():
-                    continue
-                    
-                vector_id = f"pdf_{pdf_name}_{i}"
-                # Clean ID
-                vector_id = "".join(x for x in vector_id if x.isalnum() or x in "_-.")
-                
-                embedding = self.embedder.encode(chunk).tolist()
-                
-                metadata = {
-                    "source": "pdf",
-                    "filename": pdf_name,
-                    "chunk_index": i,
-                    "text": chunk[:4000]  # Limit metadata size
-                }
+            with UpsertWriter(self.index, max_inflight=max_inflight_upserts,
+                              max_batch_vectors=batch_size) as writer:
+                def flush():
+                    if shard:
+                        shard.write((vector_id, metadata) for vector_id, _, metadata in batch)
+                    texts = [text for _, text, _ in batch]
+                    embeddings = encode_cached(self.embedder, texts, batch_size=batch_size)
+                    writer.add(
+                        (vector_id, embedding.tolist(), light_metadata(metadata) if shard else metadata)
+                        for (vector_id, _, metadata), embedding in zip(batch, embeddings)
+                    )
+                    batch.clear()
                 
-                vectors.append((vector_id, embedding, metadata))
-                
-                if len(vectors) >= batch_size:
-                    self.index.upsert(vectors=vectors)
-                    vectors = []
-                    print(f"Processed {i+1} chunks...")
-            
-            if vectors:
-                self.index.upsert(vectors=vectors)
+                pages = iter_pdf_pages(pdf_path, workers, window_pages, pages_per_task)
+                for chunk in stream_chunks(pages, chunk_size, chunk_overlap):
+                    batch.append(pdf_chunk_record(pdf_name, *chunk))
+                    count += 1
+                    if len(batch) >= batch_size:
+                        flush()
+                        print(f"Processed {count} chunks...")
+                if batch:
+                    flush()
+            if VECTOR_STORE == "local":
+                self.index.flush()  # the local store only reaches disk on flush
             
-            print(f"PDF ingestion complete: {len(chunks)} chunks indexed.")
+            elapsed = time.perf_counter() - start
+            rate = count / elapsed if elapsed else 0.0
+            print(f"PDF ingestion complete: {count} chunks indexed in {elapsed:.1f}s ({rate:.1f} chunks/sec).")
             return True
             
         except Exception as e:
@@ -159,15 +242,7 @@ class HybridBillingRagAgent:
     
     def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """Split text into overlapping chunks for better context preservation."""
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
-        
-        return chunks
+        return [chunk for _, chunk, _, _ in stream_chunks([(1, text)], chunk_size, overlap)]
 
     # ============================================
     # EXCEL/CSV HANDLING - DIRECT QUERY (NO VECTORIZATION)
@@ -290,15 +365,22 @@ class HybridBillingRagAgent:
         
         # 1. Search PDFs in Pinecone (semantic search)
         try:
-            query_embedding = self.embedder.encode(query).tolist()
-            pinecone_results = self.index.query(
+            query_embedding = encode_query(self.embedder, query)[0].tolist()
+            # Fails fast (CircuitOpenError) while Pinecone keeps failing
+            pinecone_results = get_breaker("pinecone").call(
+                self.index.query,
                 vector=query_embedding,
                 top_k=top_k,
-                include_metadata=True,
+                include_metadata=self.doc_store is None,
                 filter={"source": "pdf"}  # Only get PDF results from vectors
             )
             
-            for match in pinecone_results['matches']:
+            matches = pinecone_results['matches']
+            if self.doc_store:
+                # Chunk text is hydrated locally instead of shipped with every match
+                matches = self.doc_store.hydrate(matches)
+            
+            for match in matches:
                 results["pdf_results"].append({
                     'score': match['score'],
                     'metadata': match['metadata']
@@ -316,8 +398,15 @@ class HybridBillingRagAgent:
     def generate_response(self, query: str, retrieval_results: Dict[str, Any], 
                           chat_history: List[Dict] = None) -> str:
         """Generate a response using both PDF and structured data context."""
+        return "".join(self.generate_response_stream(query, retrieval_results, chat_history))
+
+    def generate_response_stream(self, query: str, retrieval_results: Dict[str, Any],
+                                 chat_history: List[Dict] = None) -> Iterator[str]:
+        """Like ``generate_response``, but yields the answer text as it is generated."""
         if not self.has_llm:
-            return "Anthropic API key not set. Returning context only."
+            yield "Anthropic API key not set. Returning context only."
+            return
+        start = time.perf_counter()
 
         # Build context from PDF results
         pdf_context = ""
@@ -378,26 +467,69 @@ USER QUERY: {query}
 
 Please provide a helpful answer using the available information. Prioritize structured billing data for code lookups."""
 
-        models_to_try = [
-            "claude-3-5-sonnet-20241022",
-            "claude-3-sonnet-20240229", 
-            "claude-3-haiku-20240307"
-        ]
-        
-        for model_name in models_to_try:
-            try:
-                response = self.anthropic_client.messages.create(
-                    model=model_name,
-                    max_tokens=2000,
-                    temperature=0.3,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_prompt}]
-                )
-                return response.content[0].text
-            except Exception as e:
-                continue
+        def open_stream(model_name: str) -> Tuple[str, Iterator[str]]:
+            # Fails over before the first token; a model whose circuit is open fails in microseconds
+            return model_name, get_breaker(f"anthropic:{model_name}").call(
+                primed, self._anthropic_chunks(model_name, system_prompt, user_prompt)
+            )
         
-        return "Error: Unable to generate response. Please check API keys."
+        try:
+            # Goes straight to the model that answered last; failed models are re-probed in the background
+            model_name, chunks = self.model_router.call(open_stream)
+        except Exception as e:
+            # If all models failed, answer from the retrieved data alone
+            yield self._retrieval_only_answer(retrieval_results, e)
+            return
+        try:
+            yield from TimedStream(chunks, f"anthropic:{model_name}", start)
+        except Exception as e:
+            # The model failed after the first token: close the partial answer with the matching data
+            print(f"⚠️ {model_name} stream interrupted: {e}")
+            yield "\n\n*(response interrupted)* Matching billing data:\n\n" + "\n".join(self._source_lines(retrieval_results))
+
+    def _anthropic_chunks(self, model_name: str, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        with self.anthropic_client.messages.stream(
+            model=model_name,
+            max_tokens=2000,
+            temperature=0.3,
+            system=system_prompt,
+            messages=[{"role": "user", "content": user_prompt}]
+        ) as stream:
+            yield from stream.text_stream
+
+    def _probe_model(self, model_name: str):
+        """Smallest possible request, used to re-probe a model that failed."""
+        get_breaker(f"anthropic:{model_name}").call(
+            self.anthropic_client.messages.create,
+            model=model_name,
+            max_tokens=1,
+            messages=[{"role": "user", "content": "ping"}]
+        )
+
+    def model_routing(self) -> Dict:
+        """Which Claude model requests currently go to, with per-model latency and errors."""
+        return self.model_router.stats() if self.has_llm else {}
+
+    def _retrieval_only_answer(self, retrieval_results: Dict[str, Any], reason: Exception) -> str:
+        """Answer built from the retrieval results, used while no Claude model is reachable."""
+        lines = [
+            f"⚠️ AI synthesis is unavailable right now ({reason}). "
+            "Please check your API keys. Matching billing data:",
+            ""
+        ]
+        return "\n".join(lines + self._source_lines(retrieval_results))
+
+    def _source_lines(self, retrieval_results: Dict[str, Any]) -> List[str]:
+        """One bullet per matching code and PDF passage, for answers given without (or after a failed) synthesis."""
+        lines = []
+        for result in retrieval_results.get("structured_results", []):
+            for row in result.get("data", [])[:5]:
+                lines.append(f"- :blue[{row.get('Code', '')}] {row.get('Description', '')} "
+                             f"(:green[{row.get('Amount ($CAD)', '')}])")
+        for match in retrieval_results.get("pdf_results", [])[:3]:
+            text = match['metadata'].get('text', '')
+            lines.append(f"- {match['metadata'].get('filename', 'PDF')}: {text[:300]}{'...' if len(text) > 300 else ''}")
+        return lines
 
     def run_rag_pipeline(self, query: str, chat_history: List[Dict] = None) -> str:
         """Full hybrid RAG pipeline."""
@@ -424,7 +556,7 @@ if __name__ == "__main__":
     # Load structured data (CSV/Excel) - NO vectorization
     agent.load_structured_data("Codes_by_class.csv")
     
-    # Ingest PDF - VECTORIZE for semantic search
+    # Ingest PDF - VECTORIZE for semantic search (bulk/resumable: python ingest_cli.py <dir>)
     # agent.ingest_pdf("usecases_billing.pdf")
     
     # Test query
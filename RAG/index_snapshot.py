@@ -0,0 +1,119 @@
+"""
+On-disk snapshots of the local FAISS codebook index.
+
+The built index is written next to the codebook CSV (``.index_snapshots/``)
+together with a JSON manifest recording the codebook hash, embedding model and
+index type. On startup the snapshot is loaded (memory-mapped where the FAISS
+build supports it) and only rebuilt when the manifest no longer matches, so a
+cold container does not re-embed or re-index an unchanged codebook.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import faiss
+import numpy as np
+
+SNAPSHOT_DIR_NAME = ".index_snapshots"
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Newer FAISS builds can map flat-index codes directly; older ones only honour IO_FLAG_MMAP
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def codebook_hash(texts: List[str]) -> str:
+    """Hash of the exact texts that are embedded, in index order."""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def snapshot_paths(codebook_path: str, name: str):
+    """Return (index_path, manifest_path) for the snapshot of ``codebook_path``."""
+    codebook = Path(codebook_path).resolve()
+    directory = codebook.parent / SNAPSHOT_DIR_NAME
+    stem = f"{codebook.stem}.{name}"
+    return directory / f"{stem}.faiss", directory / f"{stem}.manifest.json"
+
+
+def _expected_manifest(texts: List[str], model_name: str, index_type: str) -> dict:
+    return {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "codebook_hash": codebook_hash(texts),
+        "model_name": model_name,
+        "index_type": index_type,
+        "ntotal": len(texts),
+    }
+
+
+def load_snapshot(index_path: Path, manifest_path: Path, expected: dict) -> Optional[faiss.Index]:
+    """Load the snapshot if its manifest matches ``expected``; otherwise return None."""
+    if not index_path.exists() or not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable index snapshot manifest: {e}")
+        return None
+
+    stale = [key for key, value in expected.items() if manifest.get(key) != value]
+    if stale:
+        print(f"🔄 Index snapshot is stale ({', '.join(stale)} changed), rebuilding")
+        return None
+
+    try:
+        index = faiss.read_index(str(index_path), _MMAP_FLAGS)
+    except RuntimeError:
+        # Index type without mmap support in this FAISS build: read it into memory
+        index = faiss.read_index(str(index_path))
+
+    if index.ntotal != expected["ntotal"] or index.d != manifest.get("dimension"):
+        print("⚠️ Index snapshot does not match its manifest, rebuilding")
+        return None
+    return index
+
+
+def save_snapshot(index: faiss.Index, index_path: Path, manifest_path: Path, manifest: dict):
+    """Write the index and then its manifest, each atomically."""
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_index = index_path.with_suffix(".faiss.tmp")
+    faiss.write_index(index, str(tmp_index))
+    os.replace(tmp_index, index_path)
+
+    manifest = dict(manifest, dimension=index.d, created_at=datetime.now().isoformat())
+    tmp_manifest = manifest_path.with_suffix(".json.tmp")
+    tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_manifest, manifest_path)
+
+
+def load_or_build_flat_ip_index(codebook_path: str, name: str, texts: List[str], model_name: str,
+                                embed: Callable[[], np.ndarray]) -> faiss.Index:
+    """Return a cosine-similarity ``IndexFlatIP`` over ``texts``, from snapshot when valid.
+
+    ``embed`` is only called on a rebuild; it must return the float32 embeddings
+    of ``texts`` (they are L2-normalized in place here).
+    """
+    index_path, manifest_path = snapshot_paths(codebook_path, name)
+    expected = _expected_manifest(texts, model_name, "IndexFlatIP")
+
+    index = load_snapshot(index_path, manifest_path, expected)
+    if index is not None:
+        print(f"📂 Loaded FAISS index snapshot ({index.ntotal} vectors)")
+        return index
+
+    embeddings = np.ascontiguousarray(embed(), dtype=np.float32)
+    index = faiss.IndexFlatIP(embeddings.shape[1])  # Inner product for cosine similarity
+    faiss.normalize_L2(embeddings)
+    index.add(embeddings)
+
+    try:
+        save_snapshot(index, index_path, manifest_path, expected)
+    except (OSError, RuntimeError) as e:
+        print(f"⚠️ Could not write FAISS index snapshot: {e}")
+    return index
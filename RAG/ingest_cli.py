@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Resumable bulk ingestion of a directory of sources into the Pinecone index.
+
+Every CSV/XLSX codebook, Markdown knowledge base and PDF under SOURCE_DIR is
+ingested by its own worker process, using the same records (ids, text and
+metadata) as PineconeBillingRagAgent and HybridBillingRagAgent. After each
+batch is committed to Pinecone the worker writes a per-source checkpoint, so
+an interrupted run resumes from the last committed batch instead of starting
+over. A source whose size or mtime changed since its checkpoint is ingested
+from the beginning.
+
+With VECTOR_STORE=local the index is held in one process and written to
+LOCAL_VECTOR_STORE_DIR on flush, so sources are ingested by a single worker.
+The index is flushed every LOCAL_FLUSH_SECONDS, and the checkpoint only
+advances after a flush.
+
+Run: python ingest_cli.py SOURCE_DIR [--workers 4] [--batch-size 100] [--restart]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from config import ENCODE_BATCH_SIZE
+from config_advanced import LOCAL_VECTOR_STORE_DIR
+from doc_store import DocStore, doc_store_directory, light_metadata, light_metadata_enabled
+from hybrid_rag_agent import iter_pdf_pages, pdf_chunk_record, stream_chunks
+from pinecone_rag_agent import iter_csv_records, iter_knowledge_base_records
+from shared_engine import get_embedding_model
+from upsert_writer import UpsertWriter
+from vector_store import VECTOR_STORE, Pinecone, ServerlessSpec
+
+load_dotenv()
+load_dotenv("rag_secrets.env")
+
+SOURCE_SUFFIXES = {".csv", ".xlsx", ".xls", ".md", ".pdf"}
+DEFAULT_CHECKPOINT_DIR = Path(__file__).resolve().parent / ".ingest_checkpoints"
+LOCAL_FLUSH_SECONDS = 10.0  # VECTOR_STORE=local: how often the index is written (and the checkpoint advanced)
+
+
+def discover_sources(source_dir: Path) -> List[Path]:
+    """All supported source files under ``source_dir``, in a stable order."""
+    return sorted(p for p in source_dir.rglob("*") if p.is_file() and p.suffix.lower() in SOURCE_SUFFIXES)
+
+
+def iter_source_records(path: Path) -> Iterator[Tuple[str, str, Dict]]:
+    """Yield the (id, text, metadata) records for one source, in a deterministic order."""
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        yield from iter_csv_records(pd.read_csv(path))
+    elif suffix in (".xlsx", ".xls"):
+        yield from iter_csv_records(pd.read_excel(path))
+    elif suffix == ".md":
+        yield from iter_knowledge_base_records(path.read_text(encoding="utf-8"))
+    elif suffix == ".pdf":
+        # Sources are already fanned out across processes; extract each PDF with one helper
+        for chunk in stream_chunks(iter_pdf_pages(str(path), workers=1)):
+            yield pdf_chunk_record(path.name, *chunk)
+
+
+def source_key(source: Path) -> str:
+    """Per-file name for checkpoints and doc store shards; sources with the same basename don't collide."""
+    digest = hashlib.sha256(str(source.resolve()).encode("utf-8")).hexdigest()[:16]
+    return f"{source.name}.{digest}"
+
+
+class SourceCheckpoint:
+    """Committed-record count for one source, stored as a small JSON file."""
+
+    def __init__(self, checkpoint_dir: Path, source: Path):
+        stat = source.stat()
+        self.fingerprint = {"path": str(source.resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+        self.path = checkpoint_dir / f"{source_key(source)}.json"
+        self.committed = 0
+        self.done = False
+
+    def load(self):
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if state.get("fingerprint") == self.fingerprint:
+            self.committed = int(state.get("committed", 0))
+            self.done = bool(state.get("done", False))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"fingerprint": self.fingerprint, "committed": self.committed, "done": self.done}
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def ingest_source(path: str, index_name: str, checkpoint_dir: str, batch_size: int, restart: bool) -> Dict:
+    """Worker entry point: ingest one source, checkpointing after every committed batch."""
+    source = Path(path)
+    checkpoint = SourceCheckpoint(Path(checkpoint_dir), source)
+    if not restart:
+        checkpoint.load()
+    if checkpoint.done:
+        return {"source": source.name, "ingested": 0, "skipped": checkpoint.committed, "seconds": 0.0}
+
+    index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(index_name)
+    embedder = get_embedding_model("all-MiniLM-L6-v2")
+
+    store = DocStore(doc_store_directory(index_name), load=False) if light_metadata_enabled() else None
+    if store and checkpoint.committed and not store.has_shard(source_key(source)):
+        # The shard is gone (or predates path-keyed shard names): its rows must be written again
+        checkpoint.committed = 0
+
+    records = iter_source_records(source)
+    skipped = sum(1 for _ in itertools.islice(records, checkpoint.committed))
+    ingested = 0
+    start = time.perf_counter()
+    checkpoint_lock = threading.Lock()
+    last_flush = time.monotonic()
+
+    def save_checkpoint(_batch):
+        nonlocal last_flush
+        # Batches can finish out of order; only the contiguous committed prefix is safe to skip
+        with checkpoint_lock:
+            committed = skipped + writer.committed_prefix
+            if VECTOR_STORE == "local":
+                # Committed rows are only in memory until a flush; the checkpoint must not get
+                # ahead of the disk. Each flush rewrites the whole index, so flush periodically.
+                if time.monotonic() - last_flush < LOCAL_FLUSH_SECONDS:
+                    return
+                index.flush()
+                last_flush = time.monotonic()
+            checkpoint.committed = committed
+            checkpoint.save()
+
+    shard = None
+    if store:
+        # Each worker appends to its own source's shard; resumed runs keep what is there
+        shard = store.open_shard(source_key(source), resume=skipped > 0)
+
+    with UpsertWriter(index, max_batch_vectors=batch_size, on_commit=save_checkpoint) as writer:
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            if shard:
+                shard.write((vector_id, metadata) for vector_id, _, metadata in batch)
+            # Encoded directly, without the on-disk embedding cache
+            embeddings = embedder.encode([text for _, text, _ in batch], batch_size=ENCODE_BATCH_SIZE)
+            writer.add(
+                (vector_id, embedding.tolist(), light_metadata(metadata) if shard else metadata)
+                for (vector_id, _, metadata), embedding in zip(batch, embeddings)
+            )
+            ingested += len(batch)
+
+    if VECTOR_STORE == "local":
+        index.flush()  # the local store only reaches disk on flush
+
+    checkpoint.committed = skipped + ingested
+    checkpoint.done = True
+    checkpoint.save()
+    return {"source": source.name, "ingested": ingested, "skipped": skipped,
+            "seconds": time.perf_counter() - start}
+
+
+def ensure_index(index_name: str, dimension: int = 384):
+    """Create the serverless index if it does not exist yet."""
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if index_name in [i.name for i in pc.list_indexes()]:
+        return
+    print(f"Creating Pinecone index '{index_name}'...")
+    pc.create_index(
+        name=index_name,
+        dimension=dimension,
+        metric="cosine",
+        spec=ServerlessSpec(cloud="aws", region="us-east-1")
+    )
+    while not pc.describe_index(index_name).status['ready']:
+        time.sleep(1)
+    if VECTOR_STORE == "local":
+        pc.Index(index_name).flush()  # so the worker process can load it
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable bulk ingestion into Pinecone")
+    parser.add_argument("source_dir", help="directory of CSV/XLSX/MD/PDF sources")
+    parser.add_argument("--index-name", default="medical-billing-rag")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--checkpoint-dir", default=str(DEFAULT_CHECKPOINT_DIR))
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and ingest everything again")
+    args = parser.parse_args()
+
+    if not os.getenv("PINECONE_API_KEY") and VECTOR_STORE != "local":
+        print("Please set PINECONE_API_KEY environment variable to run this script.")
+        sys.exit(1)
+    if VECTOR_STORE == "local":
+        # Each process holds its own copy of a local index and the last flush wins
+        if not LOCAL_VECTOR_STORE_DIR:
+            print("VECTOR_STORE=local needs LOCAL_VECTOR_STORE_DIR: the worker's index is lost when it exits.")
+            sys.exit(1)
+        if args.workers > 1:
+            print("⚠️ VECTOR_STORE=local supports a single writer process; using --workers 1")
+            args.workers = 1
+
+    sources = discover_sources(Path(args.source_dir))
+    if not sources:
+        print(f"No CSV/XLSX/MD/PDF sources found in {args.source_dir}")
+        return
+    ensure_index(args.index_name)
+
+    print(f"📥 Ingesting {len(sources)} sources with {args.workers} workers")
+    start = time.perf_counter()
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(ingest_source, str(path), args.index_name, args.checkpoint_dir,
+                        args.batch_size, args.restart): path
+            for path in sources
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures.append(path.name)
+                print(f"❌ {path.name}: {e} (rerun to resume from the last checkpoint)")
+                continue
+            results.append(result)
+            rate = result["ingested"] / result["seconds"] if result["seconds"] else 0.0
+            print(f"✅ {result['source']}: {result['ingested']} records "
+                  f"({result['skipped']} already committed) in {result['seconds']:.1f}s ({rate:.1f} rows/sec)")
+
+    elapsed = time.perf_counter() - start
+    total = sum(r["ingested"] for r in results)
+    print("=" * 60)
+    print(f"Sources: {len(results)} ok, {len(failures)} failed")
+    print(f"Records ingested: {total} ({sum(r['skipped'] for r in results)} resumed from checkpoints)")
+    print(f"Wall time: {elapsed:.1f}s ({total / elapsed if elapsed else 0.0:.1f} rows/sec overall)")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Small JSON-over-HTTP server with a fixed worker pool, for keeping an index warm.
+
+``PooledHTTPServer`` hands each accepted connection to a ``ThreadPoolExecutor``
+instead of starting a thread per request. At most ``max_pending`` requests
+are running or queued at once; requests beyond that are answered on the
+accepting thread with ``503`` and ``Retry-After`` instead of piling up. Routes
+are plain functions ``(body: dict) -> dict`` keyed by ``(method, path)``.
+``GET /health`` is always available, even when busy, and merges the caller's
+``health()`` with the pool counters.
+"""
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable
+from urllib.parse import urlsplit
+
+Route = Callable[[dict], dict]
+
+REQUEST_TIMEOUT_SECONDS = 30
+BUSY_TIMEOUT_SECONDS = 1
+MAX_BODY_BYTES = 1 << 20
+
+
+class BadRequest(ValueError):
+    """Raised by a route for invalid input; answered with 400."""
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that serves requests on ``workers`` threads and sheds load beyond ``max_pending``."""
+
+    request_queue_size = 128  # listen backlog; socketserver's default of 5 resets bursts of clients
+
+    def __init__(self, address: tuple[str, int], handler, workers: int, max_pending: int):
+        super().__init__(address, handler)
+        self._busy_handler = type("BusyHandler", (handler,), {"busy": True, "timeout": BUSY_TIMEOUT_SECONDS})
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.started_at = time.time()
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="json-server")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+        # Counters (guarded by _lock)
+        self.pending = 0
+        self.served = 0
+        self.rejected = 0
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            self._reject(request, client_address)
+            return
+        with self._lock:
+            self.pending += 1
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # noqa: BLE001 - same as socketserver's own handling
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self.pending -= 1
+                self.served += 1
+            self._slots.release()
+
+    def _reject(self, request, client_address):
+        # Answer 503 on the accept thread, after reading the request so the client
+        # is not cut off mid-send; the short timeout bounds how long that can take
+        try:
+            self._busy_handler(request, client_address, self)
+        except Exception:  # noqa: BLE001
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "served": self.served,
+                "rejected": self.rejected,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+            }
+
+
+def make_handler(routes: dict[tuple[str, str], Route], health: Callable[[], dict]):
+    """Request handler class dispatching JSON bodies to ``routes``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        timeout = REQUEST_TIMEOUT_SECONDS
+        busy = False  # set on the variant the server uses to shed load
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def _dispatch(self, method: str):
+            path = urlsplit(self.path).path
+            if method == "GET" and path == "/health":
+                return self._send(200, {"status": "ok", **health(), "server": self.server.stats()})
+            route = routes.get((method, path))
+            if route is None:
+                return self._send(404, {"error": f"no route for {method} {path}"})
+
+            body: dict = {}
+            if method == "POST":
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    return self._send(413, {"error": "request body too large"})
+                raw = self.rfile.read(length)
+                if self.busy:
+                    return self._send(503, {"error": "server busy, retry shortly"}, {"Retry-After": "1"})
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    body = None
+                if not isinstance(body, dict):
+                    return self._send(400, {"error": "body must be a JSON object"})
+            elif self.busy:
+                return self._send(503, {"error": "server busy, retry shortly"}, {"Retry-After": "1"})
+
+            try:
+                payload = route(body)
+            except BadRequest as e:
+                return self._send(400, {"error": str(e)})
+            except Exception as e:  # noqa: BLE001 - report, keep serving
+                return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            self._send(200, payload)
+
+        def _send(self, status: int, payload: dict, headers: dict | None = None):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            sys.stderr.write(f"{self.address_string()} {format % args}\n")
+
+    return Handler
+
+
+def serve_json(routes: dict[tuple[str, str], Route], health: Callable[[], dict],
+               host: str, port: int, workers: int, max_pending: int) -> None:
+    """Serve ``routes`` until interrupted."""
+    server = PooledHTTPServer((host, port), make_handler(routes, health), workers, max_pending)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,394 @@
+"""
+In-process stand-in for the Pinecone client, for offline runs and load tests.
+
+Implements the subset of the client the RAG classes use (``list_indexes``,
+``create_index``, ``describe_index``, ``Index.upsert``, ``Index.query`` with
+``filter``/``include_metadata``, ``Index.list``, ``Index.delete``,
+``Index.describe_index_stats``), backed by NumPy or FAISS, with optional
+injected latency per call. Selected through ``vector_store`` by setting
+``VECTOR_STORE=local``.
+
+Indexes live in memory, in one process. With ``LOCAL_VECTOR_STORE_DIR`` set
+they are loaded from ``<name>.npz`` on start and written back only by
+``Index.flush()`` (or ``close()``), not on every write. The ingestion and
+codebook sync paths flush when they finish, and every registered index is
+flushed at interpreter exit. Each process
+holds its own copy and the last flush wins, so only one process may write a
+persisted index (``ingest_cli`` uses a single worker for this reason).
+"""
+
+import atexit
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from config_advanced import (LOCAL_VECTOR_BACKEND, LOCAL_VECTOR_JITTER_MS,
+                             LOCAL_VECTOR_LATENCY_MS, LOCAL_VECTOR_STORE_DIR)
+from topk import top_k_indices
+
+
+class _Record(dict):
+    """Dict that also allows attribute access, like the Pinecone response objects."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = value == operand
+        elif op == "$ne":
+            ok = value != operand
+        elif op == "$in":
+            ok = value in operand
+        elif op == "$nin":
+            ok = value not in operand
+        elif op == "$gt":
+            ok = value is not None and value > operand
+        elif op == "$gte":
+            ok = value is not None and value >= operand
+        elif op == "$lt":
+            ok = value is not None and value < operand
+        elif op == "$lte":
+            ok = value is not None and value <= operand
+        elif op == "$exists":
+            ok = (value is not None) == bool(operand)
+        else:
+            raise ValueError(f"Unsupported metadata filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(metadata: Dict, filter: Optional[Dict]) -> bool:
+    """Evaluate a Pinecone metadata filter against one record's metadata."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+class _Namespace:
+    """Vectors, ids and metadata of one namespace, stored as a growable float32 matrix."""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.metadata: List[Dict] = []
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.version = 0  # bumped on every write
+        self.derived = None  # (version, structure) cached by a backend
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict]):
+        new_ids = [vid for vid in dict.fromkeys(ids) if vid not in self.rows]
+        count = len(self.ids)
+        if count + len(new_ids) > len(self.vectors):
+            capacity = max(count + len(new_ids), 2 * len(self.vectors), 1024)
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:count] = self.vectors[:count]
+            self.vectors = grown
+        for vid in new_ids:
+            self.rows[vid] = len(self.ids)
+            self.ids.append(vid)
+            self.metadata.append({})
+        for vid, vector, md in zip(ids, vectors, metadata):
+            row = self.rows[vid]
+            self.vectors[row] = vector
+            self.metadata[row] = md
+        self.version += 1
+
+    def delete(self, ids: List[str]):
+        doomed = {self.rows[vid] for vid in ids if vid in self.rows}
+        if not doomed:
+            return
+        keep = [row for row in range(len(self.ids)) if row not in doomed]
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.rows = {vid: row for row, vid in enumerate(self.ids)}
+        self.version += 1
+
+
+class _NumpyBackend:
+    """Brute-force inner product over the namespace matrix."""
+
+    def search(self, ns: _Namespace, query: np.ndarray, top_k: int, rows: Optional[np.ndarray]):
+        matrix = ns.vectors[:len(ns.ids)]
+        if rows is not None:
+            matrix = matrix[rows]
+        scores = matrix @ query
+        top = top_k_indices(scores, top_k)
+        hits = top if rows is None else rows[top]
+        return scores[top], hits
+
+
+class _FaissBackend:
+    """``IndexFlatIP`` rebuilt lazily after writes; filters become an ID selector."""
+
+    def __init__(self):
+        import faiss
+        self._faiss = faiss
+
+    def search(self, ns: _Namespace, query: np.ndarray, top_k: int, rows: Optional[np.ndarray]):
+        faiss = self._faiss
+        if ns.derived is None or ns.derived[0] != ns.version:
+            index = faiss.IndexFlatIP(ns.dimension)
+            index.add(np.ascontiguousarray(ns.vectors[:len(ns.ids)]))
+            ns.derived = (ns.version, index)
+        index = ns.derived[1]
+
+        k = min(top_k, len(ns.ids) if rows is None else len(rows))
+        if k == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        params = None
+        if rows is not None:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows.astype(np.int64)))
+        scores, hits = index.search(query.reshape(1, -1), k, params=params)
+        keep = hits[0] >= 0
+        return scores[0][keep], hits[0][keep]
+
+
+class LocalIndex:
+    """In-process stand-in for ``pinecone.Index``."""
+
+    def __init__(self, name: str, dimension: int, metric: str, backend, latency_ms: float,
+                 jitter_ms: float, persist_dir: Optional[Path]):
+        if metric not in ("cosine", "dotproduct"):
+            raise ValueError(f"Local vector store supports cosine and dotproduct, not {metric}")
+        self.name = name
+        self.dimension = dimension
+        self.metric = metric
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._backend = backend
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._persist_path = persist_dir / f"{name}.npz" if persist_dir else None
+        self._dirty = False  # changed since the last flush (a new index has not been written yet)
+        if self._persist_path:
+            if self._persist_path.exists():
+                self._load()
+            else:
+                self._dirty = True
+
+    @property
+    def host(self) -> str:
+        """Where the data lives, like ``pinecone.Index.host``; part of the sync state key."""
+        return f"local://{self._persist_path.resolve() if self._persist_path else 'memory'}"
+
+    def _sleep(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _prepare(self, values) -> np.ndarray:
+        vectors = np.asarray(values, dtype=np.float32).reshape(-1, self.dimension)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = _Namespace(self.dimension)
+            self._namespaces[namespace] = ns
+        return ns
+
+    def upsert(self, vectors: List, namespace: str = "", **kwargs) -> Dict:
+        self._sleep()
+        ids, values, metadata = [], [], []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                ids.append(str(vector["id"]))
+                values.append(vector["values"])
+                metadata.append(dict(vector.get("metadata") or {}))
+            else:
+                ids.append(str(vector[0]))
+                values.append(vector[1])
+                metadata.append(dict(vector[2]) if len(vector) > 2 and vector[2] else {})
+        with self._lock:
+            self._namespace(namespace).upsert(ids, self._prepare(values), metadata)
+            self._dirty = True
+        return _Record(upserted_count=len(ids))
+
+    def query(self, vector: List[float], top_k: int = 10, namespace: str = "",
+              filter: Optional[Dict] = None, include_metadata: bool = False,
+              include_values: bool = False, **kwargs) -> _Record:
+        self._sleep()
+        query = self._prepare(vector)[0]
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or not ns.ids:
+                return _Record(matches=[], namespace=namespace)
+            rows = None
+            if filter:
+                rows = np.array([row for row, md in enumerate(ns.metadata) if matches_filter(md, filter)],
+                                dtype=np.int64)
+            scores, hits = self._backend.search(ns, query, top_k, rows)
+            matches = []
+            for score, row in zip(scores, hits):
+                match = _Record(id=ns.ids[row], score=float(score))
+                if include_metadata:
+                    match["metadata"] = dict(ns.metadata[row])
+                if include_values:
+                    match["values"] = ns.vectors[row].tolist()
+                matches.append(match)
+        return _Record(matches=matches, namespace=namespace)
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "",
+               delete_all: bool = False, **kwargs):
+        self._sleep()
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+            elif namespace in self._namespaces:
+                self._namespaces[namespace].delete(list(ids or []))
+            self._dirty = True
+        return {}
+
+    def list(self, prefix: Optional[str] = None, namespace: str = "", limit: int = 100) -> Iterator[List[str]]:
+        """Yield pages of ids, like the serverless ``Index.list`` generator."""
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            ids = [vid for vid in (ns.ids if ns else []) if not prefix or vid.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self, **kwargs) -> _Record:
+        with self._lock:
+            namespaces = {name: _Record(vector_count=len(ns.ids)) for name, ns in self._namespaces.items()}
+        return _Record(dimension=self.dimension, namespaces=namespaces,
+                       total_vector_count=sum(ns.vector_count for ns in namespaces.values()))
+
+    def flush(self):
+        """Write the index to the persist directory if it changed since the last flush.
+
+        The data is copied under the index lock and written outside it, so
+        queries are only blocked for the copy.
+        """
+        if not self._persist_path:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                arrays, manifest = {}, {"dimension": self.dimension, "metric": self.metric, "namespaces": {}}
+                for i, (name, ns) in enumerate(self._namespaces.items()):
+                    arrays[f"ns{i}"] = ns.vectors[:len(ns.ids)].copy()
+                    manifest["namespaces"][name] = {"key": f"ns{i}", "ids": list(ns.ids),
+                                                    "metadata": list(ns.metadata)}
+                self._dirty = False
+            try:
+                self._persist_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._persist_path.with_suffix(".tmp.npz")
+                np.savez(tmp_path, manifest=np.array(json.dumps(manifest)), **arrays)
+                tmp_path.replace(self._persist_path)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def close(self):
+        self.flush()
+
+    def _load(self):
+        with np.load(self._persist_path) as data:
+            manifest = json.loads(str(data["manifest"]))
+            for name, entry in manifest["namespaces"].items():
+                self._namespace(name).upsert(entry["ids"], data[entry["key"]], entry["metadata"])
+
+
+class LocalServerlessSpec:
+    """Accepted and ignored by ``LocalPinecone.create_index``."""
+
+    def __init__(self, cloud: str = "aws", region: str = "us-east-1"):
+        self.cloud = cloud
+        self.region = region
+
+
+class LocalPinecone:
+    """In-process stand-in for the ``pinecone.Pinecone`` client.
+
+    Indexes live in a process-wide registry, so every client in the process
+    (agents, Streamlit sessions, benchmarks) sees the same data.
+    """
+
+    _indexes: Dict[str, LocalIndex] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, api_key: Optional[str] = None, backend: str = LOCAL_VECTOR_BACKEND,
+                 latency_ms: float = LOCAL_VECTOR_LATENCY_MS, jitter_ms: float = LOCAL_VECTOR_JITTER_MS,
+                 persist_dir: Optional[str] = LOCAL_VECTOR_STORE_DIR):
+        if backend not in ("numpy", "faiss"):
+            raise ValueError(f"Unknown local vector backend: {backend}")
+        self.backend = backend
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        if self.persist_dir:
+            self._load_persisted()
+
+    def _load_persisted(self):
+        for path in self.persist_dir.glob("*.npz"):
+            if path.stem not in self._indexes and not path.name.endswith(".tmp.npz"):
+                with np.load(path) as data:
+                    manifest = json.loads(str(data["manifest"]))
+                self.create_index(path.stem, manifest["dimension"], manifest["metric"])
+
+    def list_indexes(self) -> List[_Record]:
+        with self._registry_lock:
+            return [_Record(name=name, dimension=index.dimension, metric=index.metric)
+                    for name, index in self._indexes.items()]
+
+    def create_index(self, name: str, dimension: int, metric: str = "cosine", spec=None, **kwargs):
+        with self._registry_lock:
+            if name not in self._indexes:
+                backend = _FaissBackend() if self.backend == "faiss" else _NumpyBackend()
+                self._indexes[name] = LocalIndex(name, dimension, metric, backend, self.latency_ms,
+                                                 self.jitter_ms, self.persist_dir)
+
+    def describe_index(self, name: str) -> _Record:
+        index = self._indexes[name]
+        return _Record(name=name, dimension=index.dimension, metric=index.metric,
+                       status={'ready': True, 'state': 'Ready'})
+
+    def delete_index(self, name: str):
+        with self._registry_lock:
+            self._indexes.pop(name, None)
+
+    def Index(self, name: str) -> LocalIndex:
+        try:
+            return self._indexes[name]
+        except KeyError:
+            raise ValueError(f"Index '{name}' does not exist") from None
+
+
+@atexit.register
+def _flush_at_exit():
+    for index in list(LocalPinecone._indexes.values()):
+        try:
+            index.flush()
+        except Exception as e:
+            print(f"⚠️ Could not write local index '{index.name}': {e}")
@@ -0,0 +1,169 @@
+"""
+Sticky model selection for LLM providers with several candidate models.
+
+Instead of walking the preference list on every request, a router remembers
+which model last answered and sends the next request straight to it. Models
+that fail are marked down and skipped by the request path; a background
+thread re-probes them every ``reprobe_seconds`` with a tiny request and, when
+a more preferred model is back, routes to it again. Per-model latency and
+error stats and the current routing decision are available from ``stats``.
+"""
+
+import hashlib
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config_advanced import MODEL_REPROBE_SECONDS
+
+_routers: Dict[Tuple, "ModelRouter"] = {}
+_routers_lock = threading.Lock()
+
+
+class _ModelStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latencies: deque = deque(maxlen=200)  # seconds, successful calls only
+        self.last_error: Optional[str] = None
+        self.down_since: Optional[float] = None
+
+
+class ModelRouter:
+    """Routes requests to the last model that worked, in ``models`` preference order."""
+
+    def __init__(self, models: List[str], probe: Callable[[str], Any],
+                 reprobe_seconds: float = MODEL_REPROBE_SECONDS):
+        self.models = list(models)
+        self.probe = probe
+        self.reprobe_seconds = reprobe_seconds
+
+        self._stats = {model: _ModelStats() for model in self.models}
+        self._current = self.models[0]
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def current(self) -> str:
+        return self._current
+
+    def candidates(self) -> List[str]:
+        """Models to try for the next request: the sticky one first, then other live ones."""
+        with self._lock:
+            live = [m for m in self.models if self._stats[m].down_since is None and m != self._current]
+            order = [self._current] + live
+            if self._stats[self._current].down_since is not None:
+                # Everything is down: still try every model, preferred first
+                order = live or list(self.models)
+            return order
+
+    def call(self, fn: Callable[[str], Any]) -> Any:
+        """Run ``fn(model)`` on the candidates in order until one succeeds."""
+        last_error: Optional[Exception] = None
+        for model in self.candidates():
+            start = time.perf_counter()
+            try:
+                result = fn(model)
+            except Exception as e:
+                self._record_failure(model, e)
+                last_error = e
+                continue
+            self._record_success(model, time.perf_counter() - start)
+            return result
+        raise last_error or RuntimeError("no models configured")
+
+    def _record_success(self, model: str, latency: float):
+        with self._lock:
+            stats = self._stats[model]
+            stats.calls += 1
+            stats.latencies.append(latency)
+            stats.down_since = None
+            if model != self._current:
+                print(f"🔀 Routing LLM requests to {model}")
+                self._current = model
+
+    def _record_failure(self, model: str, error: Exception):
+        with self._lock:
+            stats = self._stats[model]
+            stats.calls += 1
+            stats.errors += 1
+            stats.last_error = str(error)
+            if stats.down_since is None:
+                stats.down_since = time.time()
+            self._ensure_prober()
+
+    def _ensure_prober(self):
+        # Called with _lock held
+        if self._prober is None or not self._prober.is_alive():
+            self._prober = threading.Thread(target=self._reprobe_loop, name="model-reprobe", daemon=True)
+            self._prober.start()
+
+    def _reprobe_loop(self):
+        while not self._stop.wait(self.reprobe_seconds):
+            with self._lock:
+                down = [m for m in self.models if self._stats[m].down_since is not None]
+                if not down:
+                    self._prober = None
+                    return
+                preferred = self.models.index(self._current)
+            for model in down:
+                start = time.perf_counter()
+                try:
+                    self.probe(model)
+                except Exception as e:
+                    with self._lock:
+                        self._stats[model].last_error = str(e)
+                    continue
+                with self._lock:
+                    stats = self._stats[model]
+                    stats.latencies.append(time.perf_counter() - start)
+                    stats.down_since = None
+                    # A recovered model only takes over if it is preferred to the current one
+                    if self.models.index(model) < preferred:
+                        print(f"🔀 {model} is back; routing LLM requests to it")
+                        self._current = model
+                        preferred = self.models.index(model)
+
+    def close(self):
+        """Stop the background re-probe thread."""
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        """Current routing decision plus per-model status, latency and errors."""
+        order = self.candidates()
+        with self._lock:
+            models = {}
+            for model, stats in self._stats.items():
+                latencies = np.array(stats.latencies) * 1000.0
+                models[model] = {
+                    'status': 'down' if stats.down_since is not None else 'up',
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'error_rate': stats.errors / stats.calls if stats.calls else 0.0,
+                    'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                    'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+                    'last_error': stats.last_error,
+                }
+            return {'current': self._current, 'order': order, 'models': models}
+
+
+def get_model_router(provider: str, models: List[str], probe: Callable[[str], Any],
+                     api_key: str = "") -> ModelRouter:
+    """Return the process-wide router for ``provider``, this model list and ``api_key``.
+
+    Agents with different keys can see different models (and their probes use
+    their own clients), so the key's hash is part of the registry key.
+    ``probe`` is only used when the router is first created.
+    """
+    key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    key = (provider, tuple(models), key_id)
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = ModelRouter(models, probe)
+            _routers[key] = router
+        return router
@@ -1,10 +1,21 @@
+import itertools
 import os
 import time
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from vector_store import VECTOR_STORE, Pinecone, ServerlessSpec
+from answer_cache import answer_cache_enabled, get_answer_cache, retrieval_key
+from circuit_breaker import get_breaker
+from config import ENCODE_BATCH_SIZE
+from config_advanced import CLAUDE_MODELS
+from model_router import get_model_router
+from streaming import TimedStream, primed
+from doc_store import get_doc_store, light_metadata, light_metadata_enabled
+from embedding_cache import encode_cached
+from query_cache import encode_query
+from shared_engine import get_embedding_model
+from upsert_writer import UpsertWriter
 import anthropic
 from dotenv import load_dotenv
 
@@ -12,6 +23,64 @@ from dotenv import load_dotenv
 load_dotenv()
 load_dotenv("rag_secrets.env") # Fallback or override
 
+
+def iter_csv_records(df: pd.DataFrame) -> Iterator[Tuple[str, str, Dict]]:
+    """Yield (id, text, metadata) for each billing code row of a codebook DataFrame."""
+    for row in df.to_dict('records'):
+        # Construct text for embedding
+        # Combine relevant fields to create a rich semantic representation
+        code = str(row.get('Code', '')).strip()
+        description = str(row.get('Description', '')).strip()
+        how_to_use = str(row.get('How to Use', '')).strip()
+        amount = str(row.get('Amount ($CAD)', '')).strip()
+
+        if not code or pd.isna(code):
+            continue
+
+        text_to_embed = f"Code: {code}. Description: {description}. Usage: {how_to_use}. Amount: {amount}"
+        metadata = {
+            "source": "csv",
+            "code": code,
+            "description": description,
+            "how_to_use": how_to_use,
+            "amount": amount,
+            "text": text_to_embed
+        }
+
+        # Create ID
+        yield f"csv_{code}", text_to_embed, metadata
+
+
+def iter_knowledge_base_records(content: str) -> Iterator[Tuple[str, str, Dict]]:
+    """Yield (id, text, metadata) for each header section of a Markdown knowledge base."""
+    # Simple chunking by sections (headers)
+    # This is a basic strategy; for production, use a more robust text splitter
+    sections = content.split('\n#')
+
+    for i, section in enumerate(sections):
+        if not section.strip():
+            continue
+
+        # Add back the # if it wasn't the first element
+        section_text = section if i == 0 else '#' + section
+
+        # Create a descriptive title/id
+        lines = section_text.strip().split('\n')
+        title = lines[0].strip().replace('#', '').strip()[:50]
+        vector_id = f"kb_section_{i}_{title.replace(' ', '_')}"
+
+        # clean id
+        vector_id = "".join(x for x in vector_id if x.isalnum() or x in "_-")
+
+        metadata = {
+            "source": "knowledge_base",
+            "title": title,
+            "text": section_text[:4000] # Limit metadata size just in case
+        }
+
+        yield vector_id, section_text, metadata
+
+
 class PineconeBillingRagAgent:
     def __init__(self, 
                  pinecone_api_key: Optional[str] = None, 
@@ -22,7 +91,7 @@ class PineconeBillingRagAgent:
         self.pinecone_api_key = pinecone_api_key or os.getenv("PINECONE_API_KEY")
         self.anthropic_api_key = anthropic_api_key or os.getenv("ANTHROPIC_API_KEY")
         
-        if not self.pinecone_api_key:
+        if not self.pinecone_api_key and VECTOR_STORE != "local":
             raise ValueError("Pinecone API key is required. Set PINECONE_API_KEY env var or pass it to constructor.")
             
         # Initialize Pinecone
@@ -33,11 +102,13 @@ class PineconeBillingRagAgent:
         # Initialize Embedding Model (using SentenceTransformers for local/free embeddings)
         # Using all-MiniLM-L6-v2 which maps sentences to a 384 dimensional dense vector space
         print("Loading embedding model...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = get_embedding_model('all-MiniLM-L6-v2')
         
         # Initialize Anthropic if key is available
         if self.anthropic_api_key:
             self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+            self.model_router = get_model_router("anthropic", CLAUDE_MODELS, self._probe_model,
+                                                 api_key=self.anthropic_api_key)
             self.has_llm = True
         else:
             print("Warning: No ANTHROPIC_API_KEY found. Generation capabilities will be disabled (Retrieval only).")
@@ -45,6 +116,12 @@ class PineconeBillingRagAgent:
 
         self._ensure_index_exists()
         self.index = self.pc.Index(self.index_name)
+        
+        # In light metadata mode, full metadata lives in a local doc store keyed by id
+        self.doc_store = get_doc_store(self.index_name) if light_metadata_enabled() else None
+        
+        # Generated answers are reused for near-identical questions over the same sources
+        self.answer_cache = get_answer_cache(f"agent_{self.index_name}") if answer_cache_enabled() else None
 
     def _ensure_index_exists(self):
         """Check if index exists, create if not."""
@@ -73,55 +150,56 @@ class PineconeBillingRagAgent:
         else:
             print(f"Index '{self.index_name}' already exists.")
 
+    def _embed_and_upsert(self, records: Iterable[Tuple[str, str, Dict]], source_name: str,
+                          batch_size: int = 100, encode_batch_size: int = ENCODE_BATCH_SIZE) -> int:
+        """Encode (id, text, metadata) records in fixed-size batches and upsert them.
+        
+        Upserts go through a shared UpsertWriter, so several batches are in
+        flight (with retries) while the next one is encoded. The encoder runs
+        ``encode_batch_size`` texts at a time: every text in an encoder batch is
+        padded to the longest, so on CPU batches of 100 codebook rows encode
+        slower than one row at a time (see bench_embed_upsert.py). In light metadata
+        mode the full metadata goes to the doc store shard ``source_name`` and
+        the index only gets the filter fields. Returns the number of vectors.
+        """
+        records = iter(records)
+        count = 0
+        start = time.perf_counter()
+        shard = self.doc_store.open_shard(source_name) if self.doc_store else None
+        
+        with UpsertWriter(self.index, max_batch_vectors=batch_size) as writer:
+            while True:
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    break
+                
+                if shard:
+                    shard.write((vector_id, metadata) for vector_id, _, metadata in batch)
+                
+                # Only new or edited texts are sent to the encoder
+                embeddings = encode_cached(self.embedder, [text for _, text, _ in batch],
+                                           batch_size=encode_batch_size)
+                writer.add(
+                    (vector_id, embedding.tolist(), light_metadata(metadata) if shard else metadata)
+                    for (vector_id, _, metadata), embedding in zip(batch, embeddings)
+                )
+                count += len(batch)
+                print(f"Processed {count} records...")
+        if VECTOR_STORE == "local":
+            self.index.flush()  # the local store only reaches disk on flush
+        
+        elapsed = time.perf_counter() - start
+        if count:
+            print(f"Embedded and upserted {count} records in {elapsed:.1f}s ({count / elapsed:.1f} rows/sec)")
+        return count
+
     def ingest_csv_data(self, csv_path: str):
         """Ingest billing codes from CSV."""
         print(f"Ingesting data from {csv_path}...")
         try:
             df = pd.read_csv(csv_path)
             
-            # Prepare vectors
-            vectors = []
-            batch_size = 100
-            
-            for i, row in df.iterrows():
-                # Construct text for embedding
-                # Combine relevant fields to create a rich semantic representation
-                code = str(row.get('Code', '')).strip()
-                description = str(row.get('Description', '')).strip()
-                how_to_use = str(row.get('How to Use', '')).strip()
-                amount = str(row.get('Amount ($CAD)', '')).strip()
-                
-                if not code or pd.isna(code):
-                    continue
-                    
-                text_to_embed = f"Code: {code}. Description: {description}. Usage: {how_to_use}. Amount: {amount}"
-                metadata = {
-                    "source": "csv",
-                    "code": code,
-                    "description": description,
-                    "how_to_use": how_to_use,
-                    "amount": amount,
-                    "text": text_to_embed
-                }
-                
-                # Create ID
-                vector_id = f"csv_{code}"
-                
-                # Get embedding
-                embedding = self.embedder.encode(text_to_embed).tolist()
-                
-                vectors.append((vector_id, embedding, metadata))
-                
-                # Upsert in batches
-                if len(vectors) >= batch_size:
-                    self.index.upsert(vectors=vectors)
-                    vectors = []
-                    print(f"Processed {i+1} records...")
-            
-            # Upsert remaining
-            if vectors:
-                self.index.upsert(vectors=vectors)
-                
+            self._embed_and_upsert(iter_csv_records(df), os.path.basename(csv_path))
             print("CSV ingestion complete.")
             
         except Exception as e:
@@ -134,50 +212,26 @@ class PineconeBillingRagAgent:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Simple chunking by sections (headers)
-            # This is a basic strategy; for production, use a more robust text splitter
-            sections = content.split('\n#')
-            
-            vectors = []
-            
-            for i, section in enumerate(sections):
-                if not section.strip():
-                    continue
-                
-                # Add back the # if it wasn't the first element
-                section_text = section if i == 0 else '#' + section
-                
-                # Create a descriptive title/id
-                lines = section_text.strip().split('\n')
-                title = lines[0].strip().replace('#', '').strip()[:50]
-                vector_id = f"kb_section_{i}_{title.replace(' ', '_')}"
-                
-                # clean id
-                vector_id = "".join(x for x in vector_id if x.isalnum() or x in "_-")
-                
-                # Embed
-                embedding = self.embedder.encode(section_text).tolist()
-                
-                metadata = {
-                    "source": "knowledge_base",
-                    "title": title,
-                    "text": section_text[:4000] # Limit metadata size just in case
-                }
-                
-                vectors.append((vector_id, embedding, metadata))
-            
-            if vectors:
-                self.index.upsert(vectors=vectors)
-                print(f"Ingested {len(vectors)} knowledge base sections.")
+            count = self._embed_and_upsert(iter_knowledge_base_records(content), os.path.basename(file_path))
+            if count:
+                print(f"Ingested {count} knowledge base sections.")
                 
         except Exception as e:
             print(f"Error ingesting knowledge base: {e}")
 
     def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
         """Search Pinecone for relevant documents."""
-        query_embedding = self.embedder.encode(query).tolist()
+        query_embedding = encode_query(self.embedder, query)[0].tolist()
+        # Raises CircuitOpenError right away while Pinecone keeps failing
+        breaker = get_breaker("pinecone")
         
-        results = self.index.query(
+        if self.doc_store:
+            # Ids and scores only over the wire; full metadata comes from the local store
+            results = breaker.call(self.index.query, vector=query_embedding, top_k=top_k, include_metadata=False)
+            return self.doc_store.hydrate(results['matches'])
+        
+        results = breaker.call(
+            self.index.query,
             vector=query_embedding,
             top_k=top_k,
             include_metadata=True
@@ -186,6 +240,7 @@ class PineconeBillingRagAgent:
         matches = []
         for match in results['matches']:
             matches.append({
+                'id': match['id'],
                 'score': match['score'],
                 'metadata': match['metadata']
             })
@@ -194,8 +249,15 @@ class PineconeBillingRagAgent:
 
     def generate_response(self, query: str, context_matches: List[Dict], chat_history: List[Dict] = None) -> str:
         """Generate a response using Anthropic and the retrieved context."""
+        return "".join(self.generate_response_stream(query, context_matches, chat_history))
+
+    def generate_response_stream(self, query: str, context_matches: List[Dict],
+                                 chat_history: List[Dict] = None) -> Iterator[str]:
+        """Like ``generate_response``, but yields the answer text as it is generated."""
         if not self.has_llm:
-            return "Anthropic API key not set. Returning context only."
+            yield "Anthropic API key not set. Returning context only."
+            return
+        start = time.perf_counter()
 
         # meaningful context construction
         context_str = ""
@@ -245,32 +307,97 @@ class PineconeBillingRagAgent:
         Query: {query}
         """
 
-        # Try multiple models in order of preference
-        models_to_try = [
-            "claude-3-5-sonnet-20241022",
-            "claude-3-sonnet-20240229", 
-            "claude-3-haiku-20240307"  # Most widely available fallback
-        ]
-        
-        last_error = None
-        for model_name in models_to_try:
-            try:
-                response = self.anthropic_client.messages.create(
-                    model=model_name,
-                    max_tokens=2000,
-                    temperature=0.3,
-                    system=system_prompt,
-                    messages=[
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
-                return response.content[0].text
-            except Exception as e:
-                last_error = e
-                continue  # Try next model
+        # Near-identical question over the same sources and conversation: serve the stored answer
+        if self.answer_cache:
+            query_embedding = encode_query(self.embedder, query)
+            # The question itself is matched by embedding, so leave it out of the history part of the key
+            earlier = (chat_history or [])[-10:]
+            if earlier and earlier[-1].get('role') == 'user' and earlier[-1].get('content') == query:
+                earlier = earlier[:-1]
+            cache_key = retrieval_key(
+                ((match.get('id'), match['metadata']) for match in context_matches),
+                context="\n".join(f"{msg.get('role')}: {msg.get('content')}" for msg in earlier)
+            )
+            cached = self.answer_cache.get(query_embedding, cache_key)
+            if cached is not None:
+                yield from TimedStream([cached], "answer_cache", start)
+                return
+
+        def open_stream(model_name: str) -> Tuple[str, Iterator[str]]:
+            # Fails over before the first token; a model whose circuit is open fails in microseconds
+            return model_name, get_breaker(f"anthropic:{model_name}").call(
+                primed, self._anthropic_chunks(model_name, system_prompt, user_prompt)
+            )
         
-        # If all models failed, return error with helpful message
-        return f"Error: Unable to connect to any Claude model. Last error: {last_error}. Please check your ANTHROPIC_API_KEY and model access."
+        try:
+            # Goes straight to the model that answered last; failed models are re-probed in the background
+            model_name, chunks = self.model_router.call(open_stream)
+        except Exception as e:
+            # If all models failed, answer from the retrieved context alone
+            yield self._retrieval_only_answer(context_matches, e)
+            return
+        parts = []
+        try:
+            for chunk in TimedStream(chunks, f"anthropic:{model_name}", start):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            # The model failed after the first token: close the partial answer with the sources, don't cache it
+            print(f"⚠️ {model_name} stream interrupted: {e}")
+            yield "\n\n*(response interrupted)* Most relevant sources:\n\n" + "\n".join(self._source_lines(context_matches))
+            return
+        if self.answer_cache:
+            self.answer_cache.put(query_embedding, cache_key, "".join(parts), time.perf_counter() - start)
+
+    def _anthropic_chunks(self, model_name: str, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        with self.anthropic_client.messages.stream(
+            model=model_name,
+            max_tokens=2000,
+            temperature=0.3,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt}
+            ]
+        ) as stream:
+            yield from stream.text_stream
+
+    def _probe_model(self, model_name: str):
+        """Smallest possible request, used to re-probe a model that failed."""
+        get_breaker(f"anthropic:{model_name}").call(
+            self.anthropic_client.messages.create,
+            model=model_name,
+            max_tokens=1,
+            messages=[{"role": "user", "content": "ping"}]
+        )
+
+    def answer_cache_stats(self) -> Dict:
+        """Hit rate, entries and generation time saved by the answer cache."""
+        return self.answer_cache.stats() if self.answer_cache else {}
+
+    def model_routing(self) -> Dict:
+        """Which Claude model requests currently go to, with per-model latency and errors."""
+        return self.model_router.stats() if self.has_llm else {}
+
+    def _retrieval_only_answer(self, context_matches: List[Dict], reason: Exception) -> str:
+        """Answer built from the retrieved sources, used while no Claude model is reachable."""
+        lines = [
+            f"⚠️ AI synthesis is unavailable right now ({reason}). "
+            "Please check your ANTHROPIC_API_KEY and model access. Most relevant sources:",
+            ""
+        ]
+        return "\n".join(lines + self._source_lines(context_matches))
+
+    def _source_lines(self, context_matches: List[Dict]) -> List[str]:
+        """One bullet per retrieved source, for answers given without (or after a failed) synthesis."""
+        lines = []
+        for match in context_matches[:5]:
+            data = match['metadata']
+            if data.get('source') == 'csv':
+                lines.append(f"- :blue[{data.get('code')}] {data.get('description')} (:green[{data.get('amount')}])")
+            else:
+                text = data.get('text', '')
+                lines.append(f"- {text[:300]}{'...' if len(text) > 300 else ''}")
+        return lines
 
     def classify_thread_content(self, content: str) -> dict:
         """Classify thread content and return emoji + color."""
@@ -319,7 +446,8 @@ class PineconeBillingRagAgent:
             return f"Chat: {first_message[:20]}..."
             
         try:
-            response = self.anthropic_client.messages.create(
+            response = get_breaker("anthropic:claude-3-haiku-20240307").call(
+                self.anthropic_client.messages.create,
                 model="claude-3-haiku-20240307", 
                 max_tokens=20,
                 temperature=0.7,
@@ -366,7 +494,7 @@ if __name__ == "__main__":
         
     agent = PineconeBillingRagAgent()
     
-    # Ingest data (uncomment to run ingestion - usually done once)
+    # Ingest data (uncomment to run ingestion - usually done once; for bulk loads use ingest_cli.py)
     # agent.ingest_csv_data("Codes_by_class.csv")
     # agent.ingest_knowledge_base("usecases_billing.md")
     
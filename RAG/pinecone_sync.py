@@ -0,0 +1,153 @@
+"""
+Idempotent delta sync of codebook rows into a Pinecone index.
+
+Every vector id is derived from the row content and the embedding model, so
+the same row always maps to the same id regardless of its CSV position. A
+local JSON state file remembers which ids were last pushed to each index;
+a sync upserts only ids that are not there yet and deletes ids that no longer
+exist in the codebook. An unchanged codebook costs no upserts at all.
+
+The state file is keyed by the index host (a Pinecone host, or the local
+store's persist path), and is only trusted while its id count matches the
+index's vector count; otherwise the ids are listed from the index again.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from config_advanced import VECTOR_STORE
+from upsert_writer import UpsertWriter
+
+DEFAULT_STATE_DIR = Path(
+    os.getenv("PINECONE_SYNC_STATE_DIR", Path(__file__).resolve().parent / ".pinecone_sync")
+)
+ID_PREFIX = "code-"
+
+_state_lock = threading.Lock()
+
+
+def vector_id(text: str, metadata: Dict, model_name: str) -> str:
+    """Stable id for one row: changes only when its text, metadata or model change."""
+    payload = json.dumps([model_name, text, metadata], sort_keys=True, ensure_ascii=False)
+    return ID_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class PineconeSync:
+    """Tracks what has been pushed to one Pinecone index and pushes only the difference."""
+
+    def __init__(self, index, index_name: str, model_name: str,
+                 state_dir: Optional[Path] = None, namespace: str = ""):
+        self.index = index
+        self.index_name = index_name
+        self.model_name = model_name
+        self.namespace = namespace
+        # A recreated index, another environment or the local store each get their own state
+        self.host = str(getattr(index, "host", None) or type(index).__name__)
+        host_id = hashlib.sha256(self.host.encode("utf-8")).hexdigest()[:12]
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{index_name}.{namespace or 'default'}.{host_id}")
+        self.state_path = Path(state_dir or DEFAULT_STATE_DIR) / f"{safe_name}.json"
+
+    def _load_state(self) -> Optional[Set[str]]:
+        if not self.state_path.exists():
+            return None
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable Pinecone sync state: {e}")
+            return None
+        return set(state.get("ids", []))
+
+    def _save_state(self, ids: Set[str]):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"index_name": self.index_name, "namespace": self.namespace, "host": self.host,
+                 "ids": sorted(ids)}
+        tmp_path = self.state_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_path, self.state_path)
+
+    def _vector_count(self) -> Optional[int]:
+        """Vectors in this namespace according to ``describe_index_stats``, or None if unavailable."""
+        try:
+            namespaces = self.index.describe_index_stats().namespaces or {}
+        except Exception as e:
+            print(f"⚠️ Could not read Pinecone index stats ({e})")
+            return None
+        summary = namespaces.get(self.namespace)
+        if summary is None and not self.namespace:
+            summary = namespaces.get("__default__")
+        return summary.vector_count if summary is not None else 0
+
+    def _remote_ids(self) -> Set[str]:
+        """Ids currently in the index; used when the local state is missing or out of date."""
+        ids: Set[str] = set()
+        try:
+            for page in self.index.list(namespace=self.namespace):
+                ids.update(page)
+        except Exception as e:
+            # Pod-based indexes cannot list ids; stale vectors there must be cleared manually
+            print(f"⚠️ Could not list existing Pinecone ids ({e}); assuming an empty index")
+        return ids
+
+    def sync(self, records: List[Dict], embed: Callable[[List[str]], np.ndarray],
+             batch_size: int = 100) -> Dict[str, int]:
+        """Make the index hold exactly ``records`` (dicts with 'text' and 'metadata').
+
+        ``embed`` maps a list of texts to their embeddings and is only called
+        for rows that are not in the index yet.
+        """
+        with _state_lock:
+            wanted: Dict[str, Dict] = {}
+            for record in records:
+                wanted.setdefault(vector_id(record['text'], record['metadata'], self.model_name), record)
+
+            pushed = self._load_state()
+            if pushed is not None and self._vector_count() != len(pushed):
+                print(f"⚠️ Pinecone sync state for '{self.index_name}' does not match the index; "
+                      "listing its ids again")
+                pushed = None
+            if pushed is None:
+                pushed = self._remote_ids()
+
+            to_upsert = [vid for vid in wanted if vid not in pushed]
+            to_delete = sorted(pushed - wanted.keys())
+
+            pushed_lock = threading.Lock()
+
+            def record_commit(batch):
+                with pushed_lock:
+                    pushed.update(vector['id'] for vector in batch)
+                    self._save_state(pushed)
+
+            with UpsertWriter(self.index, max_batch_vectors=batch_size, namespace=self.namespace,
+                              on_commit=record_commit) as writer:
+                for start in range(0, len(to_upsert), batch_size):
+                    batch_ids = to_upsert[start:start + batch_size]
+                    embeddings = embed([wanted[vid]['text'] for vid in batch_ids])
+                    writer.add(
+                        {'id': vid, 'values': np.asarray(values).tolist(), 'metadata': wanted[vid]['metadata']}
+                        for vid, values in zip(batch_ids, embeddings)
+                    )
+
+            for start in range(0, len(to_delete), batch_size):
+                batch_ids = to_delete[start:start + batch_size]
+                self.index.delete(ids=batch_ids, namespace=self.namespace)
+                pushed.difference_update(batch_ids)
+                self._save_state(pushed)
+
+            if VECTOR_STORE == "local":
+                self.index.flush()  # the local store only reaches disk on flush
+            if not to_upsert and not to_delete:
+                self._save_state(pushed)  # records the listing on a first sync
+
+            return {
+                'upserted': len(to_upsert),
+                'deleted': len(to_delete),
+                'unchanged': len(wanted) - len(to_upsert),
+            }
@@ -0,0 +1,134 @@
+"""
+Process-wide LRU/TTL cache in front of query encoding.
+
+ER staff repeat the same few hundred searches all day, so encoding every
+query with the transformer is mostly wasted work. Keys are a normalized form
+of the text actually embedded (case-folded, whitespace-collapsed, with the
+query expansion already applied by the caller), and the cache is shared by
+every session and retriever that uses the same model.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_caches: Dict[str, "QueryEmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different queries share a key."""
+    return _WHITESPACE_RE.sub(" ", text.casefold()).strip()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings with optional expiry and hit/miss counters."""
+
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+                 ttl_seconds: Optional[float] = QUERY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, vector: np.ndarray) -> np.ndarray:
+        """Store ``vector`` under ``key`` and return the stored read-only copy."""
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)  # shared across sessions; callers must copy to modify
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def encode(self, model, text: str) -> np.ndarray:
+        """Return the 1-D embedding of ``text``, encoding it only on a cache miss.
+
+        The normalized key itself is encoded, so every spelling that maps to a
+        key gets the same vector (the MiniLM tokenizer is uncased anyway).
+        """
+        key = normalize_query(text)
+        vector = self.get(key)
+        if vector is None:
+            vector = self.put(key, np.asarray(model.encode([key]))[0])
+        return vector
+
+    def encode_many(self, model, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Return a fresh (len(texts), dim) float32 matrix; all misses go to the model in one call."""
+        keys = [normalize_query(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        for key in keys:
+            if key not in vectors:
+                vector = self.get(key)
+                if vector is not None:
+                    vectors[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            encoded = np.asarray(model.encode(missing, batch_size=batch_size))
+            for key, vector in zip(missing, encoded):
+                vectors[key] = self.put(key, vector)
+
+        return np.array([vectors[key] for key in keys], dtype=np.float32)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def get_query_cache(model_name: str) -> QueryEmbeddingCache:
+    """Return the process-wide query cache for ``model_name``."""
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            cache = QueryEmbeddingCache()
+            _caches[model_name] = cache
+        return cache
+
+
+def encode_query(model, text: str) -> np.ndarray:
+    """Encode one query through the shared cache for ``model``; returns a (1, dim) float32 copy."""
+    vector = get_query_cache(model.model_name).encode(model, text)
+    return np.array(vector, dtype=np.float32).reshape(1, -1)
+
+
+def encode_queries(model, texts: List[str]) -> np.ndarray:
+    """Encode a batch of queries through the shared cache; returns a (len(texts), dim) float32 copy."""
+    return get_query_cache(model.model_name).encode_many(model, texts)
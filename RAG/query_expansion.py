@@ -0,0 +1,227 @@
+"""
+Compiled medical query expansion shared by the billing RAG systems.
+
+Each expansion table is compiled once into a token-level phrase trie
+(longest match wins) plus a memoized single-token lookup, so a query is
+expanded in one left-to-right pass instead of re-sorting the table and
+scanning it with nested substring checks on every call.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Expansion table used by BillingRAGSystem (billing_rag_system.py)
+BILLING_EXPANSIONS: Dict[str, str] = {
+    # Symptoms to assessments
+    'chest pain': 'chest pain assessment evaluation examination',
+    'abdominal pain': 'abdominal pain assessment evaluation examination',
+    'headache': 'headache assessment evaluation examination',
+    'back pain': 'back pain assessment evaluation examination',
+    'shortness of breath': 'shortness of breath assessment evaluation examination',
+    'dizziness': 'dizziness assessment evaluation examination',
+    'nausea': 'nausea assessment evaluation examination',
+    'fever': 'fever assessment evaluation examination',
+
+    # Injuries to procedures
+    'broken bone': 'fracture reduction repair',
+    'cut': 'laceration repair suture',
+    'wound': 'laceration repair wound care',
+    'burn': 'burn treatment debridement',
+    'sprain': 'sprain treatment dislocation',
+    'dislocation': 'dislocation reduction',
+
+    # General terms to specific procedures
+    'surgery': 'surgical procedure operation',
+    'operation': 'surgical procedure operation',
+    'procedure': 'medical procedure intervention',
+    'treatment': 'medical treatment intervention',
+    'examination': 'assessment evaluation examination',
+    'checkup': 'assessment evaluation examination',
+    'consultation': 'consultation assessment evaluation',
+
+    # Emergency terms
+    'emergency': 'emergency department urgent critical',
+    'urgent': 'emergency department urgent critical',
+    'critical': 'critical care emergency urgent',
+    'trauma': 'trauma critical care emergency',
+    'accident': 'trauma emergency critical care',
+
+    # Anesthesia terms
+    'anesthesia': 'anesthesia sedation pain management',
+    'sedation': 'anesthesia sedation pain management',
+    'numbing': 'anesthesia local anesthesia',
+
+    # Time-based terms
+    'night': 'night shift after hours',
+    'weekend': 'weekend holiday after hours',
+    'after hours': 'after hours evening night weekend',
+    'evening': 'evening after hours',
+
+    # Patient types
+    'child': 'pediatric child infant',
+    'baby': 'pediatric infant newborn',
+    'elderly': 'geriatric elderly senior',
+    'adult': 'adult patient',
+
+    # Body parts
+    'heart': 'cardiac heart cardiovascular',
+    'lung': 'pulmonary lung respiratory',
+    'brain': 'neurological brain head',
+    'spine': 'spinal vertebral back',
+    'knee': 'knee joint orthopedic',
+    'shoulder': 'shoulder joint orthopedic',
+    'wrist': 'wrist joint orthopedic',
+    'ankle': 'ankle joint orthopedic',
+
+    # Medical abbreviations
+    'mi': 'myocardial infarction heart attack cardiac',
+    'cva': 'cerebrovascular accident stroke neurological',
+    'copd': 'chronic obstructive pulmonary disease lung respiratory',
+    'chf': 'congestive heart failure cardiac heart',
+    'dm': 'diabetes mellitus diabetic',
+    'htn': 'hypertension blood pressure cardiac',
+
+    # Common medical terms
+    'heart attack': 'myocardial infarction cardiac emergency',
+    'stroke': 'cerebrovascular accident neurological emergency',
+    'seizure': 'seizure neurological emergency',
+    'allergic reaction': 'allergic reaction anaphylaxis emergency',
+    'shock': 'shock critical care emergency',
+    'bleeding': 'hemorrhage bleeding emergency',
+    'unconscious': 'unconscious emergency critical care',
+    'respiratory distress': 'respiratory distress breathing emergency'
+}
+
+# Expansion table used by AdvancedBillingRAGSystem (advanced/secure apps)
+ADVANCED_EXPANSIONS: Dict[str, str] = {
+    # Symptoms to assessments
+    'chest pain': 'chest pain assessment evaluation examination',
+    'abdominal pain': 'abdominal pain assessment evaluation examination',
+    'headache': 'headache assessment evaluation examination',
+    'back pain': 'back pain assessment evaluation examination',
+    'shortness of breath': 'shortness of breath assessment evaluation examination',
+    'dizziness': 'dizziness assessment evaluation examination',
+    'nausea': 'nausea assessment evaluation examination',
+    'fever': 'fever assessment evaluation examination',
+
+    # Injuries to procedures
+    'broken bone': 'fracture reduction repair',
+    'cut': 'laceration repair suture',
+    'wound': 'laceration repair wound care',
+    'burn': 'burn treatment debridement',
+    'sprain': 'sprain treatment immobilization',
+    'dislocation': 'dislocation reduction manipulation',
+
+    # Medical conditions
+    'heart attack': 'myocardial infarction cardiac emergency',
+    'stroke': 'cerebrovascular accident stroke management',
+    'diabetes': 'diabetes management glucose monitoring',
+    'hypertension': 'hypertension blood pressure management',
+    'asthma': 'asthma respiratory management',
+    'pneumonia': 'pneumonia respiratory infection',
+
+    # Procedures
+    'surgery': 'surgical procedure operation',
+    'suture': 'suture repair laceration',
+    'injection': 'injection administration medication',
+    'dressing': 'wound dressing bandage',
+    'splint': 'splinting immobilization fracture',
+    'cast': 'casting immobilization fracture',
+
+    # Emergency terms
+    'emergency': 'emergency department urgent critical',
+    'trauma': 'trauma injury critical care',
+    'accident': 'accident injury emergency',
+    'urgent': 'urgent emergency critical',
+
+    # Time-based
+    'night': 'night shift after hours',
+    'weekend': 'weekend holiday premium',
+    'holiday': 'holiday weekend premium',
+
+    # Abbreviations
+    'mi': 'myocardial infarction heart attack cardiac',
+    'cva': 'cerebrovascular accident stroke',
+    'copd': 'chronic obstructive pulmonary disease',
+    'chf': 'congestive heart failure',
+    'uti': 'urinary tract infection',
+    'er': 'emergency room department',
+    'ed': 'emergency department',
+    'icu': 'intensive care unit',
+    'or': 'operating room surgery',
+    'pt': 'physical therapy',
+    'ot': 'occupational therapy'
+}
+
+_PUNCTUATION = ".,;:!?()[]{}\"'"
+
+_ASSESSMENT_SUFFIXES = ['assessment', 'evaluation', 'examination', 'procedure', 'treatment']
+_SYMPTOM_TERMS = ['pain', 'ache', 'discomfort']
+_INJURY_TERMS = ['fracture', 'break', 'cut', 'wound', 'laceration']
+
+
+class QueryExpander:
+    """Expand natural language queries with medical terminology and synonyms."""
+
+    def __init__(self, expansions: Dict[str, str], partial_cache_size: int = 4096):
+        self.expansions = dict(expansions)
+        # Trie over whitespace tokens: {token: (child_node, expansion_or_None)}
+        self._trie: Dict[str, Tuple[dict, Optional[str]]] = {}
+        for phrase, expansion in self.expansions.items():
+            node = self._trie
+            tokens = phrase.split()
+            for i, token in enumerate(tokens):
+                child, value = node.get(token, ({}, None))
+                if i == len(tokens) - 1:
+                    value = expansion
+                node[token] = (child, value)
+                node = child
+        self._partial = lru_cache(maxsize=partial_cache_size)(self._partial_match)
+
+    def _partial_match(self, term: str) -> str:
+        """Expansion of the first key overlapping ``term``, else the term itself."""
+        for key, expansion in self.expansions.items():
+            if term in key or key in term:
+                return expansion
+        return term
+
+    def _match_phrases(self, tokens: List[str]) -> List[str]:
+        """Walk the tokens once, emitting the longest phrase expansion at each position."""
+        terms = []
+        i = 0
+        while i < len(tokens):
+            node = self._trie
+            match_end, match_expansion = i, None
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node, expansion = node[tokens[j]]
+                j += 1
+                if expansion is not None:
+                    match_end, match_expansion = j, expansion
+            if match_expansion is not None:
+                terms.append(match_expansion)
+                i = match_end
+            else:
+                terms.append(self._partial(tokens[i]))
+                i += 1
+        return terms
+
+    def expand(self, query: str) -> str:
+        tokens = [t.strip(_PUNCTUATION) for t in query.lower().split()]
+        terms = self._match_phrases([t for t in tokens if t])
+
+        # Remove duplicate words while preserving order
+        expanded_query = ' '.join(dict.fromkeys(' '.join(terms).split()))
+
+        # Add common medical procedure suffixes if not present
+        if not any(suffix in expanded_query for suffix in _ASSESSMENT_SUFFIXES):
+            if any(symptom in expanded_query for symptom in _SYMPTOM_TERMS):
+                expanded_query += ' assessment evaluation examination'
+            elif any(injury in expanded_query for injury in _INJURY_TERMS):
+                expanded_query += ' repair treatment procedure'
+
+        return expanded_query
+
+
+BILLING_QUERY_EXPANDER = QueryExpander(BILLING_EXPANSIONS)
+ADVANCED_QUERY_EXPANDER = QueryExpander(ADVANCED_EXPANSIONS)
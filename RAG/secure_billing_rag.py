@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-from sentence_transformers import SentenceTransformer
 
 # Try to import plotly, fallback to basic charts if not available
 try:
@@ -14,14 +13,15 @@ except ImportError:
 
 import json
 import re
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional
 from datetime import datetime, time
+from time import perf_counter
 import os
 from openai import OpenAI
 
 # Try to import pinecone, fallback to FAISS if not available
 try:
-    import pinecone
+    from vector_store import Pinecone, ServerlessSpec
     PINECONE_AVAILABLE = True
 except (ImportError, Exception) as e:
     print(f"⚠️ Pinecone not available: {e}")
@@ -30,6 +30,20 @@ except (ImportError, Exception) as e:
 # Always import faiss as fallback
 import faiss
 
+from answer_cache import answer_cache_enabled, get_answer_cache, retrieval_key
+from circuit_breaker import get_breaker
+from config_advanced import HEDGE_DEADLINE_MS, RETRIEVAL_MODE
+from doc_store import get_doc_store, light_metadata, light_metadata_enabled
+from embedding_cache import encode_cached
+from hedged_retrieval import (SERVED_LOCAL, SERVED_LOCAL_BREAKER, SERVED_LOCAL_ERROR, SERVED_REMOTE,
+                              RetrievalLog, hedged_call)
+from index_snapshot import codebook_hash, load_or_build_flat_ip_index
+from pinecone_sync import PineconeSync, vector_id
+from query_expansion import ADVANCED_QUERY_EXPANDER
+from query_cache import encode_query
+from shared_engine import get_embedding_model, get_shared_system, secret_fingerprint
+from streaming import TimedStream, primed
+
 # Import login system
 from login_system import check_authentication
 
@@ -43,6 +57,8 @@ class AdvancedBillingRAGSystem:
         self.model = None
         self.index = None
         self.pinecone_index = None
+        self.doc_store = get_doc_store("medical-billing-codes") if light_metadata_enabled() else None
+        self.retrieval_log = RetrievalLog()
         
         # Initialize OpenAI client for OpenRouter
         self.client = OpenAI(
@@ -54,6 +70,10 @@ class AdvancedBillingRAGSystem:
         self.setup_pinecone()
         self.setup_embeddings()
         
+        # Generated answers are reused for near-identical questions over the same codes
+        self.answer_cache = (get_answer_cache("advanced_billing", self._codebook_version())
+                             if answer_cache_enabled() else None)
+        
     def load_data(self):
         """Load and preprocess the billing codes CSV."""
         self.df = pd.read_csv(self.csv_path)
@@ -99,6 +119,12 @@ class AdvancedBillingRAGSystem:
         
         print(f"✅ Loaded {len(self.df)} billing codes")
     
+    def _codebook_version(self) -> str:
+        """Hash of every codebook field the search results and prompts are built from."""
+        rows = (self.df['Code'] + '|' + self.df['Description'] + '|' + self.df['How to Use'].fillna('').astype(str)
+                + '|' + self.df['Amount_Numeric'].astype(str))
+        return codebook_hash(rows.tolist())
+    
     def _categorize_code_type(self, code: str) -> str:
         """Categorize codes based on their prefix."""
         if code.startswith('H'):
@@ -128,8 +154,6 @@ class AdvancedBillingRAGSystem:
             return
             
         try:
-            from pinecone import Pinecone, ServerlessSpec
-            
             # Initialize Pinecone client
             pc = Pinecone(api_key=self.pinecone_api_key)
             
@@ -161,17 +185,16 @@ class AdvancedBillingRAGSystem:
     def setup_embeddings(self):
         """Setup embeddings model and create vector embeddings."""
         print("🔧 Setting up embeddings...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = get_embedding_model('all-MiniLM-L6-v2')
         
         # Create embeddings for all descriptions
         descriptions = self.df['Enhanced_Description'].tolist()
-        self.code_embeddings = self.model.encode(descriptions)
         
         if self.pinecone_index and PINECONE_AVAILABLE:
-            # Upload to Pinecone
-            print("📤 Uploading embeddings to Pinecone...")
-            vectors_to_upsert = []
-            for i, (_, row) in enumerate(self.df.iterrows()):
+            # Push only rows that changed since the last sync
+            print("📤 Syncing embeddings to Pinecone...")
+            records = []
+            for description, row in zip(descriptions, self.df.to_dict('records')):
                 # Clean metadata to handle NaN values
                 metadata = {
                     'code': str(row['Code']),
@@ -181,28 +204,30 @@ class AdvancedBillingRAGSystem:
                     'amount_numeric': float(row['Amount_Numeric']) if pd.notna(row['Amount_Numeric']) else 0.0,
                     'code_type': str(row['Code_Type'])
                 }
-                
-                vectors_to_upsert.append({
-                    'id': str(i),
-                    'values': self.code_embeddings[i].tolist(),
-                    'metadata': metadata
-                })
+                records.append({'text': description, 'metadata': metadata})
             
-            # Batch upload
-            batch_size = 100
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i+batch_size]
-                self.pinecone_index.upsert(vectors=batch)
+            if self.doc_store:
+                # Index keeps ids + filter fields; full rows are hydrated from the doc store
+                self.doc_store.replace_shard(
+                    f"codebook_{os.path.basename(self.csv_path)}",
+                    ((vector_id(r['text'], light_metadata(r['metadata']), self.model.model_name), r['metadata'])
+                     for r in records)
+                )
+                records = [{'text': r['text'], 'metadata': light_metadata(r['metadata'])} for r in records]
             
-            print("✅ Embeddings uploaded to Pinecone")
-        else:
-            # Fallback to local FAISS
-            print("📦 Setting up local FAISS index...")
-            dimension = self.code_embeddings.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)
-            faiss.normalize_L2(self.code_embeddings)
-            self.index.add(self.code_embeddings)
-            print("✅ Local FAISS index ready")
+            sync = PineconeSync(self.pinecone_index, "medical-billing-codes", self.model.model_name)
+            stats = sync.sync(records, lambda texts: encode_cached(self.model, texts))
+            print(f"✅ Pinecone in sync: {stats['upserted']} upserted, "
+                  f"{stats['deleted']} deleted, {stats['unchanged']} unchanged")
+        
+        # Local FAISS index: the only search path without Pinecone, and the fallback/hedge
+        # with it (loaded from its snapshot, so this is cheap after the first start)
+        print("📦 Setting up local FAISS index...")
+        self.index = load_or_build_flat_ip_index(
+            self.csv_path, 'advanced', descriptions, self.model.model_name,
+            lambda: encode_cached(self.model, descriptions)
+        )
+        print("✅ Local FAISS index ready")
     
     def search_codes(self, query: str, top_k: int = 20) -> Dict:
         """Search for relevant billing codes using Pinecone or FAISS."""
@@ -210,67 +235,8 @@ class AdvancedBillingRAGSystem:
         expanded_query = self._expand_query_with_nlp(query)
         combined_query = f"{query} {expanded_query}"
         
-        query_embedding = self.model.encode([combined_query])
-        
-        if self.pinecone_index and PINECONE_AVAILABLE:
-            # Search using Pinecone
-            try:
-                results = self.pinecone_index.query(
-                    vector=query_embedding[0].tolist(),
-                    top_k=top_k,
-                    include_metadata=True
-                )
-                
-                # Process Pinecone results
-                codes = []
-                for match in results['matches']:
-                    metadata = match['metadata']
-                    codes.append({
-                        'code': metadata['code'],
-                        'description': metadata['description'],
-                        'how_to_use': metadata['how_to_use'],
-                        'amount': metadata['amount'],
-                        'amount_numeric': metadata['amount_numeric'],
-                        'code_type': metadata['code_type'],
-                        'similarity_score': match['score']
-                    })
-            except Exception as e:
-                print(f"❌ Pinecone search failed: {e}, falling back to FAISS")
-                # Fallback to FAISS
-                faiss.normalize_L2(query_embedding)
-                scores, indices = self.index.search(query_embedding, top_k)
-                
-                codes = []
-                for score, idx in zip(scores[0], indices[0]):
-                    if idx < len(self.df):
-                        row = self.df.iloc[idx]
-                        codes.append({
-                            'code': row['Code'],
-                            'description': row['Description'],
-                            'how_to_use': row['How to Use'],
-                            'amount': row['Amount ($CAD)'],
-                            'amount_numeric': row['Amount_Numeric'],
-                            'code_type': row['Code_Type'],
-                            'similarity_score': float(score)
-                        })
-        else:
-            # Use FAISS
-            faiss.normalize_L2(query_embedding)
-            scores, indices = self.index.search(query_embedding, top_k)
-            
-            codes = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.df):
-                    row = self.df.iloc[idx]
-                    codes.append({
-                        'code': row['Code'],
-                        'description': row['Description'],
-                        'how_to_use': row['How to Use'],
-                        'amount': row['Amount ($CAD)'],
-                        'amount_numeric': row['Amount_Numeric'],
-                        'code_type': row['Code_Type'],
-                        'similarity_score': float(score)
-                    })
+        query_embedding = encode_query(self.model, combined_query)
+        codes, served_by = self._retrieve_codes(query_embedding, top_k)
         
         # Categorize results based on Canadian billing hierarchy
         primary_codes = []
@@ -310,119 +276,104 @@ class AdvancedBillingRAGSystem:
             'total_primary': len(primary_codes),
             'total_add_ons': len(add_on_codes),
             'expanded_query': expanded_query,
-            'encounter_type': 'Critical Care' if g_codes else 'Emergency Medicine' if h_codes else 'General'
+            'encounter_type': 'Critical Care' if g_codes else 'Emergency Medicine' if h_codes else 'General',
+            'served_by': served_by
         }
     
+    def _retrieve_codes(self, query_embedding: np.ndarray, top_k: int) -> Tuple[List[Dict], str]:
+        """Run the configured retrieval path and record which one served the request."""
+        start = perf_counter()
+        breaker = get_breaker("pinecone")
+        if not (self.pinecone_index and PINECONE_AVAILABLE):
+            codes, served_by = self._faiss_codes(query_embedding, top_k), SERVED_LOCAL
+        elif breaker.rejecting():
+            # Pinecone keeps failing; skip it until the breaker lets a trial call through
+            codes, served_by = self._faiss_codes(query_embedding, top_k), SERVED_LOCAL_BREAKER
+        elif RETRIEVAL_MODE == "hedged":
+            # Race Pinecone against local FAISS; slow-but-successful remote calls no longer stall the UI
+            codes, served_by = hedged_call(
+                lambda: breaker.call(self._pinecone_codes, query_embedding, top_k),
+                lambda: self._faiss_codes(query_embedding, top_k),
+                HEDGE_DEADLINE_MS / 1000.0
+            )
+        else:
+            try:
+                codes, served_by = breaker.call(self._pinecone_codes, query_embedding, top_k), SERVED_REMOTE
+            except Exception as e:
+                print(f"❌ Pinecone search failed: {e}, falling back to FAISS")
+                codes, served_by = self._faiss_codes(query_embedding, top_k), SERVED_LOCAL_ERROR
+        self.retrieval_log.record(served_by, perf_counter() - start)
+        return codes, served_by
+    
+    def _pinecone_codes(self, query_embedding: np.ndarray, top_k: int) -> List[Dict]:
+        """Search using Pinecone."""
+        results = self.pinecone_index.query(
+            vector=query_embedding[0].tolist(),
+            top_k=top_k,
+            include_metadata=self.doc_store is None
+        )
+        
+        matches = results['matches']
+        if self.doc_store:
+            matches = self.doc_store.hydrate(matches)
+        
+        # Process Pinecone results
+        codes = []
+        for match in matches:
+            metadata = match['metadata']
+            if 'description' not in metadata:
+                continue  # not hydrated (doc store shard missing or being rewritten)
+            codes.append({
+                'code': metadata['code'],
+                'description': metadata['description'],
+                'how_to_use': metadata['how_to_use'],
+                'amount': metadata['amount'],
+                'amount_numeric': metadata['amount_numeric'],
+                'code_type': metadata['code_type'],
+                'similarity_score': match['score']
+            })
+        return codes
+    
+    def _faiss_codes(self, query_embedding: np.ndarray, top_k: int) -> List[Dict]:
+        """Search using the local FAISS index."""
+        query_embedding = query_embedding.copy()  # may run alongside a Pinecone query on the same array
+        faiss.normalize_L2(query_embedding)
+        scores, indices = self.index.search(query_embedding, top_k)
+        
+        codes = []
+        for score, idx in zip(scores[0], indices[0]):
+            if 0 <= idx < len(self.df):
+                row = self.df.iloc[idx]
+                codes.append({
+                    'code': row['Code'],
+                    'description': row['Description'],
+                    'how_to_use': row['How to Use'],
+                    'amount': row['Amount ($CAD)'],
+                    'amount_numeric': row['Amount_Numeric'],
+                    'code_type': row['Code_Type'],
+                    'similarity_score': float(score)
+                })
+        return codes
+    
+    def answer_cache_stats(self) -> Dict:
+        """Hit rate, entries and generation time saved by the answer cache."""
+        return self.answer_cache.stats() if self.answer_cache else {}
+    
+    def retrieval_stats(self) -> Dict:
+        """Which retrieval path served recent searches, with latency percentiles."""
+        return self.retrieval_log.stats()
+    
     def _expand_query_with_nlp(self, query: str) -> str:
         """Expand natural language queries with medical terminology and synonyms."""
-        query_lower = query.lower().strip()
-        
-        # Medical term expansions and synonyms
-        medical_expansions = {
-            # Symptoms to assessments
-            'chest pain': 'chest pain assessment evaluation examination',
-            'abdominal pain': 'abdominal pain assessment evaluation examination',
-            'headache': 'headache assessment evaluation examination',
-            'back pain': 'back pain assessment evaluation examination',
-            'shortness of breath': 'shortness of breath assessment evaluation examination',
-            'dizziness': 'dizziness assessment evaluation examination',
-            'nausea': 'nausea assessment evaluation examination',
-            'fever': 'fever assessment evaluation examination',
-            
-            # Injuries to procedures
-            'broken bone': 'fracture reduction repair',
-            'cut': 'laceration repair suture',
-            'wound': 'laceration repair wound care',
-            'burn': 'burn treatment debridement',
-            'sprain': 'sprain treatment immobilization',
-            'dislocation': 'dislocation reduction manipulation',
-            
-            # Medical conditions
-            'heart attack': 'myocardial infarction cardiac emergency',
-            'stroke': 'cerebrovascular accident stroke management',
-            'diabetes': 'diabetes management glucose monitoring',
-            'hypertension': 'hypertension blood pressure management',
-            'asthma': 'asthma respiratory management',
-            'pneumonia': 'pneumonia respiratory infection',
-            
-            # Procedures
-            'surgery': 'surgical procedure operation',
-            'suture': 'suture repair laceration',
-            'injection': 'injection administration medication',
-            'dressing': 'wound dressing bandage',
-            'splint': 'splinting immobilization fracture',
-            'cast': 'casting immobilization fracture',
-            
-            # Emergency terms
-            'emergency': 'emergency department urgent critical',
-            'trauma': 'trauma injury critical care',
-            'accident': 'accident injury emergency',
-            'urgent': 'urgent emergency critical',
-            
-            # Time-based
-            'night': 'night shift after hours',
-            'weekend': 'weekend holiday premium',
-            'holiday': 'holiday weekend premium',
-            
-            # Abbreviations
-            'mi': 'myocardial infarction heart attack cardiac',
-            'cva': 'cerebrovascular accident stroke',
-            'copd': 'chronic obstructive pulmonary disease',
-            'chf': 'congestive heart failure',
-            'uti': 'urinary tract infection',
-            'er': 'emergency room department',
-            'ed': 'emergency department',
-            'icu': 'intensive care unit',
-            'or': 'operating room surgery',
-            'pt': 'physical therapy',
-            'ot': 'occupational therapy'
-        }
-        
-        expanded_terms = []
-        remaining_query = query_lower
-        
-        # First, try to match multi-word phrases
-        for phrase, expansion in sorted(medical_expansions.items(), key=lambda x: len(x[0]), reverse=True):
-            if phrase in remaining_query:
-                expanded_terms.append(expansion)
-                remaining_query = remaining_query.replace(phrase, '').strip()
-        
-        # Then, try individual terms
-        for term in remaining_query.split():
-            if term in medical_expansions:
-                expanded_terms.append(medical_expansions[term])
-            else:
-                # Try partial matches
-                for key, expansion in medical_expansions.items():
-                    if term in key or key in term:
-                        expanded_terms.append(expansion)
-                        break
-                else:
-                    expanded_terms.append(term)
-        
-        # Combine and remove duplicates
-        expanded_query = ' '.join(expanded_terms)
-        words = expanded_query.split()
-        seen = set()
-        unique_words = []
-        for word in words:
-            if word not in seen:
-                seen.add(word)
-                unique_words.append(word)
-        
-        expanded_query = ' '.join(unique_words)
-        
-        # Add context if no medical terms found
-        if not any(suffix in expanded_query for suffix in ['assessment', 'evaluation', 'examination', 'procedure', 'treatment']):
-            if any(symptom in expanded_query for symptom in ['pain', 'ache', 'discomfort']):
-                expanded_query += ' assessment evaluation examination'
-            elif any(injury in expanded_query for injury in ['fracture', 'break', 'cut', 'wound', 'laceration']):
-                expanded_query += ' repair treatment procedure'
-        
-        return expanded_query
+        return ADVANCED_QUERY_EXPANDER.expand(query)
     
     def generate_llm_response(self, query: str, search_results: Dict) -> str:
         """Generate LLM-powered response using OpenRouter."""
+        return "".join(self.generate_llm_response_stream(query, search_results))
+    
+    def generate_llm_response_stream(self, query: str, search_results: Dict) -> Iterator[str]:
+        """Like ``generate_llm_response``, but yields the answer text as it is generated."""
+        start = perf_counter()
         try:
             # Prepare context from search results
             primary_codes = search_results['primary_codes'][:5]  # Top 5 primary codes
@@ -475,21 +426,60 @@ Please provide:
 Focus on Canadian healthcare billing practices and revenue optimization.
 """
             
-            # Call OpenRouter API
-            response = self.client.chat.completions.create(
-                model="meta-llama/llama-3.2-3b-instruct:free",
-                messages=[
-                    {"role": "system", "content": "You are a medical billing expert AI assistant specializing in Canadian healthcare billing codes and revenue optimization."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.3
-            )
+            # Near-identical question over the same codes: serve the stored answer
+            if self.answer_cache:
+                query_embedding = encode_query(self.model, query)
+                cache_key = retrieval_key(
+                    (code['code'], [code['description'], code['amount_numeric']])
+                    for code in primary_codes + add_on_codes
+                )
+                cached = self.answer_cache.get(query_embedding, cache_key)
+                if cached is not None:
+                    yield from TimedStream([cached], "answer_cache", start)
+                    return
+            
+            # Call OpenRouter API (fails fast while its circuit is open)
+            try:
+                chunks = get_breaker("openrouter").call(primed, self._openrouter_chunks(prompt))
+            except Exception as e:
+                yield self._retrieval_only_answer(search_results, e)
+                return
             
-            return response.choices[0].message.content
+            parts = []
+            for chunk in TimedStream(chunks, "openrouter", start):
+                parts.append(chunk)
+                yield chunk
+            if self.answer_cache:
+                self.answer_cache.put(query_embedding, cache_key, "".join(parts), perf_counter() - start)
             
         except Exception as e:
-            return f"❌ Error generating LLM response: {str(e)}"
+            yield f"❌ Error generating LLM response: {str(e)}"
+    
+    def _openrouter_chunks(self, prompt: str) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model="meta-llama/llama-3.2-3b-instruct:free",
+            messages=[
+                {"role": "system", "content": "You are a medical billing expert AI assistant specializing in Canadian healthcare billing codes and revenue optimization."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.3,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _retrieval_only_answer(self, search_results: Dict, reason: Exception) -> str:
+        """Answer from the search results alone, used while the LLM is unavailable."""
+        lines = [f"⚠️ AI analysis is temporarily unavailable ({reason}). Top matching codes from the codebook:", ""]
+        for title, key in [("Primary Codes", 'primary_codes'), ("Add-on Codes", 'add_on_codes')]:
+            codes = search_results.get(key, [])[:5]
+            if codes:
+                lines.append(f"**{title}:**")
+                lines.extend(f"- **{code['code']}**: {code['description']} (${code['amount_numeric']:.2f})" for code in codes)
+                lines.append("")
+        return "\n".join(lines)
     
     def get_canadian_billing_recommendations(self, query: str) -> Dict:
         """Get specialized Canadian billing recommendations following G/H code hierarchy."""
@@ -1188,21 +1178,21 @@ def main():
         st.warning("Please enter your API keys in the sidebar to continue.")
         return
     
-    # Initialize RAG system
-    if 'rag_system' not in st.session_state:
-        with st.spinner("Initializing Secure RAG System..."):
-            try:
-                st.session_state.rag_system = AdvancedBillingRAGSystem(
+    # Initialize RAG system (shared by every session in this server process)
+    with st.spinner("Initializing Secure RAG System..."):
+        try:
+            rag_system = get_shared_system(
+                (AdvancedBillingRAGSystem, 'Codes_by_class.csv',
+                 secret_fingerprint(pinecone_key), secret_fingerprint(openrouter_key)),
+                lambda: AdvancedBillingRAGSystem(
                     'Codes_by_class.csv',
                     pinecone_key,
                     openrouter_key
                 )
-                st.success("✅ Secure RAG System initialized successfully!")
-            except Exception as e:
-                st.error(f"❌ Failed to initialize RAG system: {str(e)}")
-                return
-    
-    rag_system = st.session_state.rag_system
+            )
+        except Exception as e:
+            st.error(f"❌ Failed to initialize RAG system: {str(e)}")
+            return
     
     # Get user role for personalized experience
     user_role = st.session_state.get('user_info', {}).get('role', 'billing')
@@ -1243,25 +1233,37 @@ def main():
         with col2:
             search_button = st.button("🔍 Search", type="primary")
         
+        streamed_now = False
         if search_button and search_query:
-            with st.spinner("Searching with Pinecone and generating LLM response..."):
+            with st.spinner("Searching with Pinecone..."):
                 # Search for codes
                 results = rag_system.search_codes(search_query)
-                
-                # Generate LLM response
-                llm_response = rag_system.generate_llm_response(search_query, results)
-                
-                # Store results
-                st.session_state.search_results = results
-                st.session_state.llm_response = llm_response
-                st.session_state.current_query = search_query
+            
+            # Generate LLM response, rendering tokens as they arrive
+            st.subheader("🤖 AI Analysis & Recommendations")
+            response_placeholder = st.empty()
+            stream = rag_system.generate_llm_response_stream(search_query, results)
+            with st.spinner("Generating LLM response..."):
+                llm_response = next(stream, "")  # spinner only until the first token
+            response_placeholder.markdown(llm_response + "▌")
+            for chunk in stream:
+                llm_response += chunk
+                response_placeholder.markdown(llm_response + "▌")
+            response_placeholder.markdown(llm_response)
+            st.markdown("---")
+            streamed_now = True
+            
+            # Store results
+            st.session_state.search_results = results
+            st.session_state.llm_response = llm_response
+            st.session_state.current_query = search_query
         
         # Display results
         if 'search_results' in st.session_state and st.session_state.search_results:
             results = st.session_state.search_results
             
-            # Show LLM response
-            if 'llm_response' in st.session_state:
+            # Show LLM response (already rendered above if it was just streamed)
+            if 'llm_response' in st.session_state and not streamed_now:
                 st.subheader("🤖 AI Analysis & Recommendations")
                 st.markdown(st.session_state.llm_response)
                 st.markdown("---")
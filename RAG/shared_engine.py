@@ -0,0 +1,98 @@
+"""
+Process-wide shared retrieval resources.
+
+Streamlit runs every browser session inside the same server process, so
+anything built into ``st.session_state`` is duplicated per login. The helpers
+here keep the heavy, read-only pieces (embedding model, codebook, embeddings,
+FAISS index) once per process and hand the same instance to every session.
+Per-session state should be limited to results and UI choices.
+"""
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from sentence_transformers import SentenceTransformer
+
+from config import EMBEDDING_MODEL
+
+_registry_lock = threading.Lock()
+_models: Dict[str, "SharedEmbeddingModel"] = {}
+_systems: Dict[Hashable, Any] = {}
+_build_locks: Dict[Hashable, threading.Lock] = {}
+
+
+class SharedEmbeddingModel:
+    """SentenceTransformer wrapper that is safe to call from many sessions.
+
+    The fast tokenizers used by sentence-transformers are not re-entrant, so
+    ``encode`` is serialized; every other attribute is forwarded untouched.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name)
+        self._encode_lock = threading.Lock()
+
+    def encode(self, *args, **kwargs):
+        with self._encode_lock:
+            return self._model.encode(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._model, name)
+
+
+def _build_lock_for(key: Hashable) -> threading.Lock:
+    with _registry_lock:
+        lock = _build_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _build_locks[key] = lock
+        return lock
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL) -> SharedEmbeddingModel:
+    """Return the process-wide embedding model, loading it on first use."""
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _build_lock_for(("model", model_name)):
+        model = _models.get(model_name)
+        if model is None:
+            print(f"🔧 Loading shared embedding model '{model_name}'...")
+            model = SharedEmbeddingModel(model_name)
+            _models[model_name] = model
+        return model
+
+
+def secret_fingerprint(secret: str) -> str:
+    """sha256 of ``secret``, for registry keys that must not hold the secret itself."""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+def get_shared_system(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """Return the process-wide object for ``key``, building it once with ``factory``.
+
+    Concurrent callers asking for the same key wait for the first build instead
+    of building their own copy. A failed build is not cached, so the next
+    caller retries. The returned object is shared and must be treated as
+    read-only by callers. Keys live as long as the process, so put
+    ``secret_fingerprint(api_key)`` in them, never the key itself.
+    """
+    system = _systems.get(key)
+    if system is not None:
+        return system
+
+    with _build_lock_for(key):
+        system = _systems.get(key)
+        if system is None:
+            system = factory()
+            _systems[key] = system
+        return system
+
+
+def clear_shared_systems() -> None:
+    """Drop cached systems (e.g. after the codebook CSV was replaced)."""
+    with _registry_lock:
+        _systems.clear()
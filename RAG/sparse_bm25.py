@@ -0,0 +1,87 @@
+"""
+BM25 (Okapi) over a precomputed sparse term-document matrix.
+
+Scores are identical to ``rank_bm25.BM25Okapi`` (same IDF with the
+``epsilon * average_idf`` floor for negative values, same k1/b length
+normalization), but every per-(term, document) weight is computed once at
+index time and stored in a CSR matrix with one row per term. Scoring a query
+is then a slice of the query's term rows summed into a dense score vector,
+instead of a Python loop over every document for every query token.
+"""
+from __future__ import annotations
+
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from topk import top_k_indices
+
+
+class SparseBM25:
+    def __init__(self, corpus: list[list[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(corpus)
+
+        self.vocab: dict[str, int] = {}
+        term_ids: list[int] = []
+        doc_ids: list[int] = []
+        doc_len = np.zeros(self.corpus_size)
+        for d, tokens in enumerate(corpus):
+            doc_len[d] = len(tokens)
+            term_ids.extend(self.vocab.setdefault(t, len(self.vocab)) for t in tokens)
+            doc_ids.extend([d] * len(tokens))
+        self.avgdl = doc_len.sum() / self.corpus_size
+
+        # Raw term frequencies; duplicate (term, doc) pairs are summed by the conversion to CSR
+        tf = sparse.csr_matrix(
+            (np.ones(len(term_ids)), (np.asarray(term_ids, dtype=np.int64), np.asarray(doc_ids, dtype=np.int64))),
+            shape=(len(self.vocab), self.corpus_size),
+        )
+        tf.sum_duplicates()
+
+        # IDF, with negative values floored to epsilon * (unfloored) average, as in rank_bm25
+        doc_freq = np.diff(tf.indptr)
+        idf = np.log(self.corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        self.average_idf = float(idf.mean()) if len(idf) else 0.0
+        idf[idf < 0] = self.epsilon * self.average_idf
+        self.idf = idf
+
+        # Fold IDF and length normalization into the stored weights
+        freq = tf.data
+        norm = self.k1 * (1 - self.b + self.b * doc_len[tf.indices] / self.avgdl)
+        term_of_entry = np.repeat(np.arange(len(self.vocab)), doc_freq)
+        tf.data = idf[term_of_entry] * (freq * (self.k1 + 1) / (freq + norm))
+        self.matrix = tf
+
+    def _query_counts(self, query: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Vocabulary ids of the query's known terms and how often each occurs."""
+        counts = Counter(t for t in query if t in self.vocab)
+        term_ids = np.fromiter((self.vocab[t] for t in counts), dtype=np.int64, count=len(counts))
+        return term_ids, np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+    def get_scores(self, query: list[str]) -> np.ndarray:
+        """BM25 score of every document; repeated query tokens count repeatedly."""
+        term_ids, weights = self._query_counts(query)
+        rows = self.matrix[term_ids]
+        entry_weights = rows.data * np.repeat(weights, np.diff(rows.indptr))
+        return np.bincount(rows.indices, weights=entry_weights, minlength=self.corpus_size)
+
+    def get_scores_batch(self, queries: list[list[str]]) -> np.ndarray:
+        """``get_scores`` for many queries (one row each), as one sparse matrix product."""
+        encoded = [self._query_counts(query) for query in queries]
+        query_terms = sparse.csr_matrix(
+            (
+                np.concatenate([w for _, w in encoded] or [np.zeros(0)]),
+                np.concatenate([ids for ids, _ in encoded] or [np.zeros(0, dtype=np.int64)]),
+                np.cumsum([0] + [len(ids) for ids, _ in encoded]),
+            ),
+            shape=(len(queries), len(self.vocab)),
+        )
+        return (query_terms @ self.matrix).toarray()
+
+    def top_n(self, query: list[str], n: int) -> list[int]:
+        """Indices of the ``n`` best-scoring documents, best first (equal scores by index)."""
+        return top_k_indices(self.get_scores(query), n).tolist()
@@ -0,0 +1,77 @@
+"""
+TF-IDF query scoring without scikit-learn at query time.
+
+``SparseTfidf`` is built from a fitted ``TfidfVectorizer`` and its document
+matrix, and keeps only plain data: the vocabulary, IDF weights, token
+pattern, stop words and n-gram range, plus the L2-normalized document
+vectors stored term-major (one CSR row per term). A query is analyzed the
+way the vectorizer would, and its cosine similarity with every document is a
+slice of its term rows summed with ``bincount``, as in ``SparseBM25``.
+
+Importing scikit-learn costs more than a second, so an index loaded from a
+snapshot can answer queries without it.
+"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+
+class SparseTfidf:
+    def __init__(self, vectorizer, matrix):
+        # Only the word-analyzer / raw-tf / l2 configuration is reproduced here
+        if (vectorizer.analyzer != "word" or vectorizer.norm != "l2" or vectorizer.sublinear_tf
+                or not vectorizer.use_idf or vectorizer.preprocessor is not None
+                or vectorizer.tokenizer is not None or vectorizer.strip_accents is not None):
+            raise ValueError("SparseTfidf only supports word n-grams with idf, raw tf and l2 norm")
+        self.lowercase = vectorizer.lowercase
+        self.token_pattern = re.compile(vectorizer.token_pattern)
+        self.stop_words = frozenset(vectorizer.get_stop_words() or ())
+        self.ngram_range = tuple(vectorizer.ngram_range)
+        self.vocab: dict[str, int] = dict(vectorizer.vocabulary_)
+        self.idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        self.num_docs = matrix.shape[0]
+        self.matrix = matrix.T.tocsr()  # terms x documents
+
+    def analyze(self, text: str) -> list[str]:
+        """Word n-grams of ``text``, matching ``TfidfVectorizer.build_analyzer()``."""
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self.token_pattern.findall(text) if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def _query_weights(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """Vocabulary ids and L2-normalized TF-IDF weights of the query's n-grams."""
+        counts = Counter(g for g in self.analyze(text) if g in self.vocab)
+        term_ids = np.fromiter((self.vocab[g] for g in counts), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[term_ids]
+        if len(weights):
+            weights /= np.linalg.norm(weights)
+        return term_ids, weights
+
+    def get_scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of the query with every document."""
+        term_ids, weights = self._query_weights(text)
+        rows = self.matrix[term_ids]
+        entry_weights = rows.data * np.repeat(weights, np.diff(rows.indptr))
+        return np.bincount(rows.indices, weights=entry_weights, minlength=self.num_docs)
+
+    def get_scores_batch(self, texts: list[str]) -> np.ndarray:
+        """``get_scores`` for many queries (one row each), as one sparse matrix product."""
+        encoded = [self._query_weights(text) for text in texts]
+        query_terms = sparse.csr_matrix(
+            (
+                np.concatenate([w for _, w in encoded] or [np.zeros(0)]),
+                np.concatenate([ids for ids, _ in encoded] or [np.zeros(0, dtype=np.int64)]),
+                np.cumsum([0] + [len(ids) for ids, _ in encoded]),
+            ),
+            shape=(len(texts), len(self.vocab)),
+        )
+        return (query_terms @ self.matrix).toarray()
@@ -0,0 +1,80 @@
+"""
+Helpers for streaming LLM responses token by token.
+
+``primed`` pulls the first chunk of a stream eagerly, so a request that fails
+outright (bad model, provider down) raises before anything has been shown and
+the caller can still fall back. ``TimedStream`` passes chunks through while
+recording the time to first token and the total generation time into a
+process-wide log, summarised by ``stream_stats``.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+
+def primed(chunks: Iterable[str]) -> Iterator[str]:
+    """Start ``chunks`` now, raising any error from the request before it is yielded."""
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    return itertools.chain([] if first is None else [first], chunks)
+
+
+class StreamLog:
+    """Rolling record of time to first token and total time per streamed response."""
+
+    def __init__(self, max_entries: int = 1000):
+        self._entries: deque = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, label: str, ttft_seconds: Optional[float], total_seconds: float):
+        with self._lock:
+            self._entries.append((label, ttft_seconds, total_seconds))
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            entries = list(self._entries)
+        stats = {}
+        for label in sorted({label for label, _, _ in entries}):
+            ttfts = np.array([t for l, t, _ in entries if l == label and t is not None]) * 1000.0
+            totals = np.array([t for l, _, t in entries if l == label]) * 1000.0
+            stats[label] = {
+                'responses': len(totals),
+                'ttft_p50_ms': float(np.percentile(ttfts, 50)) if len(ttfts) else None,
+                'ttft_p95_ms': float(np.percentile(ttfts, 95)) if len(ttfts) else None,
+                'total_p50_ms': float(np.percentile(totals, 50)),
+            }
+        return stats
+
+
+STREAM_LOG = StreamLog()
+
+
+class TimedStream:
+    """Iterates ``chunks``, measuring from ``started_at`` (default: now) to the first and last chunk."""
+
+    def __init__(self, chunks: Iterable[str], label: str, started_at: Optional[float] = None):
+        self._chunks = chunks
+        self.label = label
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.ttft: Optional[float] = None
+        self.total: Optional[float] = None
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for chunk in self._chunks:
+                if self.ttft is None and chunk:
+                    self.ttft = time.perf_counter() - self.started_at
+                yield chunk
+        finally:
+            self.total = time.perf_counter() - self.started_at
+            STREAM_LOG.record(self.label, self.ttft, self.total)
+
+
+def stream_stats() -> Dict[str, Dict]:
+    """Time-to-first-token and total-time percentiles per provider/model."""
+    return STREAM_LOG.stats()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for cohere_RAG's resumable --batch mode (no Cohere calls are made)
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("COHERE_API_KEY", "test-key")  # checked at import; the client is only created on generate
+
+import cohere_RAG
+
+
+class _Retriever:
+    def retrieve_batch(self, queries, top_k, time_slots):
+        return [[] for _ in queries]
+
+
+def _run(in_path, out_path, fail=()):
+    answered = []
+
+    def generate(query, retrieved):
+        if query in fail:
+            raise TimeoutError("slow")
+        answered.append(query)
+        return f"answer to {query}", []
+
+    original, cohere_RAG.generate = cohere_RAG.generate, generate
+    try:
+        cohere_RAG.run_batch(_Retriever(), in_path, out_path, concurrency=2, rate=0)
+    finally:
+        cohere_RAG.generate = original
+    return answered
+
+
+def test_cohere_batch():
+    print("📦 Testing cohere_RAG batch mode")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        in_path, out_path = Path(tmp) / "questions.txt", Path(tmp) / "questions.answers.jsonl"
+
+        # Ids without an explicit "id" follow the question text, not its line
+        in_path.write_text("chest pain\n\n{\"id\": \"wrist\", \"query\": \"wrist fracture\"}\nChest   PAIN\n",
+                           encoding="utf-8")
+        items = cohere_RAG.read_batch(in_path)
+        assert [item["id"] for item in items] == [cohere_RAG.batch_id("chest pain"), "wrist"]
+        in_path.write_text("night premium\n" + in_path.read_text(encoding="utf-8"), encoding="utf-8")
+        assert cohere_RAG.read_batch(in_path)[1]["id"] == items[0]["id"]
+
+        in_path.write_text("{\"id\": \"a\", \"query\": \"x\"}\n{\"id\": \"a\", \"query\": \"y\"}\n", encoding="utf-8")
+        try:
+            cohere_RAG.read_batch(in_path)
+            raise AssertionError("duplicate explicit ids must be rejected")
+        except ValueError:
+            pass
+
+        # A failed question is retried on the next run; answered ones are skipped
+        in_path.write_text("chest pain\nwrist fracture\nnight premium\n", encoding="utf-8")
+        assert sorted(_run(in_path, out_path, fail={"wrist fracture"})) == ["chest pain", "night premium"]
+        assert _run(in_path, out_path) == ["wrist fracture"]
+        assert _run(in_path, out_path) == []
+
+        # An answer only counts for the same question under the same id
+        in_path.write_text("{\"id\": \"1\", \"query\": \"chest pain\"}\n", encoding="utf-8")
+        out_path.write_text(json.dumps({"id": "1", "query": "wrist fracture", "answer_markdown": "old"}) + "\n",
+                            encoding="utf-8")
+        assert cohere_RAG.answered_ids(out_path, cohere_RAG.read_batch(in_path)) == set()
+
+        # Torn last line from an interrupted run: ignored, and the next record starts on its own line
+        in_path.write_text("chest pain\nwrist fracture\n", encoding="utf-8")
+        chest_id = cohere_RAG.batch_id("chest pain")
+        out_path.write_text(json.dumps({"id": chest_id, "query": "chest pain", "answer_markdown": "ok"}) + "\n"
+                            + "{\"id\": \"q-", encoding="utf-8")
+        assert cohere_RAG.answered_ids(out_path, cohere_RAG.read_batch(in_path)) == {chest_id}
+        assert _run(in_path, out_path) == ["wrist fracture"]
+        lines = out_path.read_text(encoding="utf-8").splitlines()
+        assert json.loads(lines[-1])["query"] == "wrist fracture"
+        assert cohere_RAG.answered_ids(out_path, cohere_RAG.read_batch(in_path)) == {
+            chest_id, cohere_RAG.batch_id("wrist fracture")}
+
+    print("\n✅ Batch mode tests passed!")
+
+
+if __name__ == "__main__":
+    test_cohere_batch()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk embedding cache shared by several processes
+"""
+
+import tempfile
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+class _Model:
+    """Deterministic 4-d "embedding": the text's length and first character code."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=64):
+        self.calls += 1
+        return np.array([[len(t), ord(t[0]), 0, 1] for t in texts], dtype=np.float32)
+
+
+def test_embedding_cache():
+    print("💾 Testing embedding cache")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = _Model()
+        expected = model.encode(["a", "bbbbbbbbbb", "cc"])
+
+        # Two instances on one directory stand in for two processes
+        first, second = EmbeddingCache("m", tmp), EmbeddingCache("m", tmp)
+        assert np.array_equal(first.encode(model, ["a"]), expected[:1])
+        assert np.array_equal(second.encode(model, ["bbbbbbbbbb"]), expected[1:2])
+        assert np.array_equal(first.encode(model, ["cc", "a"]), expected[[2, 0]])
+
+        # Every row survives, each under its own text, and nothing is encoded twice
+        calls = model.calls
+        for cache in (second, first, EmbeddingCache("m", tmp)):
+            assert np.array_equal(cache.encode(model, ["a", "bbbbbbbbbb", "cc"]), expected)
+        assert model.calls == calls
+        assert len(EmbeddingCache("m", tmp).rows) == 3
+
+    print("\n✅ Embedding cache tests passed!")
+
+
+if __name__ == "__main__":
+    test_embedding_cache()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled JSON server behind cohere_RAG --serve
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from json_server import BadRequest, PooledHTTPServer, make_handler
+
+
+def _request(url, body=None):
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_json_server():
+    print("🔍 Testing pooled JSON server")
+    print("=" * 50)
+
+    release = threading.Event()
+
+    def echo(body):
+        if "text" not in body:
+            raise BadRequest("'text' is required")
+        return {"echo": body["text"]}
+
+    def slow(body):
+        release.wait(5)
+        return {"done": True}
+
+    routes = {("POST", "/echo"): echo, ("POST", "/slow"): slow}
+    server = PooledHTTPServer(("127.0.0.1", 0), make_handler(routes, lambda: {"docs": 3}), workers=1, max_pending=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        assert _request(f"{url}/echo", {"text": "hi"}) == (200, {"echo": "hi"})
+        assert _request(f"{url}/echo", {})[0] == 400
+        assert _request(f"{url}/missing")[0] == 404
+
+        status, health = _request(f"{url}/health")
+        assert status == 200 and health["docs"] == 3 and health["server"]["workers"] == 1
+
+        # With the only slot taken, further requests are shed instead of queued
+        slow_result = []
+        blocker = threading.Thread(target=lambda: slow_result.append(_request(f"{url}/slow", {})))
+        blocker.start()
+        while server.stats()["pending"] == 0:
+            pass
+        assert _request(f"{url}/echo", {"text": "hi"})[0] == 503
+        release.set()
+        blocker.join()
+        assert slow_result == [(200, {"done": True})]
+        assert server.stats()["rejected"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("\n✅ JSON server tests passed!")
+
+
+if __name__ == "__main__":
+    test_json_server()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the codebook delta sync, against the local Pinecone stand-in
+"""
+
+import tempfile
+
+import numpy as np
+
+from local_vector_store import LocalPinecone
+from pinecone_sync import PineconeSync
+
+
+def _embed(texts):
+    return np.random.default_rng(len(texts)).random((len(texts), 8))
+
+
+def _fresh_index():
+    LocalPinecone._indexes.clear()
+    pc = LocalPinecone(persist_dir=None)
+    pc.create_index(name="codes", dimension=8)
+    return pc.Index("codes")
+
+
+def test_pinecone_sync():
+    print("🔄 Testing Pinecone delta sync")
+    print("=" * 50)
+
+    records = [{'text': f"code {i}", 'metadata': {'code': f"A{i:03d}"}} for i in range(5)]
+    with tempfile.TemporaryDirectory() as state_dir:
+        index = _fresh_index()
+        assert PineconeSync(index, "codes", "m", state_dir).sync(records, _embed)['upserted'] == 5
+        assert PineconeSync(index, "codes", "m", state_dir).sync(records, _embed) == {
+            'upserted': 0, 'deleted': 0, 'unchanged': 5}
+
+        # Removed rows are deleted, new ones upserted
+        changed = records[1:] + [{'text': "new", 'metadata': {}}]
+        stats = PineconeSync(index, "codes", "m", state_dir).sync(changed, _embed)
+        assert (stats['upserted'], stats['deleted']) == (1, 1)
+        assert index.describe_index_stats().total_vector_count == 5
+
+        # The index lost its data (not persisted, recreated): the stale state is not trusted
+        index = _fresh_index()
+        assert PineconeSync(index, "codes", "m", state_dir).sync(records, _embed)['upserted'] == 5
+        assert index.describe_index_stats().total_vector_count == 5
+
+    print("\n✅ Pinecone sync tests passed!")
+
+
+if __name__ == "__main__":
+    test_pinecone_sync()
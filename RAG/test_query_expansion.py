@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled medical query expander
+"""
+
+from query_expansion import ADVANCED_QUERY_EXPANDER, BILLING_QUERY_EXPANDER
+
+
+def test_query_expansion():
+    print("🔍 Testing compiled query expansion")
+    print("=" * 50)
+
+    # Longest phrase wins over its single-word parts
+    assert BILLING_QUERY_EXPANDER.expand("heart attack") == "myocardial infarction cardiac emergency"
+    assert BILLING_QUERY_EXPANDER.expand("after hours").startswith("after hours evening night weekend")
+
+    # Case, whitespace and punctuation do not change the expansion
+    assert BILLING_QUERY_EXPANDER.expand("  Chest   PAIN, ") == BILLING_QUERY_EXPANDER.expand("chest pain")
+
+    # Phrases only match whole tokens (the old substring scan turned "laceration" into "lacation")
+    assert "lacation" not in ADVANCED_QUERY_EXPANDER.expand("laceration repair")
+
+    # Unknown codes are kept and duplicate words are removed
+    expanded = BILLING_QUERY_EXPANDER.expand("H152 weekend weekend")
+    assert expanded.split()[0] == "h152"
+    assert len(expanded.split()) == len(set(expanded.split()))
+
+    # Symptom queries get assessment suffixes
+    assert BILLING_QUERY_EXPANDER.expand("ache").endswith("assessment evaluation examination")
+
+    for query in ["chest pain", "broken bone", "emergency", "anesthesia"]:
+        print(f"  '{query}' → '{BILLING_QUERY_EXPANDER.expand(query)}'")
+
+    print("\n✅ Query expansion tests passed!")
+
+
+if __name__ == "__main__":
+    test_query_expansion()
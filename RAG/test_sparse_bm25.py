@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the sparse-matrix BM25 used by cohere_RAG.HybridRetriever
+"""
+
+import json
+import re
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from sparse_bm25 import SparseBM25
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+
+
+def tokenize(text):
+    return [t.lower() for t in _TOKEN_RE.findall(text or "")]
+
+
+def test_sparse_bm25():
+    print("🔍 Testing sparse BM25 against rank_bm25")
+    print("=" * 50)
+
+    with open("Codes_by_class.json", encoding="utf-8") as f:
+        rows = json.load(f)
+    corpus = [tokenize(" ".join(str(row.get(k) or "") for k in ("code", "description", "how_to_use")))
+              for row in rows]
+    reference = BM25Okapi(corpus)
+    bm25 = SparseBM25(corpus)
+
+    queries = [
+        "chest pain", "laceration repair face", "night weekend premium", "A003",
+        "assessment assessment assessment",  # repeated tokens count repeatedly
+        "the of and",  # terms in most documents get the epsilon IDF floor
+        "xyzzy unknownterm",  # nothing in the vocabulary
+        "",
+    ]
+    queries += [" ".join(doc[:3]) for doc in corpus[::25]]
+
+    for query in queries:
+        tokens = tokenize(query)
+        expected = reference.get_scores(tokens)
+        scores = bm25.get_scores(tokens)
+        assert np.allclose(scores, expected, rtol=1e-9, atol=1e-12), query
+
+        # Best first; documents with equal scores are ordered by index
+        top = bm25.top_n(tokens, 10)
+        ranked = sorted(range(len(corpus)), key=lambda i: (-round(expected[i], 9), i))[:10]
+        assert top == ranked, query
+
+    # The batched product gives the same scores, row per query
+    batch = bm25.get_scores_batch([tokenize(q) for q in queries])
+    assert batch.shape == (len(queries), len(corpus))
+    for row, query in zip(batch, queries):
+        assert np.allclose(row, bm25.get_scores(tokenize(query)), rtol=1e-12, atol=1e-12), query
+
+    assert bm25.top_n(["chest"], 0) == []
+    assert len(bm25.top_n(["chest"], len(corpus) + 5)) == len(corpus)
+
+    print(f"  {len(queries)} queries over {len(corpus)} documents match rank_bm25")
+    print("\n✅ Sparse BM25 tests passed!")
+
+
+if __name__ == "__main__":
+    test_sparse_bm25()
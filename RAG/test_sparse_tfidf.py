@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for the scikit-learn-free TF-IDF query scoring used by cohere_RAG snapshots
+"""
+
+import json
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from sparse_tfidf import SparseTfidf
+
+
+def test_sparse_tfidf():
+    print("🔍 Testing sparse TF-IDF against scikit-learn")
+    print("=" * 50)
+
+    with open("Codes_by_class.json", encoding="utf-8") as f:
+        rows = json.load(f)
+    texts = [" ".join(str(row.get(k) or "") for k in ("code", "description", "how_to_use")) for row in rows]
+    vectorizer = TfidfVectorizer(lowercase=True, stop_words="english", ngram_range=(1, 2), min_df=1, max_df=0.9)
+    matrix = vectorizer.fit_transform(texts)
+    tfidf = SparseTfidf(vectorizer, matrix)
+    analyzer = vectorizer.build_analyzer()
+
+    queries = ["chest pain at night", "The Critical-care, first hour!", "H152 H152 weekend", "", "xyzzy"]
+    queries += [text[:60] for text in texts[::20]]
+    for query in queries:
+        assert tfidf.analyze(query) == analyzer(query), query
+        expected = cosine_similarity(vectorizer.transform([query]), matrix).ravel()
+        assert np.allclose(tfidf.get_scores(query), expected, atol=1e-12), query
+
+    batch = tfidf.get_scores_batch(queries)
+    for row, query in zip(batch, queries):
+        assert np.allclose(row, tfidf.get_scores(query), atol=1e-12), query
+
+    # Only the configuration it reproduces is accepted
+    try:
+        SparseTfidf(TfidfVectorizer(sublinear_tf=True).fit(texts), matrix)
+        raise AssertionError("sublinear_tf should be rejected")
+    except ValueError:
+        pass
+
+    print(f"  {len(queries)} queries over {len(texts)} documents match scikit-learn")
+    print("\n✅ Sparse TF-IDF tests passed!")
+
+
+if __name__ == "__main__":
+    test_sparse_tfidf()
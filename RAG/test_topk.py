@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared top-k selection helper
+"""
+
+import numpy as np
+
+from topk import top_k_indices
+
+
+def test_top_k_indices():
+    print("🔍 Testing top_k_indices")
+    print("=" * 50)
+
+    rng = np.random.default_rng(0)
+    for n, k in [(1000, 30), (50, 50), (10, 30), (200, 1)]:
+        scores = rng.integers(0, 20, size=n).astype(float)  # plenty of ties
+        expected = sorted(range(n), key=lambda i: (-scores[i], i))[:k]
+        assert top_k_indices(scores, k).tolist() == expected
+
+    # Mostly-zero scores take the above-the-floor path; zeros still fill in by index
+    scores = np.zeros(1000)
+    scores[rng.choice(1000, size=40, replace=False)] = rng.integers(1, 5, size=40)
+    for k in (30, 60):
+        expected = sorted(range(1000), key=lambda i: (-scores[i], i))[:k]
+        assert top_k_indices(scores, k).tolist() == expected
+
+    # Ties at the cut-off keep the lowest indices
+    assert top_k_indices(np.array([0.0, 1.0, 0.0, 0.0, 1.0]), 3).tolist() == [1, 4, 0]
+    assert top_k_indices(np.zeros(5), 0).tolist() == []
+    assert top_k_indices(np.array([]), 5).tolist() == []
+
+    print("\n✅ top_k_indices tests passed!")
+
+
+if __name__ == "__main__":
+    test_top_k_indices()
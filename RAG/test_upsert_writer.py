@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent Pinecone upsert writer
+"""
+
+from upsert_writer import UpsertWriter
+
+
+class _FlakyIndex:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.upserted = []
+
+    def upsert(self, vectors, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.upserted.extend(vectors)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def _write(index, on_commit=None):
+    writer = UpsertWriter(index, max_batch_vectors=2, backoff_seconds=0.001, on_commit=on_commit)
+    try:
+        writer.add((f"v{i}", [0.0, 1.0]) for i in range(2))
+        writer.close()
+    except RuntimeError as e:
+        return e
+    return None
+
+
+def test_upsert_writer():
+    print("📤 Testing upsert writer")
+    print("=" * 50)
+
+    # Transient errors are retried
+    index = _FlakyIndex([TimeoutError("slow"), _HTTPError(429), _HTTPError(503)])
+    assert _write(index) is None
+    assert index.calls == 4 and len(index.upserted) == 2
+
+    # Client errors fail at once
+    index = _FlakyIndex([_HTTPError(400)])
+    assert isinstance(_write(index), RuntimeError)
+    assert index.calls == 1
+    index = _FlakyIndex([ValueError("vector dimension 2 does not match 384")])
+    assert isinstance(_write(index), RuntimeError)
+    assert index.calls == 1
+
+    # A failing commit callback is reported by close
+    def broken_checkpoint(_batch):
+        raise OSError("disk full")
+
+    error = _write(_FlakyIndex([]), on_commit=broken_checkpoint)
+    assert isinstance(error, RuntimeError) and isinstance(error.__cause__, OSError)
+
+    print("\n✅ Upsert writer tests passed!")
+
+
+if __name__ == "__main__":
+    test_upsert_writer()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the local Pinecone stand-in (both backends)
+"""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from local_vector_store import LocalPinecone, LocalServerlessSpec
+
+
+def test_local_vector_store():
+    print("📦 Testing local vector store")
+    print("=" * 50)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.random((500, 8)).astype(np.float32)
+    query = rng.random(8).astype(np.float32)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+
+    for backend in ["numpy", "faiss"]:
+        LocalPinecone._indexes.clear()
+        pc = LocalPinecone(backend=backend, persist_dir=None)
+        pc.create_index(name="test", dimension=8, metric="cosine",
+                        spec=LocalServerlessSpec(cloud="aws", region="us-east-1"))
+        assert "test" in [idx.name for idx in pc.list_indexes()]
+        assert pc.describe_index("test").status['ready']
+
+        index = pc.Index("test")
+        index.upsert(vectors=[
+            (f"v{i}", vectors[i].tolist(), {"source": "pdf" if i % 2 else "csv", "n": i})
+            for i in range(len(vectors))
+        ])
+
+        # Unfiltered top-k matches brute-force cosine similarity
+        results = index.query(vector=query.tolist(), top_k=5, include_metadata=True)
+        expected = [f"v{i}" for i in np.argsort(-scores)[:5]]
+        assert [m['id'] for m in results['matches']] == expected, backend
+
+        # Filters restrict the candidates; metadata comes back with the match
+        results = index.query(vector=query.tolist(), top_k=3, include_metadata=True,
+                              filter={"source": "pdf", "n": {"$gte": 100}})
+        candidates = [i for i in range(len(vectors)) if i % 2 and i >= 100]
+        expected = [f"v{i}" for i in sorted(candidates, key=lambda i: -scores[i])[:3]]
+        assert [m.id for m in results.matches] == expected, backend
+        assert all(m.metadata['source'] == "pdf" for m in results.matches)
+
+        # Upserting an existing id replaces it; deletes remove it from results
+        index.upsert(vectors=[{"id": "v0", "values": query.tolist(), "metadata": {"source": "csv"}}])
+        assert index.query(vector=query.tolist(), top_k=1)['matches'][0]['id'] == "v0"
+        index.delete(ids=["v0"])
+        assert index.describe_index_stats().total_vector_count == len(vectors) - 1
+        assert "v0" not in [vid for page in index.list() for vid in page]
+        print(f"  {backend}: ok")
+
+    # A persisted index is only written on flush, and reloads in a fresh client
+    with tempfile.TemporaryDirectory() as tmp:
+        LocalPinecone._indexes.clear()
+        pc = LocalPinecone(persist_dir=tmp)
+        pc.create_index(name="persisted", dimension=8)
+        index = pc.Index("persisted")
+        index.upsert(vectors=[(f"v{i}", vectors[i].tolist(), {"n": i}) for i in range(10)])
+        assert not (Path(tmp) / "persisted.npz").exists()
+        index.flush()
+        index.delete(ids=["v0"])  # not flushed
+        LocalPinecone._indexes.clear()
+        reloaded = LocalPinecone(persist_dir=tmp).Index("persisted")
+        assert reloaded.describe_index_stats().total_vector_count == 10
+        print("  persistence: ok")
+
+    print("\n✅ Local vector store tests passed!")
+
+
+if __name__ == "__main__":
+    test_local_vector_store()
@@ -0,0 +1,35 @@
+"""
+Top-k selection shared by the rankers.
+
+``np.argsort(scores)[::-1][:k]`` sorts every score to keep a handful.
+``top_k_indices`` finds the k-th best score with ``np.partition`` (linear
+time), keeps the scores above it plus the lowest-index ties at it, and sorts
+only that slice, so ranking cost grows with the corpus only through two
+linear scans.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` largest scores, best first; equal scores are ordered by index."""
+    scores = np.asarray(scores)
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        # Mostly-floor scores (BM25 and TF-IDF give most documents 0): partition
+        # only the entries above the floor, which selection with many ties is slow on
+        above_floor = scores > scores.min()
+        if k <= np.count_nonzero(above_floor) < n // 2:
+            subset = np.flatnonzero(above_floor)
+            return subset[top_k_indices(scores[subset], k)]
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[: k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
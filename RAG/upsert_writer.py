@@ -0,0 +1,183 @@
+"""
+Shared concurrent writer for Pinecone upserts.
+
+Vectors are buffered into batches capped both by count and by estimated
+request size, and up to ``max_inflight`` batches are sent concurrently from a
+thread pool; ``add`` blocks once that many are outstanding, so memory stays
+bounded. A batch that fails with a transient error (timeout, connection
+error, 429, 5xx) is retried with exponential backoff and jitter; any other
+error (bad dimension, bad metadata) fails the batch at once. Failed batches
+and errors raised by ``on_commit`` are reported by ``close`` (or ``flush``),
+which raises after every other batch has finished.
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_MAX_BATCH_VECTORS = 100
+DEFAULT_MAX_BATCH_BYTES = 2 * 1024 * 1024  # Pinecone's per-request payload limit
+
+
+def estimate_vector_bytes(vector) -> int:
+    """Rough JSON request size of one (id, values, metadata) tuple or vector dict."""
+    if isinstance(vector, dict):
+        vector_id, values, metadata = vector['id'], vector['values'], vector.get('metadata')
+    else:
+        vector_id, values = vector[0], vector[1]
+        metadata = vector[2] if len(vector) > 2 else None
+    size = len(str(vector_id)) + 20 * len(values) + 64
+    if metadata:
+        size += len(json.dumps(metadata, default=str))
+    return size
+
+
+_TRANSIENT_ERROR_NAMES = ("Timeout", "Connection", "MaxRetry", "ProtocolError")
+
+
+def is_transient(error: Exception) -> bool:
+    """True for errors worth retrying: timeouts, connection errors, HTTP 429 and 5xx."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status", None) or getattr(error, "status_code", None) \
+        or getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(error).__name__ for name in _TRANSIENT_ERROR_NAMES)
+
+
+class UpsertWriter:
+    """Batches vectors and keeps up to ``max_inflight`` upserts running concurrently."""
+
+    def __init__(self, index, max_inflight: int = 4,
+                 max_batch_vectors: int = DEFAULT_MAX_BATCH_VECTORS,
+                 max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+                 max_retries: int = 5, backoff_seconds: float = 0.5,
+                 namespace: Optional[str] = None,
+                 on_commit: Optional[Callable[[List], None]] = None):
+        self.index = index
+        self.max_batch_vectors = max_batch_vectors
+        self.max_batch_bytes = max_batch_bytes
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.namespace = namespace
+        self.on_commit = on_commit
+
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="upsert")
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._buffer: List = []
+        self._buffer_bytes = 0
+        self._futures = []
+        self._errors: List[Exception] = []
+        self._start = time.perf_counter()
+
+        # Progress counters (guarded by _lock)
+        self.submitted = 0
+        self.committed = 0
+        self.failed = 0
+        self.retries = 0
+        self._batch_sizes: List[int] = []  # per batch, in submission order
+        self._batch_done: List[bool] = []
+        self._prefix_batches = 0
+        self._prefix_vectors = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True)
+
+    def add(self, vectors: Iterable):
+        """Queue vectors for upsert, sending full batches as soon as a slot is free."""
+        for vector in vectors:
+            size = estimate_vector_bytes(vector)
+            if self._buffer and (len(self._buffer) >= self.max_batch_vectors
+                                 or self._buffer_bytes + size > self.max_batch_bytes):
+                self._submit()
+            self._buffer.append(vector)
+            self._buffer_bytes += size
+
+    def flush(self):
+        """Send any buffered vectors and wait for every in-flight batch."""
+        if self._buffer:
+            self._submit()
+        for future in self._futures:
+            future.result()
+        self._futures = []
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise RuntimeError(f"{len(errors)} upsert batch(es) or commit callbacks failed; "
+                               f"first error: {errors[0]}") from errors[0]
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def _submit(self):
+        batch, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        self._slots.acquire()  # blocks while max_inflight batches are outstanding
+        with self._lock:
+            seq = len(self._batch_sizes)
+            self._batch_sizes.append(len(batch))
+            self._batch_done.append(False)
+            self.submitted += len(batch)
+        future = self._pool.submit(self._upsert_with_retry, seq, batch)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures = [f for f in self._futures if not f.done()] + [future]
+
+    def _upsert_with_retry(self, seq: int, batch: List):
+        kwargs = {} if self.namespace is None else {'namespace': self.namespace}
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(vectors=batch, **kwargs)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    with self._lock:
+                        self.failed += len(batch)
+                        self._errors.append(e)
+                    return
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (1 + random.random()))
+
+        with self._lock:
+            self.committed += len(batch)
+            self._batch_done[seq] = True
+            while self._prefix_batches < len(self._batch_done) and self._batch_done[self._prefix_batches]:
+                self._prefix_vectors += self._batch_sizes[self._prefix_batches]
+                self._prefix_batches += 1
+        if self.on_commit:
+            try:
+                self.on_commit(batch)
+            except Exception as e:  # finished futures are not kept, so report it through flush
+                with self._lock:
+                    self._errors.append(e)
+
+    @property
+    def committed_prefix(self) -> int:
+        """Vectors in the longest run of batches, in submission order, that are all committed."""
+        with self._lock:
+            return self._prefix_vectors
+
+    def progress(self) -> Dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            return {
+                'submitted': self.submitted,
+                'committed': self.committed,
+                'failed': self.failed,
+                'retries': self.retries,
+                'inflight_batches': sum(1 for f in self._futures if not f.done()),
+                'vectors_per_sec': self.committed / elapsed if elapsed else 0.0,
+            }
@@ -0,0 +1,15 @@
+"""
+Pinecone client selection.
+
+Import ``Pinecone`` and ``ServerlessSpec`` from here instead of from
+``pinecone``. With ``VECTOR_STORE=local`` they resolve to the in-process
+stand-in in ``local_vector_store`` (no network, no API key needed);
+otherwise they are the real Pinecone client.
+"""
+
+from config_advanced import VECTOR_STORE
+
+if VECTOR_STORE == "local":
+    from local_vector_store import LocalPinecone as Pinecone, LocalServerlessSpec as ServerlessSpec
+else:
+    from pinecone import Pinecone, ServerlessSpec  # noqa: F401